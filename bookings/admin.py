@@ -2,12 +2,16 @@ from django.contrib import admin
 from django.utils.html import format_html
 from django.utils.safestring import mark_safe
 from django.utils import timezone
-from .models import User, Room, Booking, Equipment, Notification
+from .models import User, Room, Booking, BookingDailyRollup, BookingSeries, Equipment, Notification, NotificationArchive, NotificationCounter, OutboxEvent, is_overlap_violation
+from .availability import schedule_index
+from .cache import bump_version
+from .rollups import batch as rollup_batch, update_bookings
 from django import forms
 from django.contrib import messages
 from django.shortcuts import render, redirect
 from django.urls import path
 from django.http import HttpResponse
+from django.db import IntegrityError, transaction
 from django.db.models import Count, Sum, Q
 from django.contrib.admin import AdminSite
 import csv
@@ -612,11 +616,13 @@ class RoomAdmin(admin.ModelAdmin):
     # Actions
     def activate_rooms(self, request, queryset):
         updated = queryset.update(is_active=True)
+        transaction.on_commit(bump_version)
         self.message_user(request, f'✅ Aktywowano {updated} sal', messages.SUCCESS)
     activate_rooms.short_description = '✓ Aktywuj sale'
 
     def deactivate_rooms(self, request, queryset):
         updated = queryset.update(is_active=False)
+        transaction.on_commit(bump_version)
         self.message_user(request, f'⚠️ Dezaktywowano {updated} sal', messages.WARNING)
     deactivate_rooms.short_description = '✗ Dezaktywuj sale'
 
@@ -786,7 +792,7 @@ class BookingChangeForm(forms.ModelForm):
             
             # Check availability
             instance_id = self.instance.id if self.instance else None
-            if not room.is_available(start_time, end_time, exclude_booking_id=instance_id):
+            if not room.is_available(start_time, end_time, exclude_booking_id=instance_id, refresh=True):
                 raise forms.ValidationError(f"❌ Sala {room.name} jest zajęta w tym terminie!")
         
         return cleaned_data
@@ -1065,17 +1071,19 @@ class BookingAdmin(admin.ModelAdmin):
 
     # ——— Akcje zbiorcze ———
     def confirm_bookings(self, request, queryset):
-        cnt = queryset.exclude(status='cancelled').update(status='confirmed')
+        cnt = update_bookings(queryset.exclude(status='cancelled'), status='confirmed')
         self.message_user(request, f"✅ Potwierdzono {cnt} rezerwacji.", messages.SUCCESS)
     confirm_bookings.short_description = "✅ Potwierdź wybrane"
 
     def cancel_bookings(self, request, queryset):
-        cnt = queryset.update(status='cancelled')
+        room_ids = set(queryset.values_list('room_id', flat=True))
+        cnt = update_bookings(queryset, status='cancelled')
+        schedule_index.invalidate(room_ids)
         self.message_user(request, f"❌ Anulowano {cnt} rezerwacji.", messages.WARNING)
     cancel_bookings.short_description = "❌ Anuluj wybrane"
 
     def complete_bookings(self, request, queryset):
-        cnt = queryset.exclude(status='cancelled').update(status='completed')
+        cnt = update_bookings(queryset.exclude(status='cancelled'), status='completed')
         self.message_user(request, f"✔️ Oznaczono jako zakończone: {cnt} rezerwacji.", messages.SUCCESS)
     complete_bookings.short_description = "✔️ Oznacz jako zakończone"
 
@@ -1118,16 +1126,23 @@ class BookingAdmin(admin.ModelAdmin):
         orig = queryset.first()
         new_start = orig.start_time + timedelta(days=1)
         new_end = orig.end_time + timedelta(days=1)
-        Booking.objects.create(
-            room=orig.room,
-            user=orig.user,
-            title=f"{orig.title} (kopia)",
-            description=orig.description,
-            start_time=new_start,
-            end_time=new_end,
-            status='pending',
-            attendees_count=orig.attendees_count or 1,
-        )
+        try:
+            with transaction.atomic():
+                Booking.objects.create(
+                    room=orig.room,
+                    user=orig.user,
+                    title=f"{orig.title} (kopia)",
+                    description=orig.description,
+                    start_time=new_start,
+                    end_time=new_end,
+                    status='pending',
+                    attendees_count=orig.attendees_count or 1,
+                )
+        except IntegrityError as exc:
+            if not is_overlap_violation(exc):
+                raise
+            self.message_user(request, f"❌ Sala {orig.room.name} jest zajęta {new_start.strftime('%d.%m.%Y')}.", messages.ERROR)
+            return
         self.message_user(request, f"✅ Skopiowano rezerwację na {new_start.strftime('%d.%m.%Y')}.", messages.SUCCESS)
     duplicate_booking.short_description = "📋 Duplikuj (+1 dzień)"
 
@@ -1137,28 +1152,106 @@ class BookingAdmin(admin.ModelAdmin):
             self.message_user(request, "Wybierz rezerwacje z serii cyklicznej.", messages.WARNING)
             return
         total = 0
-        for sid in series_ids:
-            total += Booking.objects.filter(series_id=sid).delete()[0]
+        with rollup_batch():
+            for sid in series_ids:
+                total += Booking.objects.filter(series_id=sid).delete()[0]
+        # Bez reguły komenda materialize_series nie odtworzy usuniętych wystąpień
+        BookingSeries.objects.filter(series_id__in=list(series_ids)).delete()
         self.message_user(request, f"🗑️ Usunięto {total} rezerwacji z serii.", messages.SUCCESS)
     delete_series.short_description = "🗑️ Usuń całą serię"
 
+    def delete_queryset(self, request, queryset):
+        # Jedna aktualizacja dziennych agregatów zamiast jednej na rezerwację
+        with rollup_batch():
+            super().delete_queryset(request, queryset)
+
+@admin.register(BookingSeries)
+class BookingSeriesAdmin(admin.ModelAdmin):
+    list_display = ('title', 'room', 'user', 'frequency', 'start_time', 'until', 'count', 'materialized_until', 'is_active')
+    list_filter = ('frequency', 'is_active', 'room')
+    search_fields = ('title', 'series_id', 'user__name', 'room__name')
+    readonly_fields = ('series_id', 'materialized_until', 'created_at')
+
 @admin.register(Notification)
 class NotificationAdmin(admin.ModelAdmin):
-    list_display = ('user', 'message_preview', 'is_read_colored', 'created_at')
-    list_filter = ('is_read', 'created_at')
+    list_display = ('recipient', 'message_preview', 'is_read_colored', 'created_at')
+    list_filter = ('is_read', ('user', admin.EmptyFieldListFilter), 'created_at')
     search_fields = ('user__name', 'message')
     date_hierarchy = 'created_at'
+    # Tabela duża mimo retencji – bez dodatkowego COUNT(*) całości przy każdej stronie
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('user').annotate(read_count=Count('reads'))
+
+    def recipient(self, obj):
+        return obj.user.name if obj.user else 'Wszyscy'
+    recipient.short_description = 'Odbiorca'
     
     def message_preview(self, obj):
         return obj.message[:50] + '...' if len(obj.message) > 50 else obj.message
     message_preview.short_description = 'Wiadomość'
     
     def is_read_colored(self, obj):
+        if obj.is_broadcast:
+            return format_html('<span style="color: #2563eb;">Odczytane przez: {}</span>', obj.read_count)
         color = '#10b981' if obj.is_read else '#f59e0b'
         text = 'Przeczytane' if obj.is_read else 'Nieprzeczytane'
         return format_html('<span style="color: {}; font-weight: bold;">{}</span>', color, text)
     is_read_colored.short_description = 'Status'
 
+    # Edycje i usunięcia w adminie są rzadkie – zamiast śledzić różnice przeliczamy liczniki
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change and {'user', 'is_read'} & set(form.changed_data):
+            NotificationCounter.reconcile()
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        NotificationCounter.reconcile()
+
+    def delete_queryset(self, request, queryset):
+        super().delete_queryset(request, queryset)
+        NotificationCounter.reconcile()
+
+@admin.register(NotificationArchive)
+class NotificationArchiveAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user_id', 'message', 'is_read', 'read_count', 'created_at', 'archived_at')
+    search_fields = ('message',)
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+@admin.register(BookingDailyRollup)
+class BookingDailyRollupAdmin(admin.ModelAdmin):
+    # Tylko podgląd – wiersze utrzymuje bookings/rollups.py, naprawa: manage.py rebuild_rollups
+    list_display = ('day', 'room', 'department', 'status', 'bookings', 'minutes', 'attendees', 'cost')
+    list_filter = ('status', 'department')
+    date_hierarchy = 'day'
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(admin.ModelAdmin):
+    list_display = ('id', 'event_type', 'status', 'attempts', 'available_at', 'created_at')
+    list_filter = ('event_type', 'status')
+    readonly_fields = ('created_at',)
+    actions = ['retry_events']
+
+    def retry_events(self, request, queryset):
+        updated = queryset.update(status='pending', attempts=0, available_at=timezone.now())
+        self.message_user(request, f'🔁 Przywrócono do kolejki {updated} zdarzeń', messages.SUCCESS)
+    retry_events.short_description = '🔁 Ponów wybrane zdarzenia'
+
 # A. Custom Admin Site with Dashboard
 class RoomBookerAdminSite(AdminSite):
     site_header = "🏢 RoomBooker Admin"
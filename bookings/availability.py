@@ -0,0 +1,440 @@
+"""
+Indeks zajętości sal trzymany w pamięci procesu.
+
+Dla każdej sali przechowujemy posortowane przedziały rezerwacji (bez anulowanych)
+z okna czasowego ładowanego leniwie jednym zapytaniem. Sprawdzenie kolizji to
+wyszukiwanie binarne, a indeks jest aktualizowany przez sygnały Booking po
+zatwierdzeniu transakcji. Wpisy starsze niż BOOKING_INDEX_TTL sekund są
+przeładowywane, żeby zmiany z innych workerów nie pozostawały niewidoczne.
+"""
+import base64
+import heapq
+import threading
+import time
+from bisect import bisect_left
+from itertools import islice
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .recurrence import pending_series, virtual_occurrences
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+# Ile dni za żądanym przedziałem doładowujemy przy pierwszym odczycie sali
+WINDOW_DAYS = 7
+
+# Propozycje alternatyw przy konflikcie: zasięg wokół żądanego terminu, krok i liczba propozycji
+ALTERNATIVES_WINDOW = timedelta(days=1)
+ALTERNATIVES_STEP = timedelta(minutes=15)
+ALTERNATIVES_LIMIT = 5
+
+# Najdłuższe okno wyszukiwania wolnych terminów (find_free_slots)
+FREE_SLOTS_MAX_WINDOW = timedelta(days=31)
+
+
+def series_interval_id(series_id):
+    """Identyfikator wirtualnego wystąpienia serii w indeksie (rezerwacje mają int id)."""
+    return ('series', series_id)
+
+
+def _day_start(dt):
+    local = timezone.localtime(dt)
+    return timezone.make_aware(
+        datetime.combine(local.date(), datetime.min.time()),
+        timezone.get_current_timezone(),
+    )
+
+
+class RoomSchedule:
+    """
+    Posortowane przedziały rezerwacji jednej sali w oknie [window_start, window_end).
+
+    Listy trzymamy jako niezmienną migawkę (krotka list), którą add/discard
+    podmieniają w całości. Odczyty (overlaps, busy) biorą migawkę raz i nie
+    potrzebują blokady, nawet gdy inny wątek właśnie zapisuje rezerwację.
+    """
+
+    def __init__(self, room_id, window_start, window_end, intervals):
+        self.room_id = room_id
+        self.window_start = window_start
+        self.window_end = window_end
+        self.loaded_at = time.monotonic()
+        ordered = sorted(intervals, key=lambda x: (x[1], x[2]))
+        self._set(
+            [start for _, start, _ in ordered],
+            [end for _, _, end in ordered],
+            [booking_id for booking_id, _, _ in ordered],
+        )
+
+    def __len__(self):
+        return len(self._snapshot[2])
+
+    @property
+    def ids(self):
+        return self._snapshot[2]
+
+    def _set(self, starts, ends, ids):
+        # Maksima końców prefiksów: _candidates kończy po nich przeszukiwanie wstecz
+        max_end = []
+        current = None
+        for end in ends:
+            current = end if current is None or end > current else current
+            max_end.append(current)
+        self._snapshot = (starts, ends, ids, max_end)
+
+    def covers(self, start, end):
+        return self.window_start <= start and end <= self.window_end
+
+    @staticmethod
+    def _candidates(snapshot, start, end):
+        # Przedziały [0, k) zaczynają się przed `end`; idziemy wstecz, dopóki
+        # maksimum końców prefiksu wychodzi za `start`. Przy rozłącznych
+        # rezerwacjach (normalny stan sali) to jeden-dwa kroki po bisect.
+        starts, ends, _, max_end = snapshot
+        i = bisect_left(starts, end) - 1
+        while i >= 0 and max_end[i] > start:
+            if ends[i] > start:
+                yield i
+            i -= 1
+
+    def overlaps(self, start, end, exclude_booking_id=None):
+        snapshot = self._snapshot
+        ids = snapshot[2]
+        for i in self._candidates(snapshot, start, end):
+            if ids[i] != exclude_booking_id:
+                return True
+        return False
+
+    def busy(self, start, end):
+        """Zwraca listę (start, end, booking_id) nachodzących na przedział, rosnąco po starcie."""
+        snapshot = self._snapshot
+        starts, ends, ids, _ = snapshot
+        found = [(starts[i], ends[i], ids[i]) for i in self._candidates(snapshot, start, end)]
+        found.reverse()
+        return found
+
+    def add(self, booking_id, start, end):
+        starts, ends, ids, _ = self._without(booking_id)
+        pos = bisect_left(starts, start)
+        self._set(
+            starts[:pos] + [start] + starts[pos:],
+            ends[:pos] + [end] + ends[pos:],
+            ids[:pos] + [booking_id] + ids[pos:],
+        )
+
+    def discard(self, booking_id):
+        snapshot = self._without(booking_id)
+        if snapshot is not self._snapshot:
+            self._set(*snapshot[:3])
+
+    def _without(self, booking_id):
+        starts, ends, ids, max_end = self._snapshot
+        try:
+            pos = ids.index(booking_id)
+        except ValueError:
+            return self._snapshot
+        return (
+            starts[:pos] + starts[pos + 1:],
+            ends[:pos] + ends[pos + 1:],
+            ids[:pos] + ids[pos + 1:],
+            None,
+        )
+
+
+class ScheduleIndex:
+    """Leniwie ładowany indeks RoomSchedule dla wszystkich sal w procesie."""
+
+    def __init__(self):
+        self._schedules = {}
+        # booking_id -> sala, w której harmonogramie rezerwacja jest zapisana
+        self._rooms = {}
+        self._lock = threading.RLock()
+
+    @property
+    def ttl(self):
+        return getattr(settings, 'BOOKING_INDEX_TTL', 30)
+
+    def _is_fresh(self, schedule, start, end):
+        if schedule is None or not schedule.covers(start, end):
+            return False
+        return time.monotonic() - schedule.loaded_at < self.ttl
+
+    def schedules(self, room_ids, start, end, refresh=False):
+        """Zwraca {room_id: RoomSchedule} pokrywające [start, end); brakujące ładuje jednym zapytaniem."""
+        room_ids = list(dict.fromkeys(room_ids))
+        with self._lock:
+            result = {}
+            missing = []
+            for room_id in room_ids:
+                schedule = self._schedules.get(room_id)
+                if not refresh and self._is_fresh(schedule, start, end):
+                    result[room_id] = schedule
+                else:
+                    missing.append(room_id)
+            if missing:
+                result.update(self._load(missing, start, end))
+            return result
+
+    def schedule(self, room_id, start, end, refresh=False):
+        return self.schedules([room_id], start, end, refresh=refresh)[room_id]
+
+    def is_available(self, room_id, start_time, end_time, exclude_booking_id=None, refresh=False):
+        schedule = self.schedule(room_id, start_time, end_time, refresh=refresh)
+        return not schedule.overlaps(start_time, end_time, exclude_booking_id)
+
+    def _load(self, room_ids, start, end):
+        from .models import Booking
+
+        window_start = _day_start(start)
+        window_end = _day_start(end) + timedelta(days=WINDOW_DAYS + 1)
+        intervals = {room_id: [] for room_id in room_ids}
+        rows = Booking.objects.filter(
+            room_id__in=room_ids,
+            start_time__lt=window_end,
+            end_time__gt=window_start,
+        ).exclude(status='cancelled').values_list('room_id', 'id', 'start_time', 'end_time')
+        for room_id, booking_id, b_start, b_end in rows:
+            intervals[room_id].append((booking_id, b_start, b_end))
+        # Wystąpienia serii poza horyzontem materializacji też zajmują salę
+        for room_id, occurrences in virtual_occurrences(room_ids, window_start, window_end).items():
+            intervals[room_id].extend(
+                (series_interval_id(series_id), s, e) for s, e, series_id in occurrences
+            )
+
+        loaded = {}
+        for room_id in room_ids:
+            previous = self._schedules.get(room_id)
+            if previous is not None:
+                for booking_id in previous.ids:
+                    if self._rooms.get(booking_id) == room_id:
+                        del self._rooms[booking_id]
+            schedule = RoomSchedule(room_id, window_start, window_end, intervals[room_id])
+            self._schedules[room_id] = schedule
+            loaded[room_id] = schedule
+            self._rooms.update((booking_id, room_id) for booking_id in schedule.ids)
+        return loaded
+
+    def _discard(self, booking_id):
+        # Tylko harmonogram sali, w której rezerwacja była – nie wszystkie sale
+        room_id = self._rooms.pop(booking_id, None)
+        schedule = self._schedules.get(room_id)
+        if schedule is not None:
+            schedule.discard(booking_id)
+
+    def booking_saved(self, booking):
+        with self._lock:
+            self._discard(booking.id)
+            schedule = self._schedules.get(booking.room_id)
+            if schedule is None or booking.status == 'cancelled':
+                return
+            if booking.start_time < schedule.window_end and booking.end_time > schedule.window_start:
+                schedule.add(booking.id, booking.start_time, booking.end_time)
+                self._rooms[booking.id] = booking.room_id
+
+    def booking_deleted(self, booking_id):
+        with self._lock:
+            self._discard(booking_id)
+
+    def invalidate(self, room_ids=None):
+        with self._lock:
+            if room_ids is None:
+                self._schedules.clear()
+                self._rooms.clear()
+            else:
+                room_ids = set(room_ids)
+                for room_id in room_ids:
+                    self._schedules.pop(room_id, None)
+                self._rooms = {b: r for b, r in self._rooms.items() if r not in room_ids}
+
+
+schedule_index = ScheduleIndex()
+
+
+def free_rooms(rooms, start_time, end_time):
+    """
+    Zawęża queryset sal do wolnych w [start_time, end_time) jednym zapytaniem NOT EXISTS.
+    Adnotacja has_pending_series oznacza sale z seriami do rozwinięcia (patrz drop_virtual_conflicts).
+    """
+    from .models import Booking
+
+    busy = Booking.objects.filter(
+        room=OuterRef('pk'),
+        start_time__lt=end_time,
+        end_time__gt=start_time,
+    ).exclude(status='cancelled')
+    pending = pending_series(start_time, end_time).filter(room=OuterRef('pk'))
+    return rooms.filter(~Exists(busy)).annotate(has_pending_series=Exists(pending))
+
+
+def drop_virtual_conflicts(rooms, start_time, end_time):
+    """Odrzuca sale zajęte przez niezmaterializowane wystąpienia serii; zapytanie tylko gdy są takie serie."""
+    rooms = list(rooms)
+    flagged = [room.id for room in rooms if room.has_pending_series]
+    if not flagged:
+        return rooms
+    busy = virtual_occurrences(flagged, start_time, end_time)
+    return [room for room in rooms if room.id not in busy]
+
+
+def _ceil_to_step(dt, step):
+    if not step:
+        return dt
+    seconds = int(step.total_seconds())
+    remainder = int(dt.timestamp()) % seconds
+    if remainder == 0 and dt.microsecond == 0:
+        return dt
+    return dt.replace(microsecond=0) + timedelta(seconds=seconds - remainder)
+
+
+def _floor_to_step(dt, step):
+    seconds = int(step.total_seconds())
+    return dt.replace(microsecond=0) - timedelta(seconds=int(dt.timestamp()) % seconds)
+
+
+def _room_gaps(schedule, window_start, window_end, duration, step):
+    """
+    Przesuwa kursor po posortowanych rezerwacjach sali i zwraca rosnąco
+    wszystkie pasujące starty w każdej luce: co ``step`` albo, bez kroku,
+    kolejne terminy jeden za drugim.
+    """
+    advance = step or duration
+    cursor = window_start
+    for busy_start, busy_end, _ in schedule.busy(window_start, window_end) + [(window_end, window_end, None)]:
+        slot_start = _ceil_to_step(cursor, step)
+        gap_end = min(busy_start, window_end)
+        while slot_start + duration <= gap_end:
+            yield slot_start
+            slot_start += advance
+        if busy_end > cursor:
+            cursor = busy_end
+
+
+def free_slots(rooms, window_start, window_end, duration, limit=10, step=None):
+    """
+    Zwraca do `limit` najwcześniejszych wolnych terminów o długości `duration`
+    we wszystkich salach: listę (start, end, room) rosnąco po starcie.
+    """
+    rooms = list(rooms)
+    schedules = schedule_index.schedules([room.id for room in rooms], window_start, window_end)
+
+    def room_slots(room):
+        for slot_start in _room_gaps(schedules[room.id], window_start, window_end, duration, step):
+            yield slot_start, room.name, room
+
+    merged = heapq.merge(*(room_slots(room) for room in rooms), key=lambda x: (x[0], x[1]))
+    return [(start, start + duration, room) for start, _, room in islice(merged, limit)]
+
+
+def _nearest_free_starts(schedule, start, end, window_start, window_end, step):
+    """
+    Starty wolnych terminów o długości end - start. W każdej luce harmonogramu
+    zaczynamy od startu najbliższego żądanemu i oddalamy się od niego co
+    długość terminu, więc kolejne propozycje z jednej luki na siebie nie nachodzą.
+    """
+    duration = end - start
+    cursor = window_start
+    for busy_start, busy_end, _ in schedule.busy(window_start, window_end) + [(window_end, window_end, None)]:
+        earliest = _ceil_to_step(cursor, step)
+        latest = _floor_to_step(min(busy_start, window_end) - duration, step)
+        if earliest <= latest:
+            nearest = min(max(_floor_to_step(start, step), earliest), latest)
+            slot = nearest
+            while earliest <= slot <= latest:
+                yield slot
+                slot = slot - duration if nearest == latest else slot + duration
+        if busy_end > cursor:
+            cursor = busy_end
+
+
+def suggest_alternatives(room, start, end, attendees=1, limit=ALTERNATIVES_LIMIT):
+    """
+    Propozycje po konflikcie: (terminy w tej samej sali najbliższe żądanemu,
+    podobne sale wolne w żądanym czasie). Zajętość wszystkich sal bierzemy
+    z indeksu przeładowanego jednym zapytaniem zakresowym.
+    """
+    from .models import Room
+
+    now = timezone.now()
+    window_start = max(start - ALTERNATIVES_WINDOW, _ceil_to_step(now, ALTERNATIVES_STEP))
+    window_end = end + ALTERNATIVES_WINDOW
+
+    wanted = {e.id for e in room.equipment.all()}
+    others = list(
+        Room.objects.filter(is_active=True, capacity__gte=attendees)
+        .exclude(pk=room.pk)
+        .prefetch_related('equipment')
+    )
+    schedules = schedule_index.schedules(
+        [room.id] + [other.id for other in others], window_start, window_end, refresh=True,
+    )
+
+    same_room = heapq.nsmallest(
+        limit,
+        _nearest_free_starts(schedules[room.id], start, end, window_start, window_end, ALTERNATIVES_STEP),
+        key=lambda s: (abs(s - start), s),
+    )
+
+    # Ranking: najpierw najmniej brakującego wyposażenia, potem najbliższa pojemność
+    def similarity(other):
+        missing = len(wanted - {e.id for e in other.equipment.all()})
+        return missing, abs(other.capacity - room.capacity), other.name
+
+    free_others = [other for other in others if not schedules[other.id].overlaps(start, end)]
+    return (
+        [(s, s + (end - start)) for s in same_room],
+        heapq.nsmallest(limit, free_others, key=similarity),
+    )
+
+
+def occupancy_grid(room_ids, start, end, slot):
+    """
+    Macierz zajętości sale × sloty (np.uint8, 1 = zajęty) dla [start, end)
+    zbudowana z jednego zapytania zakresowego o rezerwacje.
+    """
+    from .models import Booking
+
+    slot_seconds = int(slot.total_seconds())
+    n_slots = int((end - start).total_seconds()) // slot_seconds
+    row_of = {room_id: i for i, room_id in enumerate(room_ids)}
+
+    rows = list(Booking.objects.filter(
+        room_id__in=room_ids,
+        start_time__lt=end,
+        end_time__gt=start,
+    ).exclude(status='cancelled').values_list('room_id', 'start_time', 'end_time'))
+    for room_id, occurrences in virtual_occurrences(room_ids, start, end).items():
+        rows.extend((room_id, s, e) for s, e, _ in occurrences)
+
+    # Tablica różnicowa: +1 w slocie startu, -1 za slotem końca, potem suma kumulatywna
+    diff = np.zeros((len(room_ids), n_slots + 1), dtype=np.int32)
+    if rows:
+        t0 = start.timestamp()
+        idx = np.fromiter((row_of[r[0]] for r in rows), dtype=np.int64, count=len(rows))
+        starts = np.fromiter((r[1].timestamp() for r in rows), dtype=np.float64, count=len(rows))
+        ends = np.fromiter((r[2].timestamp() for r in rows), dtype=np.float64, count=len(rows))
+        first = np.clip(np.floor((starts - t0) / slot_seconds), 0, n_slots).astype(np.int64)
+        last = np.clip(np.ceil((ends - t0) / slot_seconds), 0, n_slots).astype(np.int64)
+        np.add.at(diff, (idx, first), 1)
+        np.add.at(diff, (idx, last), -1)
+    return (np.cumsum(diff, axis=1)[:, :n_slots] > 0).astype(np.uint8)
+
+
+def encode_bitmap(row):
+    """Wiersz siatki jako base64 z bitów (MSB pierwszy, dopełnione zerami do bajtu)."""
+    return base64.b64encode(np.packbits(row).tobytes()).decode('ascii')
+
+
+def encode_rle(row):
+    """Wiersz siatki jako naprzemienne długości serii, zaczynając od wolnych slotów."""
+    if not len(row):
+        return []
+    edges = np.flatnonzero(row[1:] != row[:-1]) + 1
+    runs = np.diff(np.concatenate(([0], edges, [len(row)]))).tolist()
+    return [0] + runs if row[0] else runs
@@ -0,0 +1,150 @@
+"""
+Cache odpowiedzi API do odczytu (podsumowania, lista rezerwacji).
+
+Klucz to nazwa widoku + znormalizowane parametry zapytania + bieżący dzień
+(domyślne zakresy dat liczone są od "dziś"). Wpisy zapisujemy z wersją
+danych (parametr ``version`` cache Django); każdy zapis rezerwacji, sali,
+użytkownika lub serii podbija wersję po commicie, więc stare wpisy przestają
+być czytane i wygasają same po API_CACHE_TIMEOUT.
+
+Wersja i liczniki trafień leżą w skonfigurowanym cache (settings.CACHES),
+więc unieważnienie działa między workerami, o ile backend jest wspólny
+(plikowy na jednym hoście, Redis/Memcached na wielu). Backend plikowy
+podbija wersję bez atomowości (odczyt i zapis), więc przy bardzo gęstych
+zapisach dwa podbicia mogą dać ten sam numer – wpis żyje wtedy najwyżej
+API_CACHE_TIMEOUT.
+
+Ścieżki omijające sygnały (QuerySet.update, bulk_create) wołają
+``bump_version`` same – patrz bookings/signals.py i rollups.update_bookings.
+
+Z tych samych wersji liczymy ETagi (``etag_func`` dla dekoratora
+django.views.decorators.http.condition): zgodny If-None-Match dostaje 304
+bez zapytań do bazy. Powiadomienia mają osobną wersję (NOTIFICATIONS),
+podbijaną razem z licznikami NotificationCounter.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils import timezone
+
+# Zakresy wersji: rezerwacje, sale, użytkownicy, serie / powiadomienia
+DATA = 'data'
+NOTIFICATIONS = 'notifications'
+
+HITS_KEY = 'bookings:response-cache:hits'
+MISSES_KEY = 'bookings:response-cache:misses'
+
+
+def _version_key(scope):
+    return f"bookings:{scope}-version"
+
+
+def data_version(scope=DATA):
+    key = _version_key(scope)
+    version = cache.get(key)
+    if version is None:
+        # Po wyczyszczeniu cache zaczynamy od znacznika czasu, a nie od 1,
+        # żeby nie trafić w wpisy zapisane ze starą wersją o tym samym numerze
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(scope=DATA, **kwargs):
+    """Nowa wersja danych; przyjmuje **kwargs, żeby mogła być odbiorcą sygnału."""
+    try:
+        return cache.incr(_version_key(scope))
+    except ValueError:
+        data_version(scope)
+        return cache.incr(_version_key(scope))
+
+
+def bump_notifications_version():
+    return bump_version(NOTIFICATIONS)
+
+
+def _count(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def stats():
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / (hits + misses), 4) if hits + misses else 0,
+        'version': data_version(),
+    }
+
+
+def response_key(name, request, lists=()):
+    """
+    Klucz z parametrów GET: kolejność parametrów i puste wartości bez znaczenia,
+    parametry z ``lists`` (wartości po przecinku) jako posortowane zbiory.
+    """
+    params = []
+    for param in sorted(request.GET):
+        values = [v.strip() for v in request.GET.getlist(param) if v.strip()]
+        if param in lists:
+            values = sorted({x.strip() for v in values for x in v.split(',') if x.strip()})
+        if values:
+            params.append(f"{param}={','.join(values)}")
+    raw = '&'.join(params)
+    digest = hashlib.sha1(f"{timezone.localdate()}|{raw}".encode()).hexdigest()
+    return f"bookings:response:{name}:{digest}"
+
+
+def etag(name, request, lists=(), scopes=(DATA,)):
+    """Silny ETag: klucz odpowiedzi i wersje danych z ``scopes``, bez liczenia treści."""
+    versions = '|'.join(str(data_version(scope)) for scope in scopes)
+    return hashlib.sha1(f"{response_key(name, request, lists)}|{versions}".encode()).hexdigest()
+
+
+def etag_func(name, lists=(), scopes=(DATA,)):
+    """etag_func dla @condition; parametry jak w cached_response."""
+    def func(request, *args, **kwargs):
+        return etag(name, request, lists, scopes)
+    return func
+
+
+def cached_response(name, lists=(), timeout=None):
+    """
+    Dekorator widoku GET zwracającego JSON: odpowiedzi 200 trzymamy w cache
+    z bieżącą wersją danych. Nagłówek X-Cache: HIT/MISS.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'GET':
+                return view(request, *args, **kwargs)
+            key = response_key(name, request, lists)
+            version = data_version()
+            cached = cache.get(key, version=version)
+            if cached is not None:
+                _count(HITS_KEY)
+                response = HttpResponse(cached['content'], content_type=cached['content_type'])
+                response['X-Cache'] = 'HIT'
+                return response
+
+            _count(MISSES_KEY)
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200 and not response.streaming:
+                cache.set(
+                    key,
+                    {'content': response.content, 'content_type': response['Content-Type']},
+                    timeout=timeout if timeout is not None else getattr(settings, 'API_CACHE_TIMEOUT', 300),
+                    version=version,
+                )
+            response['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,220 @@
+"""
+Zdarzenia na żywo dla przeglądarek (Server-Sent Events, tylko pod ASGI).
+
+Broadcaster trzyma w procesie listę podłączonych klientów, każdy z własną
+ograniczoną kolejką asyncio. Zdarzenia trafiają do niego z dwóch źródeł:
+
+- sygnały Booking/Notification w tym procesie (po commicie transakcji),
+- poller bazy – dwa zapytania po indeksie (nowe powiadomienia, zmienione
+  rezerwacje) co EVENTS_POLL_INTERVAL sekund na proces, niezależnie od liczby kart. Łapie zapisy z innych workerów i komend
+  (process_outbox, dispatch_reminders). 0 wyłącza poller. Powiadomienia
+  czyta z zakładką POLL_OVERLAP id, żeby nie zgubić późno zatwierdzonych.
+
+Zdarzenie z obu źródeł ma ten sam klucz, więc klient dostaje je raz.
+"""
+import asyncio
+import json
+import logging
+import threading
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Rozmiar kolejki klienta; przepełniona oznacza wolnego klienta, który dostanie "resync"
+QUEUE_SIZE = 100
+# Ile ostatnich kluczy zdarzeń pamiętamy do odrzucania duplikatów
+RECENT_KEYS = 2000
+# Ile wierszy poller pobiera w jednym odpytaniu
+POLL_BATCH = 500
+# Ile id powiadomień poniżej kursora odpytujemy ponownie: przy kilku workerach
+# (process_outbox) wiersz z niższym id może zostać zatwierdzony po wyższym.
+# Powtórzenia odrzucamy po kluczu zdarzenia (tutaj) albo po id (klient API).
+POLL_OVERLAP = 100
+
+
+def poll_interval():
+    return getattr(settings, 'EVENTS_POLL_INTERVAL', 5.0)
+
+
+def heartbeat_interval():
+    return getattr(settings, 'EVENTS_HEARTBEAT', 25.0)
+
+
+def notification_event(notification):
+    return {
+        'key': f"notification:{notification.id}",
+        'type': 'notification',
+        'id': notification.id,
+        'user_id': notification.user_id,
+        'data': {
+            'id': notification.id,
+            'message': notification.message,
+            'created_at': notification.created_at.isoformat() if notification.created_at else None,
+            'broadcast': notification.user_id is None,
+            'user_id': notification.user_id,
+        },
+    }
+
+
+def booking_event(booking_id, room_id, title, start_time, end_time, status, updated_at, created):
+    return {
+        'key': f"booking:{booking_id}:{updated_at.isoformat()}",
+        'type': 'booking.created' if created else ('booking.cancelled' if status == 'cancelled' else 'booking.updated'),
+        'data': {
+            'id': booking_id,
+            'room_id': room_id,
+            'title': title,
+            'start_time': start_time.isoformat(),
+            'end_time': end_time.isoformat(),
+            'status': status,
+        },
+    }
+
+
+class Subscriber:
+    def __init__(self, loop, user_id):
+        self.loop = loop
+        self.user_id = user_id
+        self.queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self.overflowed = False
+
+    def offer(self, event):
+        # Wywoływane w pętli zdarzeń (call_soon_threadsafe)
+        user_id = event.get('user_id')
+        if user_id is not None and user_id != self.user_id:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+
+class Broadcaster:
+    def __init__(self):
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._recent = OrderedDict()
+        self._poller = None
+        self._last_notification_id = None
+        # (updated_at, id) ostatniej wysłanej zmiany rezerwacji
+        self._last_booking_change = None
+
+    @property
+    def has_subscribers(self):
+        return bool(self._subscribers)
+
+    def subscribe(self, user_id):
+        loop = asyncio.get_running_loop()
+        subscriber = Subscriber(loop, user_id)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        if poll_interval() and (self._poller is None or self._poller.done()):
+            self._poller = loop.create_task(self._poll_loop())
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def _seen(self, key):
+        with self._lock:
+            if key in self._recent:
+                return True
+            self._recent[key] = None
+            if len(self._recent) > RECENT_KEYS:
+                self._recent.popitem(last=False)
+            return False
+
+    def publish(self, event):
+        """Bezpieczne z dowolnego wątku; bez podłączonych klientów nic nie robi."""
+        with self._lock:
+            subscribers = list(self._subscribers)
+        if not subscribers or self._seen(event['key']):
+            return
+        for subscriber in subscribers:
+            try:
+                subscriber.loop.call_soon_threadsafe(subscriber.offer, event)
+            except RuntimeError:
+                # Pętla zdarzeń klienta już zamknięta
+                self.unsubscribe(subscriber)
+
+    async def _poll_loop(self):
+        while True:
+            with self._lock:
+                if not self._subscribers:
+                    self._poller = None
+                    return
+            try:
+                # thread_sensitive=False: zadanie przeżywa żądanie, które je uruchomiło
+                for event in await sync_to_async(self._poll_once, thread_sensitive=False)():
+                    self.publish(event)
+            except Exception:
+                # Chwilowy błąd bazy nie może zabić strumieni; spróbujemy w kolejnym cyklu
+                logger.exception("Błąd odpytywania bazy o zdarzenia")
+            await asyncio.sleep(poll_interval())
+
+    def _poll_once(self):
+        from django.db import connection
+
+        try:
+            return self._fetch_events()
+        finally:
+            # Wątek z puli executora – nie zostawiamy w nim otwartego połączenia
+            connection.close()
+
+    def _fetch_events(self):
+        from django.db.models import Q
+
+        from .models import Booking, Notification
+
+        if self._last_notification_id is None:
+            # Start od bieżącego stanu – historii nie wysyłamy
+            self._last_notification_id = Notification.objects.order_by('-id').values_list('id', flat=True).first() or 0
+            # Zakładka kolejnego odpytania obejmie też te – to historia, nie nowe zdarzenia
+            for notification_id in Notification.objects.filter(
+                id__gt=self._last_notification_id - POLL_OVERLAP,
+            ).values_list('id', flat=True):
+                self._seen(f"notification:{notification_id}")
+            self._last_booking_change = Booking.objects.order_by('-updated_at', '-id').values_list('updated_at', 'id').first()
+            return []
+
+        events = []
+        # Powtórzone z zakładki odrzuca publish() po kluczu (RECENT_KEYS > POLL_OVERLAP)
+        notifications = list(
+            Notification.objects.filter(id__gt=self._last_notification_id - POLL_OVERLAP).order_by('id')[:POLL_BATCH]
+        )
+        if notifications:
+            self._last_notification_id = max(self._last_notification_id, notifications[-1].id)
+        events.extend(notification_event(n) for n in notifications)
+
+        # Kursor (updated_at, id): wiersze zmienione jednym update mają ten sam
+        # updated_at i mogą trafić na granicę paczki
+        bookings = Booking.objects.order_by('updated_at', 'id')
+        if self._last_booking_change is not None:
+            changed_at, last_id = self._last_booking_change
+            bookings = bookings.filter(Q(updated_at__gt=changed_at) | Q(updated_at=changed_at, id__gt=last_id))
+        rows = list(bookings.values_list(
+            'id', 'room_id', 'title', 'start_time', 'end_time', 'status', 'updated_at', 'created_at',
+        )[:POLL_BATCH])
+        if rows:
+            self._last_booking_change = (rows[-1][6], rows[-1][0])
+        for booking_id, room_id, title, start, end, status, updated_at, created_at in rows:
+            # Wiersz nowy, jeśli od utworzenia nie był zmieniany (auto_now ustawia updated_at przy zapisie)
+            created = abs((updated_at - created_at).total_seconds()) < 1
+            events.append(booking_event(booking_id, room_id, title, start, end, status, updated_at, created))
+        return events
+
+
+broadcaster = Broadcaster()
+
+
+def format_sse(event):
+    lines = []
+    if event.get('id') is not None:
+        lines.append(f"id: {event['id']}")
+    lines.append(f"event: {event['type']}")
+    lines.append(f"data: {json.dumps(event['data'], ensure_ascii=False)}")
+    return "\n".join(lines) + "\n\n"
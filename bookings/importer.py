@@ -0,0 +1,297 @@
+"""
+Strumieniowy import rezerwacji z CSV lub NDJSON.
+
+Wiersze czytamy leniwie i przetwarzamy paczkami po ``chunk_size``: walidacja,
+jedno zapytanie zakresowe na salę w paczce do wykrycia kolizji, zapis jednym
+bulk_create. W pamięci jest naraz tylko jedna paczka i ograniczona liczba
+błędów, więc pliki z milionami wierszy nie zwiększają zużycia pamięci.
+
+Kolumny: room_id, user_id, title, start_time, end_time (wymagane) oraz
+description, attendees_count, status (opcjonalne). Czasy w ISO 8601; czas bez
+strefy jest interpretowany w strefie TIME_ZONE.
+"""
+import codecs
+import csv
+import json
+from bisect import bisect_left, bisect_right
+from itertools import islice
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .availability import RoomSchedule, series_interval_id
+from .models import Booking, Room, User, is_overlap_violation
+from .recurrence import virtual_occurrences
+from .signals import bookings_bulk_created
+
+FORMATS = ('csv', 'ndjson')
+REQUIRED_FIELDS = ('room_id', 'user_id', 'title', 'start_time', 'end_time')
+STATUSES = {value for value, _ in Booking.STATUS_CHOICES}
+
+DEFAULT_CHUNK_SIZE = 1000
+DEFAULT_MAX_ERRORS = 1000
+
+
+class RowError(ValueError):
+    pass
+
+
+def iter_records(lines, fmt):
+    """
+    Zamienia iterowalne linie (bytes lub str) na pary (numer_wiersza, rekord).
+    Rekord to dict albo RowError, gdy wiersza nie da się odczytać.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Nieobsługiwany format: {fmt}")
+    lines = _decoded(lines)
+    if fmt == 'csv':
+        reader = csv.DictReader(lines)
+        for record in reader:
+            if None in record:
+                yield reader.line_num, RowError("Za dużo kolumn w wierszu.")
+            else:
+                yield reader.line_num, record
+        return
+    for line_no, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield line_no, RowError("Niepoprawny JSON.")
+            continue
+        if not isinstance(record, dict):
+            yield line_no, RowError("Wiersz musi być obiektem JSON.")
+            continue
+        yield line_no, record
+
+
+def _decoded(lines):
+    lines = iter(lines)
+    first = next(lines, None)
+    if first is None:
+        return
+    if isinstance(first, str):
+        yield first.lstrip('\ufeff')
+        yield from lines
+        return
+    # Dekoder przyrostowy – znak UTF-8 może być rozcięty między kawałkami strumienia
+    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    yield decoder.decode(first)
+    for line in lines:
+        yield decoder.decode(line)
+    tail = decoder.decode(b'', final=True)
+    if tail:
+        yield tail
+
+
+def _parse_time(value, field):
+    dt = parse_datetime(str(value).strip().replace('Z', '+00:00')) if value else None
+    if dt is None:
+        raise RowError(f"Niepoprawny format daty w polu {field}.")
+    if timezone.is_naive(dt):
+        dt = timezone.make_aware(dt)
+    return dt
+
+
+def _parse_int(value, field):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise RowError(f"Pole {field} musi być liczbą całkowitą.")
+
+
+def _validate(record):
+    for field in REQUIRED_FIELDS:
+        if record.get(field) in (None, ''):
+            raise RowError(f"Brak wymaganego pola: {field}")
+    start_time = _parse_time(record['start_time'], 'start_time')
+    end_time = _parse_time(record['end_time'], 'end_time')
+    if start_time >= end_time:
+        raise RowError("Czas rozpoczęcia musi być przed czasem zakończenia.")
+    status = record.get('status') or 'confirmed'
+    if status not in STATUSES:
+        raise RowError(f"Nieznany status: {status}")
+    attendees = record.get('attendees_count')
+    return Booking(
+        room_id=_parse_int(record['room_id'], 'room_id'),
+        user_id=_parse_int(record['user_id'], 'user_id'),
+        title=str(record['title'])[:200],
+        description=record.get('description') or None,
+        start_time=start_time,
+        end_time=end_time,
+        status=status,
+        attendees_count=_parse_int(attendees, 'attendees_count') if attendees not in (None, '') else 1,
+    )
+
+
+class BookingImporter:
+    """
+    Import paczkami. Wynik (``summary()``) zawiera liczniki i co najwyżej
+    ``max_errors`` błędów wierszy; kolejne są tylko liczone.
+    """
+
+    def __init__(self, chunk_size=DEFAULT_CHUNK_SIZE, max_errors=DEFAULT_MAX_ERRORS,
+                 dry_run=False, notify=False):
+        self.chunk_size = chunk_size
+        self.max_errors = max_errors
+        self.dry_run = dry_run
+        self.notify = notify
+        self.rows = 0
+        self.imported = 0
+        self.rejected = 0
+        self.errors = []
+        # Sale są nieliczne – trzymamy je przez cały import; użytkowników sprawdzamy per paczka
+        self._rooms = {}
+        # dry_run nie zapisuje przyjętych wierszy, więc kolejne paczki nie zobaczą ich
+        # w bazie. Trzymamy je per sala jako (starty, końce) – rozłączne, więc obie
+        # listy są posortowane. Kosztuje to dwa znaczniki czasu na przyjęty wiersz.
+        self._accepted = {}
+
+    def run(self, records):
+        records = iter(records)
+        while True:
+            chunk = list(islice(records, self.chunk_size))
+            if not chunk:
+                break
+            self._process_chunk(chunk)
+        return self.summary()
+
+    def summary(self):
+        return {
+            'rows': self.rows,
+            'imported': self.imported,
+            'rejected': self.rejected,
+            'dry_run': self.dry_run,
+            'errors': self.errors,
+            'errors_truncated': self.rejected > len(self.errors),
+        }
+
+    def _reject(self, line_no, message):
+        self.rejected += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'line': line_no, 'error': str(message)})
+
+    def _process_chunk(self, chunk):
+        self.rows += len(chunk)
+        first_error = len(self.errors)
+        candidates = []
+        for line_no, record in chunk:
+            if isinstance(record, RowError):
+                self._reject(line_no, record)
+                continue
+            try:
+                candidates.append((line_no, _validate(record)))
+            except RowError as exc:
+                self._reject(line_no, exc)
+
+        candidates = self._check_references(candidates)
+        candidates = self._check_conflicts(candidates)
+        if candidates and not self.dry_run:
+            self._insert(candidates)
+        elif self.dry_run:
+            self.imported += len(candidates)
+        self.errors[first_error:] = sorted(self.errors[first_error:], key=lambda e: e['line'])
+
+    def _check_references(self, candidates):
+        if not candidates:
+            return []
+        unknown_rooms = {b.room_id for _, b in candidates} - self._rooms.keys()
+        if unknown_rooms:
+            found = dict.fromkeys(unknown_rooms)
+            for room_id, is_active, capacity in Room.objects.filter(id__in=unknown_rooms).values_list('id', 'is_active', 'capacity'):
+                found[room_id] = (is_active, capacity)
+            self._rooms.update(found)
+        user_ids = set(User.objects.filter(id__in={b.user_id for _, b in candidates}).values_list('id', flat=True))
+
+        valid = []
+        for line_no, booking in candidates:
+            room = self._rooms[booking.room_id]
+            if room is None:
+                self._reject(line_no, "Sala nie istnieje.")
+            elif not room[0]:
+                self._reject(line_no, "Sala jest nieaktywna.")
+            elif booking.user_id not in user_ids:
+                self._reject(line_no, "Użytkownik nie istnieje.")
+            elif booking.attendees_count > room[1]:
+                self._reject(line_no, f"Zbyt wielu uczestników. Pojemność sali: {room[1]}.")
+            else:
+                valid.append((line_no, booking))
+        return valid
+
+    def _check_conflicts(self, candidates):
+        ranges = {}
+        for _, booking in candidates:
+            if booking.status == 'cancelled':
+                continue
+            lo, hi = ranges.get(booking.room_id, (booking.start_time, booking.end_time))
+            ranges[booking.room_id] = (min(lo, booking.start_time), max(hi, booking.end_time))
+
+        schedules = {}
+        for room_id, (lo, hi) in ranges.items():
+            intervals = list(
+                Booking.objects.filter(room_id=room_id, start_time__lt=hi, end_time__gt=lo)
+                .exclude(status='cancelled')
+                .values_list('id', 'start_time', 'end_time')
+            )
+            for s, e, series_id in virtual_occurrences([room_id], lo, hi).get(room_id, []):
+                intervals.append((series_interval_id(series_id), s, e))
+            intervals.extend(self._accepted_between(room_id, lo, hi))
+            schedules[room_id] = RoomSchedule(room_id, lo, hi, intervals)
+
+        accepted = []
+        for line_no, booking in candidates:
+            if booking.status != 'cancelled':
+                schedule = schedules[booking.room_id]
+                if schedule.overlaps(booking.start_time, booking.end_time):
+                    self._reject(line_no, "Sala jest już zarezerwowana w tym czasie.")
+                    continue
+                # Kolejne wiersze paczki sprawdzamy też względem już przyjętych
+                schedule.add(('import', line_no), booking.start_time, booking.end_time)
+                if self.dry_run:
+                    self._accept(booking)
+            accepted.append((line_no, booking))
+        return accepted
+
+    def _accept(self, booking):
+        starts, ends = self._accepted.setdefault(booking.room_id, ([], []))
+        pos = bisect_left(starts, booking.start_time)
+        starts.insert(pos, booking.start_time)
+        ends.insert(pos, booking.end_time)
+
+    def _accepted_between(self, room_id, lo, hi):
+        """Przyjęte w poprzednich paczkach (dry_run) przedziały sali nachodzące na [lo, hi)."""
+        starts, ends = self._accepted.get(room_id, ((), ()))
+        i = bisect_right(ends, lo)
+        while i < len(starts) and starts[i] < hi:
+            yield ('import', None), starts[i], ends[i]
+            i += 1
+
+    def _insert(self, candidates):
+        bookings = [booking for _, booking in candidates]
+        try:
+            with transaction.atomic():
+                created = Booking.objects.bulk_create(bookings)
+                bookings_bulk_created.send(sender=Booking, bookings=created, notify=self.notify, announce=False)
+            self.imported += len(created)
+            return
+        except IntegrityError as exc:
+            if not is_overlap_violation(exc):
+                raise
+
+        # Ktoś zarezerwował salę między sprawdzeniem a zapisem – wstawiamy wiersz po wierszu
+        created = []
+        with transaction.atomic():
+            for line_no, booking in candidates:
+                booking.pk = None
+                try:
+                    with transaction.atomic():
+                        created.extend(Booking.objects.bulk_create([booking]))
+                except IntegrityError as exc:
+                    if not is_overlap_violation(exc):
+                        raise
+                    self._reject(line_no, "Sala jest już zarezerwowana w tym czasie.")
+            if created:
+                bookings_bulk_created.send(sender=Booking, bookings=created, notify=self.notify, announce=False)
+        self.imported += len(created)
@@ -0,0 +1,25 @@
+"""
+Tworzenie rezerwacji bez blokad po stronie aplikacji.
+
+Kolizje rezerwacji jednej sali odrzuca ograniczenie bookings_no_overlap w bazie
+(migracja 0004), więc INSERT nie potrzebuje wcześniejszego sprawdzania ani
+blokady sali; rezerwacje różnych sal zawsze idą równolegle. Zachowanie pod
+obciążeniem sprawdza benchmark_booking_locks.
+"""
+from django.db import IntegrityError, transaction
+
+from .models import Booking, is_overlap_violation
+
+
+def create_booking_exclusive(room, start_time, end_time, **fields):
+    """
+    Tworzy rezerwację bez wcześniejszego sprawdzania dostępności – kolizję
+    zgłasza ograniczenie bookings_no_overlap w bazie. Przy konflikcie zwraca None.
+    """
+    try:
+        with transaction.atomic():
+            return Booking.objects.create(room=room, start_time=start_time, end_time=end_time, **fields)
+    except IntegrityError as exc:
+        if not is_overlap_violation(exc):
+            raise
+        return None
@@ -0,0 +1,118 @@
+"""
+Wielowątkowy benchmark tworzenia rezerwacji chronionych ograniczeniem
+bookings_no_overlap (bez blokad po stronie aplikacji).
+
+Każdy wątek próbuje rezerwować losowe terminy w kilku tymczasowych salach,
+celowo z kolizjami. Na końcu raportujemy rezerwacje/s i sprawdzamy, czy
+w żadnej sali nie powstały nakładające się rezerwacje. Dane benchmarku są
+usuwane po zakończeniu.
+
+    python manage.py benchmark_booking_locks --threads 8 --rooms 4 --attempts 50
+"""
+import random
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models.signals import post_save
+from django.utils import timezone
+
+from bookings.locks import create_booking_exclusive
+from bookings.models import Booking, Room, User
+from bookings.signals import create_notifications_after_booking
+
+
+class Command(BaseCommand):
+    help = "Benchmark równoległego tworzenia rezerwacji (kolizje odrzuca baza)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--rooms', type=int, default=4)
+        parser.add_argument('--attempts', type=int, default=50, help="Liczba prób na wątek")
+        parser.add_argument('--slots', type=int, default=40, help="Liczba godzinnych terminów na salę")
+        parser.add_argument('--with-notifications', action='store_true',
+                            help="Nie wyłączaj powiadomień wysyłanych po utworzeniu rezerwacji")
+
+    def handle(self, *args, **options):
+        if options['threads'] < 1 or options['rooms'] < 1 or options['slots'] < 1:
+            raise CommandError("threads, rooms i slots muszą być dodatnie")
+
+        tag = uuid.uuid4().hex[:8]
+        user = User.objects.create(email=f"bench-{tag}@example.invalid", name=f"Benchmark {tag}")
+        rooms = [
+            Room.objects.create(name=f"__bench_{tag}_{i}", capacity=100, is_active=True)
+            for i in range(options['rooms'])
+        ]
+        base = (timezone.now() + timedelta(days=365)).replace(minute=0, second=0, microsecond=0)
+
+        if not options['with_notifications']:
+            post_save.disconnect(create_notifications_after_booking, sender=Booking)
+
+        stats = {'created': 0, 'conflicts': 0, 'errors': 0}
+        stats_lock = threading.Lock()
+
+        def worker(seed):
+            rnd = random.Random(seed)
+            local = {'created': 0, 'conflicts': 0, 'errors': 0}
+            try:
+                for _ in range(options['attempts']):
+                    room = rnd.choice(rooms)
+                    start = base + timedelta(hours=rnd.randrange(options['slots']), minutes=rnd.choice((0, 30)))
+                    try:
+                        booking = create_booking_exclusive(
+                            room, start, start + timedelta(hours=1),
+                            user=user, title="Benchmark",
+                        )
+                    except Exception:
+                        local['errors'] += 1
+                        continue
+                    local['created' if booking else 'conflicts'] += 1
+            finally:
+                connection.close()
+                with stats_lock:
+                    for key, value in local.items():
+                        stats[key] += value
+
+        try:
+            threads = [threading.Thread(target=worker, args=(i,)) for i in range(options['threads'])]
+            started = time.perf_counter()
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            elapsed = time.perf_counter() - started
+
+            double_bookings = self._count_overlaps(rooms)
+        finally:
+            if not options['with_notifications']:
+                post_save.connect(create_notifications_after_booking, sender=Booking)
+            Booking.objects.filter(room__in=rooms).delete()
+            Room.objects.filter(id__in=[r.id for r in rooms]).delete()
+            user.delete()
+
+        attempts = options['threads'] * options['attempts']
+        self.stdout.write(f"Baza:                {connection.vendor}")
+        self.stdout.write(f"Wątki × próby:       {options['threads']} × {options['attempts']} = {attempts}")
+        self.stdout.write(f"Utworzone:           {stats['created']}")
+        self.stdout.write(f"Konflikty (409):     {stats['conflicts']}")
+        self.stdout.write(f"Błędy:               {stats['errors']}")
+        self.stdout.write(f"Czas:                {elapsed:.2f} s")
+        self.stdout.write(f"Rezerwacje/s:        {stats['created'] / elapsed if elapsed else 0:.1f}")
+        self.stdout.write(f"Próby/s:             {attempts / elapsed if elapsed else 0:.1f}")
+
+        if double_bookings:
+            raise CommandError(f"Wykryto {double_bookings} nakładających się par rezerwacji!")
+        self.stdout.write(self.style.SUCCESS("Brak podwójnych rezerwacji."))
+
+    def _count_overlaps(self, rooms):
+        overlaps = 0
+        for room in rooms:
+            last_end = None
+            for start, end in room.bookings.exclude(status='cancelled').order_by('start_time').values_list('start_time', 'end_time'):
+                if last_end is not None and start < last_end:
+                    overlaps += 1
+                last_end = end if last_end is None or end > last_end else last_end
+        return overlaps
@@ -0,0 +1,137 @@
+"""
+Benchmark silników podsumowań (bookings/summaries.py): rollup, sql i numpy.
+
+Tworzy tymczasowe sale, użytkowników i rezerwacje rozłożone na rok (bez
+nakładania się w salach), dla każdego rozmiaru liczy pełne podsumowanie roku
+każdym silnikiem i raportuje najlepszy czas oraz szczyt pamięci Pythona
+(tracemalloc). Dane benchmarku są usuwane po zakończeniu.
+
+    python manage.py benchmark_summaries
+    python manage.py benchmark_summaries --sizes 10000 100000 --repeat 5
+"""
+import random
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from bookings import rollups
+from bookings.cache import bump_version
+from bookings.models import Booking, BookingDailyRollup, Room, User
+from bookings.summaries import ENGINES, NUMPY_AVAILABLE, summarize
+
+DEPARTMENTS = ['IT', 'HR', 'Sprzedaż', 'Marketing', 'Finanse', 'Zarząd', None]
+DURATIONS = [15, 30, 45, 60, 60, 90, 120, 180]
+GAPS = [0, 0, 15, 30]
+# Ile rezerwacji przypada na salę – rok przy średnio ~1,5 h na rezerwację z przerwą
+PER_ROOM = 5000
+INSERT_BATCH = 5000
+
+
+class Command(BaseCommand):
+    help = "Porównuje silniki podsumowań rollup, sql i numpy na syntetycznych danych"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+        parser.add_argument('--repeat', type=int, default=3, help="Liczba pomiarów na silnik (liczy się najlepszy)")
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        sizes = sorted(options['sizes'])
+        if not sizes or sizes[0] < 1 or options['repeat'] < 1 or options['users'] < 1:
+            raise CommandError("sizes, repeat i users muszą być dodatnie")
+        engines = [e for e in ENGINES if e != 'numpy' or NUMPY_AVAILABLE]
+        if len(engines) < len(ENGINES):
+            self.stderr.write("NumPy nie zainstalowany – pomijam silnik numpy")
+
+        rnd = random.Random(options['seed'])
+        tag = uuid.uuid4().hex[:8]
+        User.objects.bulk_create([
+            User(email=f"bench-{tag}-{i}@example.invalid", name=f"Benchmark {tag} {i}",
+                 department=rnd.choice(DEPARTMENTS))
+            for i in range(options['users'])
+        ])
+        Room.objects.bulk_create([
+            Room(name=f"__bench_{tag}_{i}", capacity=20, is_active=True)
+            for i in range(max(1, -(-sizes[-1] // PER_ROOM)))
+        ])
+        # Ponowny odczyt: bulk_create nie zwraca id na każdej bazie
+        users = list(User.objects.filter(email__startswith=f"bench-{tag}-"))
+        rooms = list(Room.objects.filter(name__startswith=f"__bench_{tag}_"))
+
+        # Rok zaczynający się od pełnego dnia, daleko w przyszłości
+        tz = timezone.get_current_timezone()
+        start_date = (timezone.localtime(timezone.now(), tz) + timedelta(days=3 * 365)).date()
+        end_date = start_date + timedelta(days=364)
+        base = timezone.make_aware(datetime.combine(start_date, datetime.min.time()), tz)
+        # Kursory w UTC – arytmetyka na czasie lokalnym nakładałaby terminy przy zmianie czasu
+        cursors = [(base + timedelta(hours=8)).astimezone(dt_timezone.utc) for _ in rooms]
+
+        qs = Booking.objects.select_related('room', 'user').filter(room__in=rooms)
+        rollup_qs = BookingDailyRollup.objects.filter(room__in=rooms, day__gte=start_date, day__lte=end_date)
+        room_names = {r.id: r.name for r in rooms}
+        user_names = {u.id: u.name for u in users}
+
+        self.stdout.write(f"{'wiersze':>10} {'silnik':>7} {'czas [s]':>10} {'pamięć [MB]':>12}")
+        created = 0
+        try:
+            for size in sizes:
+                created = self._grow(rnd, rooms, users, cursors, created, size)
+                for engine in engines:
+                    best = None
+                    for _ in range(options['repeat']):
+                        t0 = time.perf_counter()
+                        summarize(qs, start_date, end_date, room_names, user_names, engine=engine, rollups=rollup_qs)
+                        elapsed = time.perf_counter() - t0
+                        best = elapsed if best is None else min(best, elapsed)
+
+                    tracemalloc.start()
+                    summarize(qs, start_date, end_date, room_names, user_names, engine=engine, rollups=rollup_qs)
+                    _, peak = tracemalloc.get_traced_memory()
+                    tracemalloc.stop()
+                    self.stdout.write(f"{size:>10} {engine:>7} {best:>10.3f} {peak / 1024 / 1024:>12.1f}")
+        finally:
+            self._cleanup(rooms, users)
+            # Sale i użytkownicy z bulk_create ominęli sygnały – unieważniamy cache odpowiedzi API
+            bump_version()
+
+    def _grow(self, rnd, rooms, users, cursors, created, size):
+        """Dokłada rezerwacje do łącznej liczby size; sale wypełniane po kolei."""
+        with transaction.atomic():
+            batch = []
+            for n in range(created, size):
+                i = n % len(rooms)
+                start = cursors[i] + timedelta(minutes=rnd.choice(GAPS))
+                end = start + timedelta(minutes=rnd.choice(DURATIONS))
+                cursors[i] = end
+                batch.append(Booking(
+                    room=rooms[i], user=rnd.choice(users), title="Benchmark",
+                    start_time=start, end_time=end, attendees_count=rnd.randint(1, 20),
+                    status='cancelled' if rnd.random() < 0.05 else 'confirmed',
+                ))
+                if len(batch) >= INSERT_BATCH:
+                    self._insert(batch)
+                    batch = []
+            self._insert(batch)
+        return size
+
+    def _insert(self, batch):
+        # Bez sygnału bookings_bulk_created (powiadomienia, indeks) – tylko agregaty
+        Booking.objects.bulk_create(batch)
+        rollups.record_bulk_created(batch)
+
+    def _cleanup(self, rooms, users):
+        ids = Booking.objects.filter(room__in=rooms).values_list('id', flat=True)
+        while True:
+            chunk = list(ids[:INSERT_BATCH])
+            if not chunk:
+                break
+            with rollups.batch():
+                Booking.objects.filter(id__in=chunk).delete()
+        Room.objects.filter(id__in=[r.id for r in rooms]).delete()
+        User.objects.filter(id__in=[u.id for u in users]).delete()
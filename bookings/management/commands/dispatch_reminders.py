@@ -0,0 +1,52 @@
+"""
+Wysyła przypomnienia o rezerwacjach, których termin nadszedł (patrz bookings/reminders.py).
+
+    python manage.py dispatch_reminders            # jednorazowo, np. z crona co minutę
+    python manage.py dispatch_reminders --loop     # proces śpiący do najbliższego terminu
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from bookings.reminders import DEFAULT_BATCH_SIZE, dispatch_due, next_due
+
+
+class Command(BaseCommand):
+    help = "Wysyła należne przypomnienia o rezerwacjach paczkami"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument('--loop', action='store_true', help="Działaj w pętli do przerwania")
+        parser.add_argument('--max-sleep', type=float, default=30.0,
+                            help="Najdłuższa przerwa w sekundach (nowe przypomnienia mogą pojawić się wcześniej)")
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("batch-size musi być dodatni")
+
+        totals = [0, 0, 0]
+        try:
+            while True:
+                sent, skipped, rescheduled = dispatch_due(options['batch_size'])
+                totals[0] += sent
+                totals[1] += skipped
+                totals[2] += rescheduled
+                if sent or skipped or rescheduled:
+                    continue
+                if not options['loop']:
+                    break
+                time.sleep(self._sleep_time(options['max_sleep']))
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Wysłano {totals[0]} przypomnień, pominięto {totals[1]}, przełożono {totals[2]}."
+        ))
+
+    def _sleep_time(self, max_sleep):
+        # Śpimy do najbliższego terminu z indeksu due_at, ale nie dłużej niż max_sleep
+        due = next_due()
+        if due is None:
+            return max_sleep
+        return min(max((due - timezone.now()).total_seconds(), 0.1), max_sleep)
@@ -0,0 +1,58 @@
+"""
+Import rezerwacji z pliku CSV lub NDJSON (patrz bookings/importer.py).
+
+    python manage.py import_bookings rezerwacje.csv
+    python manage.py import_bookings rezerwacje.ndjson --format ndjson --chunk-size 5000 --dry-run
+"""
+import csv
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bookings.importer import DEFAULT_CHUNK_SIZE, FORMATS, BookingImporter, iter_records
+
+
+class Command(BaseCommand):
+    help = "Strumieniowy import rezerwacji z CSV/NDJSON paczkami przez bulk_create"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Ścieżka do pliku ('-' czyta ze stdin)")
+        parser.add_argument('--format', choices=FORMATS, default=None,
+                            help="Domyślnie według rozszerzenia pliku (.ndjson/.jsonl → ndjson, inaczej csv)")
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument('--max-errors', type=int, default=100, help="Ile błędów wierszy wypisać")
+        parser.add_argument('--dry-run', action='store_true', help="Tylko walidacja, bez zapisu")
+        parser.add_argument('--notify', action='store_true', help="Twórz przypomnienia dla importowanych rezerwacji")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('ndjson' if path.endswith(('.ndjson', '.jsonl')) else 'csv')
+        if options['chunk_size'] < 1:
+            raise CommandError("chunk-size musi być dodatni")
+
+        importer = BookingImporter(
+            chunk_size=options['chunk_size'],
+            max_errors=options['max_errors'],
+            dry_run=options['dry_run'],
+            notify=options['notify'],
+        )
+        try:
+            if path == '-':
+                summary = importer.run(iter_records(sys.stdin.buffer, fmt))
+            else:
+                with open(path, 'rb') as f:
+                    summary = importer.run(iter_records(f, fmt))
+        except OSError as exc:
+            raise CommandError(f"Nie można otworzyć pliku: {exc}")
+        except csv.Error as exc:
+            raise CommandError(f"Niepoprawny plik CSV: {exc}")
+
+        for error in summary['errors']:
+            self.stderr.write(f"Wiersz {error['line']}: {error['error']}")
+        if summary['errors_truncated']:
+            self.stderr.write(f"... oraz {summary['rejected'] - len(summary['errors'])} kolejnych błędów")
+
+        verb = "Poprawnych" if summary['dry_run'] else "Zaimportowano"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb}: {summary['imported']} z {summary['rows']} wierszy, odrzucono {summary['rejected']}."
+        ))
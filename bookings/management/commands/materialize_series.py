@@ -0,0 +1,52 @@
+"""
+Zapisuje w tabeli bookings wystąpienia serii rezerwacji w kroczącym horyzoncie.
+
+Uruchamiać cyklicznie (np. raz dziennie z crona):
+
+    python manage.py materialize_series
+    python manage.py materialize_series --horizon-days 30 --series-id <uuid>
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import F, Q
+from django.utils import timezone
+
+from bookings.models import BookingSeries
+from bookings.recurrence import horizon, materialize
+
+
+class Command(BaseCommand):
+    help = "Materializuje wystąpienia serii rezerwacji do horyzontu BOOKING_SERIES_HORIZON_DAYS"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--horizon-days', type=int, default=None,
+                            help="Nadpisuje BOOKING_SERIES_HORIZON_DAYS")
+        parser.add_argument('--series-id', default=None, help="Tylko wskazana seria")
+
+    def handle(self, *args, **options):
+        if options['horizon_days'] is not None:
+            until = timezone.now() + timedelta(days=options['horizon_days'])
+        else:
+            until = horizon()
+
+        series_qs = BookingSeries.objects.filter(
+            Q(until__isnull=True) | Q(until__gte=F('materialized_until')),
+            is_active=True,
+            materialized_until__lt=until,
+        ).order_by('id')
+        if options['series_id']:
+            series_qs = series_qs.filter(series_id=options['series_id'])
+
+        total_created = 0
+        total_skipped = 0
+        for series in series_qs.iterator():
+            created, skipped = materialize(series, until=until)
+            total_created += len(created)
+            total_skipped += len(skipped)
+            for start, _ in skipped:
+                self.stderr.write(f"Seria {series.series_id}: pominięto {start.isoformat()} (sala zajęta)")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Utworzono {total_created} rezerwacji do {until.isoformat()}, pominięto {total_skipped}."
+        ))
@@ -0,0 +1,73 @@
+"""
+Worker tworzący powiadomienia ze zdarzeń outbox (patrz bookings/outbox.py).
+
+Można uruchomić kilka workerów naraz – paczki są rozdzielane przez SKIP LOCKED:
+
+    python manage.py process_outbox                 # jednorazowo opróżnia kolejkę
+    python manage.py process_outbox --loop --sleep 2
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+
+from bookings.models import OutboxEvent
+from bookings.outbox import DEFAULT_BATCH_SIZE, fail_batch, process_batch
+
+
+class Command(BaseCommand):
+    help = "Przetwarza zdarzenia outbox (powiadomienia o rezerwacjach) paczkami"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument('--loop', action='store_true', help="Działaj w pętli, czekając na nowe zdarzenia")
+        parser.add_argument('--sleep', type=float, default=1.0, help="Przerwa w sekundach, gdy kolejka jest pusta")
+        parser.add_argument('--retry-dead', action='store_true',
+                            help="Przywróć porzucone zdarzenia do kolejki przed startem")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError("batch-size musi być dodatni")
+
+        if options['retry_dead']:
+            revived = OutboxEvent.objects.filter(status='dead').update(status='pending', attempts=0)
+            self.stdout.write(f"Przywrócono {revived} porzuconych zdarzeń.")
+
+        total_done = 0
+        total_failed = 0
+        try:
+            while True:
+                done, failed = self._run_batch(batch_size)
+                total_done += done
+                total_failed += failed
+                if done or failed:
+                    continue
+                if not options['loop']:
+                    break
+                time.sleep(options['sleep'])
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Przetworzono {total_done} zdarzeń, nieudanych prób: {total_failed}."
+        ))
+
+    def _run_batch(self, batch_size):
+        try:
+            return process_batch(batch_size)
+        except DatabaseError as exc:
+            self.stderr.write(f"Błąd zapisu paczki: {exc}; przetwarzam zdarzenia pojedynczo")
+
+        # Pojedynczo, żeby jedno wadliwe zdarzenie nie blokowało reszty paczki
+        done = failed = 0
+        for _ in range(batch_size):
+            try:
+                d, f = process_batch(1)
+            except DatabaseError as exc:
+                d, f = 0, fail_batch(1, exc)
+            if not d and not f:
+                break
+            done += d
+            failed += f
+        return done, failed
@@ -0,0 +1,51 @@
+"""
+Usuwa stare powiadomienia według reguł retencji (patrz bookings/retention.py).
+
+Uruchamiać cyklicznie (np. raz dziennie z crona):
+
+    python manage.py purge_notifications
+    python manage.py purge_notifications --dry-run
+    python manage.py purge_notifications --archive --batch-size 5000 --sleep 0.1
+
+Na PostgreSQL miejsce po usuniętych wierszach odzyskuje (auto)VACUUM; raport
+podaje szacunek na podstawie długości treści usuniętych wierszy.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from bookings.retention import DEFAULT_BATCH_SIZE, purge
+
+
+class Command(BaseCommand):
+    help = "Usuwa (opcjonalnie archiwizuje) powiadomienia starsze niż okres retencji"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                            help="Szerokość zakresu id usuwanego w jednej transakcji")
+        parser.add_argument('--archive', action='store_true', default=None,
+                            help="Przenieś do notifications_archive (domyślnie NOTIFICATION_ARCHIVE)")
+        parser.add_argument('--no-archive', action='store_false', dest='archive')
+        parser.add_argument('--dry-run', action='store_true', help="Tylko policz, nic nie usuwaj")
+        parser.add_argument('--sleep', type=float, default=0.0, help="Przerwa w sekundach między paczkami")
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("batch-size musi być dodatni")
+
+        def progress(stats):
+            if options['verbosity'] > 1:
+                self.stdout.write(f"Paczka {stats['batches']}: usunięto łącznie {stats['notifications']}")
+
+        stats = purge(
+            batch_size=options['batch_size'],
+            archive=options['archive'],
+            dry_run=options['dry_run'],
+            sleep=options['sleep'],
+            progress=progress,
+        )
+
+        verb = "Do usunięcia" if options['dry_run'] else "Usunięto"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb}: {stats['notifications']} powiadomień i {stats['receipts']} potwierdzeń odczytu "
+            f"(ok. {stats['bytes'] / 1024 / 1024:.2f} MB) w {stats['batches']} paczkach. "
+            f"Zarchiwizowano: {stats['archived']}."
+        ))
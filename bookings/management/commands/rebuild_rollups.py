@@ -0,0 +1,104 @@
+"""
+Przebudowuje dzienne agregaty rezerwacji (booking_daily_rollups) od zera
+dla zakresu dni – po migracji, imporcie z pominięciem sygnałów albo ręcznych
+zmianach w bazie. Zakres dzielony jest na kawałki po --chunk-days dni,
+przetwarzane równolegle w --workers procesach (każdy z własnym połączeniem).
+
+    python manage.py rebuild_rollups
+    python manage.py rebuild_rollups --start 2025-01-01 --end 2025-12-31
+    python manage.py rebuild_rollups --workers 4 --chunk-days 7
+
+Bez --start/--end bierze dni od pierwszej do ostatniej rezerwacji. Bieżące
+zapisy rezerwacji mogą trwać: na PostgreSQL kawałek czeka, aż zapisy w jego
+dniach się zakończą (blokady doradcze, patrz bookings/rollups.py).
+"""
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import timedelta
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Max, Min
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from bookings import rollups
+from bookings.models import Booking, BookingDailyRollup
+
+
+def _rebuild_chunk(start_date, end_date):
+    # Wywoływane w procesie roboczym
+    return start_date, end_date, rollups.rebuild(start_date, end_date)
+
+
+class Command(BaseCommand):
+    help = "Przebudowuje dzienne agregaty rezerwacji dla zakresu dni (równolegle)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help="Pierwszy dzień (YYYY-MM-DD)")
+        parser.add_argument('--end', help="Ostatni dzień (YYYY-MM-DD)")
+        parser.add_argument('--chunk-days', type=int, default=31, help="Liczba dni przebudowywana w jednej transakcji")
+        parser.add_argument('--workers', type=int, default=1, help="Liczba procesów")
+
+    def handle(self, *args, **options):
+        if options['chunk_days'] < 1 or options['workers'] < 1:
+            raise CommandError("chunk-days i workers muszą być dodatnie")
+        start_date, end_date = self._range(options['start'], options['end'])
+        if start_date is None:
+            self.stdout.write("Brak rezerwacji – nie ma czego przebudowywać.")
+            return
+
+        chunks = []
+        day = start_date
+        while day <= end_date:
+            last = min(day + timedelta(days=options['chunk_days'] - 1), end_date)
+            chunks.append((day, last))
+            day = last + timedelta(days=1)
+
+        results = []
+        if options['workers'] == 1 or len(chunks) == 1:
+            for chunk in chunks:
+                results.append(_rebuild_chunk(*chunk))
+                self._progress(results[-1], options['verbosity'])
+        else:
+            # Procesy potomne nie mogą dziedziczyć otwartych połączeń z bazą
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=options['workers'], initializer=django.setup) as pool:
+                futures = [pool.submit(_rebuild_chunk, *chunk) for chunk in chunks]
+                for future in as_completed(futures):
+                    results.append(future.result())
+                    self._progress(results[-1], options['verbosity'])
+
+        bookings = sum(count for _, _, (count, _) in results)
+        rows = sum(total for _, _, (_, total) in results)
+        self.stdout.write(self.style.SUCCESS(
+            f"Przebudowano {start_date}–{end_date} ({len(chunks)} kawałków): "
+            f"{bookings} rezerwacji, {rows} wierszy agregatów."
+        ))
+
+    def _range(self, start, end):
+        try:
+            start_date = parse_date(start) if start else None
+            end_date = parse_date(end) if end else None
+        except ValueError:
+            start_date = end_date = None
+        if (start and not start_date) or (end and not end_date):
+            raise CommandError("Daty w formacie YYYY-MM-DD")
+        if start_date is None or end_date is None:
+            bounds = Booking.objects.aggregate(first=Min('start_time'), last=Max('start_time'))
+            days = BookingDailyRollup.objects.aggregate(first=Min('day'), last=Max('day'))
+            # Dni z samymi agregatami (rezerwacje usunięte poza sygnałami) też czyścimy
+            firsts = [d for d in (bounds['first'] and timezone.localdate(bounds['first']), days['first']) if d]
+            lasts = [d for d in (bounds['last'] and timezone.localdate(bounds['last']), days['last']) if d]
+            start_date = start_date or (min(firsts) if firsts else None)
+            end_date = end_date or (max(lasts) if lasts else None)
+            if start_date is None or end_date is None:
+                return None, None
+        if start_date > end_date:
+            raise CommandError("start nie może być po end")
+        return start_date, end_date
+
+    def _progress(self, result, verbosity):
+        if verbosity > 1:
+            start_date, end_date, (count, rows) = result
+            self.stdout.write(f"{start_date}–{end_date}: {count} rezerwacji, {rows} wierszy")
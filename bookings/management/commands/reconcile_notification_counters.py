@@ -0,0 +1,32 @@
+"""
+Przelicza liczniki nieprzeczytanych powiadomień (notification_counters) od zera.
+
+Liczniki są zmieniane przyrostowo, więc zapisy z pominięciem aplikacji
+(ręczny SQL, QuerySet.update/delete) mogą je rozjechać. Uruchamiać cyklicznie
+albo po takich operacjach:
+
+    python manage.py reconcile_notification_counters
+    python manage.py reconcile_notification_counters --dry-run
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from bookings.models import NotificationCounter
+
+
+class Command(BaseCommand):
+    help = "Naprawia rozjazdy liczników nieprzeczytanych powiadomień"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Tylko pokaż rozjazdy, nic nie zapisuj")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            drift = NotificationCounter.reconcile()
+            if options['dry_run']:
+                transaction.set_rollback(True)
+
+        for scope, old, new in sorted(drift):
+            self.stdout.write(f"{scope}: {old} -> {new}")
+        verb = "Do poprawy" if options['dry_run'] else "Poprawiono"
+        self.stdout.write(self.style.SUCCESS(f"{verb} liczników: {len(drift)}."))
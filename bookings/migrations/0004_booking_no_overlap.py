@@ -0,0 +1,133 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DatabaseError, migrations
+from django.utils import timezone
+
+
+BTREE_GIST_HELP = (
+    "Ograniczenie bookings_no_overlap wymaga rozszerzenia PostgreSQL btree_gist, "
+    "a użytkownik bazy nie może go utworzyć. Administrator bazy musi raz wykonać "
+    "CREATE EXTENSION IF NOT EXISTS btree_gist; (patrz README, sekcja o btree_gist)."
+)
+
+POSTGRES_FORWARD = [
+    """
+    ALTER TABLE bookings ADD CONSTRAINT bookings_no_overlap
+    EXCLUDE USING gist (
+        room_id WITH =,
+        tstzrange(start_time, end_time, '[)') WITH &&
+    ) WHERE (status <> 'cancelled')
+    """,
+]
+POSTGRES_BACKWARD = [
+    "ALTER TABLE bookings DROP CONSTRAINT IF EXISTS bookings_no_overlap",
+]
+
+# SQLite nie ma ograniczeń wykluczających – ten sam warunek sprawdzają triggery.
+# UPDATE sprawdzamy tylko przy zmianie sali/czasu lub przywróceniu anulowanej
+# rezerwacji, żeby zmiana statusu starych danych nie wywracała się na kolizjach.
+SQLITE_FORWARD = [
+    """
+    CREATE TRIGGER bookings_no_overlap_insert
+    BEFORE INSERT ON bookings
+    WHEN NEW.status <> 'cancelled' AND EXISTS (
+        SELECT 1 FROM bookings b
+        WHERE b.room_id = NEW.room_id
+          AND b.status <> 'cancelled'
+          AND b.start_time < NEW.end_time
+          AND b.end_time > NEW.start_time
+    )
+    BEGIN
+        SELECT RAISE(ABORT, 'bookings_no_overlap');
+    END
+    """,
+    """
+    CREATE TRIGGER bookings_no_overlap_update
+    BEFORE UPDATE OF room_id, start_time, end_time, status ON bookings
+    WHEN NEW.status <> 'cancelled' AND (
+        OLD.status = 'cancelled'
+        OR NEW.room_id <> OLD.room_id
+        OR NEW.start_time <> OLD.start_time
+        OR NEW.end_time <> OLD.end_time
+    ) AND EXISTS (
+        SELECT 1 FROM bookings b
+        WHERE b.room_id = NEW.room_id
+          AND b.id <> NEW.id
+          AND b.status <> 'cancelled'
+          AND b.start_time < NEW.end_time
+          AND b.end_time > NEW.start_time
+    )
+    BEGIN
+        SELECT RAISE(ABORT, 'bookings_no_overlap');
+    END
+    """,
+]
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS bookings_no_overlap_insert",
+    "DROP TRIGGER IF EXISTS bookings_no_overlap_update",
+]
+
+
+def cancel_overlaps(apps, schema_editor):
+    """
+    Istniejące nakładające się rezerwacje wywróciłyby ALTER TABLE (i triggery
+    przy loaddata). Dla każdej sali przechodzimy rezerwacje po starcie
+    i anulujemy każdą, która zaczyna się przed końcem wcześniejszej zostawionej.
+    """
+    Booking = apps.get_model('bookings', 'Booking')
+    rows = (
+        Booking.objects.exclude(status='cancelled')
+        .order_by('room_id', 'start_time', 'id')
+        .values_list('id', 'room_id', 'start_time', 'end_time')
+        .iterator(chunk_size=2000)
+    )
+    cancelled = []
+    room_id, busy_until = None, None
+    for booking_id, room, start, end in rows:
+        if room != room_id:
+            room_id, busy_until = room, None
+        if busy_until is not None and start < busy_until:
+            cancelled.append(booking_id)
+            continue
+        busy_until = end
+    for i in range(0, len(cancelled), 1000):
+        Booking.objects.filter(id__in=cancelled[i:i + 1000]).update(status='cancelled', updated_at=timezone.now())
+    if cancelled:
+        print(f"\n  bookings_no_overlap: anulowano {len(cancelled)} kolidujących rezerwacji (id: "
+              f"{', '.join(map(str, cancelled[:50]))}{', ...' if len(cancelled) > 50 else ''})")
+
+
+def _create_btree_gist(schema_editor):
+    # CREATE EXTENSION wymaga uprawnień, których zarządzany PostgreSQL może nie
+    # dawać – rozszerzenie utworzone wcześniej przez administratora wystarcza
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'btree_gist'")
+        if cursor.fetchone():
+            return
+    try:
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+    except DatabaseError as exc:
+        raise ImproperlyConfigured(BTREE_GIST_HELP) from exc
+
+
+def _run(statements_by_vendor, extensions=False):
+    def operation(apps, schema_editor):
+        if extensions and schema_editor.connection.vendor == 'postgresql':
+            _create_btree_gist(schema_editor)
+        for sql in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(sql)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0003_alter_room_capacity_alter_room_description_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(cancel_overlaps, migrations.RunPython.noop),
+        migrations.RunPython(
+            _run({'postgresql': POSTGRES_FORWARD, 'sqlite': SQLITE_FORWARD}, extensions=True),
+            _run({'postgresql': POSTGRES_BACKWARD, 'sqlite': SQLITE_BACKWARD}),
+        ),
+    ]
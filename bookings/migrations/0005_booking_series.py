@@ -0,0 +1,41 @@
+# Generated by Django 6.0.2 on 2026-10-17 10:10
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0004_booking_no_overlap'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookingSeries',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('series_id', models.CharField(max_length=36, unique=True)),
+                ('title', models.CharField(max_length=200)),
+                ('description', models.TextField(blank=True, null=True)),
+                ('attendees_count', models.IntegerField(blank=True, default=1, null=True)),
+                ('frequency', models.CharField(choices=[('daily', 'Codziennie'), ('weekdays', 'Dni robocze (pn–pt)'), ('weekly', 'Co tydzień'), ('biweekly', 'Co dwa tygodnie'), ('monthly', 'Co miesiąc')], max_length=20)),
+                ('start_time', models.DateTimeField()),
+                ('end_time', models.DateTimeField()),
+                ('count', models.IntegerField(blank=True, null=True)),
+                ('until', models.DateTimeField(blank=True, null=True)),
+                ('materialized_until', models.DateTimeField()),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='series', to='bookings.room')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='booking_series', to='bookings.user')),
+            ],
+            options={
+                'verbose_name': 'Seria rezerwacji',
+                'verbose_name_plural': 'Serie rezerwacji',
+                'db_table': 'booking_series',
+                'indexes': [models.Index(fields=['room', 'materialized_until'], name='idx_series_room_materialized')],
+            },
+        ),
+    ]
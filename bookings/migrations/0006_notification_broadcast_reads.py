@@ -0,0 +1,35 @@
+# Generated by Django 6.0.2 on 2026-10-17 12:00
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0005_booking_series'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notification',
+            name='user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to='bookings.user'),
+        ),
+        migrations.CreateModel(
+            name='NotificationRead',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('read_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('notification', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reads', to='bookings.notification')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notification_reads', to='bookings.user')),
+            ],
+            options={
+                'verbose_name': 'Odczyt powiadomienia',
+                'verbose_name_plural': 'Odczyty powiadomień',
+                'db_table': 'notification_reads',
+                'constraints': [models.UniqueConstraint(fields=('notification', 'user'), name='uniq_notification_read')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 6.0.2 on 2026-10-17 12:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0006_notification_broadcast_reads'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_type', models.CharField(choices=[('booking_created', 'Utworzono rezerwację'), ('bookings_bulk_created', 'Utworzono rezerwacje hurtowo')], max_length=50)),
+                ('payload', models.JSONField(default=dict)),
+                ('status', models.CharField(choices=[('pending', 'Oczekujące'), ('dead', 'Porzucone')], default='pending', max_length=10)),
+                ('attempts', models.IntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, null=True)),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Zdarzenie outbox',
+                'verbose_name_plural': 'Zdarzenia outbox',
+                'db_table': 'outbox_events',
+                'indexes': [models.Index(fields=['status', 'available_at', 'id'], name='idx_outbox_pending')],
+            },
+        ),
+    ]
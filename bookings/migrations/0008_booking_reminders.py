@@ -0,0 +1,58 @@
+# Generated by Django 6.0.2 on 2026-10-17 13:20
+
+from datetime import timedelta
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def move_future_reminders(apps, schema_editor):
+    """
+    Przyszłe przypomnienia były wierszami notifications z created_at = start - 1h.
+    Zastępujemy je wpisami w booking_reminders dla nadchodzących rezerwacji.
+    """
+    Booking = apps.get_model('bookings', 'Booking')
+    Notification = apps.get_model('bookings', 'Notification')
+    Reminder = apps.get_model('bookings', 'Reminder')
+    now = timezone.now()
+
+    upcoming = (
+        Booking.objects.filter(start_time__gt=now)
+        .exclude(status='cancelled')
+        .values_list('id', 'start_time')
+        .iterator(chunk_size=2000)
+    )
+    batch = []
+    for booking_id, start_time in upcoming:
+        batch.append(Reminder(booking_id=booking_id, due_at=start_time - timedelta(hours=1)))
+        if len(batch) >= 2000:
+            Reminder.objects.bulk_create(batch)
+            batch = []
+    Reminder.objects.bulk_create(batch)
+
+    Notification.objects.filter(created_at__gt=now, message__startswith='Przypomnienie:').delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0007_outbox_event'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Reminder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('due_at', models.DateTimeField(db_index=True)),
+                ('booking', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='reminder', to='bookings.booking')),
+            ],
+            options={
+                'verbose_name': 'Przypomnienie',
+                'verbose_name_plural': 'Przypomnienia',
+                'db_table': 'booking_reminders',
+            },
+        ),
+        migrations.RunPython(move_future_reminders, migrations.RunPython.noop),
+    ]
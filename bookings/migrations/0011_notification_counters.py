@@ -0,0 +1,45 @@
+# Generated by Django 6.0.2 on 2026-10-17 10:26
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def fill_counters(apps, schema_editor):
+    """Początkowe wartości liczników z istniejących powiadomień (jak NotificationCounter.reconcile)."""
+    Notification = apps.get_model('bookings', 'Notification')
+    NotificationRead = apps.get_model('bookings', 'NotificationRead')
+    NotificationCounter = apps.get_model('bookings', 'NotificationCounter')
+
+    counters = [NotificationCounter(
+        scope='global',
+        value=Notification.objects.filter(Q(user__isnull=True) | Q(is_read=False)).count(),
+    )]
+    reads = (
+        NotificationRead.objects.filter(notification__user__isnull=True)
+        .values('user_id').annotate(total=Count('id')).values_list('user_id', 'total')
+    )
+    counters.extend(NotificationCounter(scope=f"user:{user_id}", value=total) for user_id, total in reads)
+    NotificationCounter.objects.bulk_create(counters, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0010_booking_updated_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationCounter',
+            fields=[
+                ('scope', models.CharField(max_length=32, primary_key=True, serialize=False)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Licznik powiadomień',
+                'verbose_name_plural': 'Liczniki powiadomień',
+                'db_table': 'notification_counters',
+            },
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 6.0.2 on 2026-10-17 10:28
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0011_notification_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('user_id', models.BigIntegerField(blank=True, null=True)),
+                ('message', models.TextField()),
+                ('is_read', models.BooleanField(blank=True, null=True)),
+                ('read_count', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(blank=True, null=True)),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Archiwalne powiadomienie',
+                'verbose_name_plural': 'Archiwum powiadomień',
+                'db_table': 'notifications_archive',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['created_at', 'id'], name='idx_notification_created'),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 6.0.2 on 2026-10-17 10:43
+
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from bookings.rollups import MEASURES, STATE_FIELDS, add
+
+
+def fill_rollups(apps, schema_editor):
+    """Agregaty z istniejących rezerwacji (jak rollups.rebuild, na modelach historycznych)."""
+    Booking = apps.get_model('bookings', 'Booking')
+    Room = apps.get_model('bookings', 'Room')
+    BookingDailyRollup = apps.get_model('bookings', 'BookingDailyRollup')
+
+    deltas = {}
+    for row in Booking.objects.order_by().values(*STATE_FIELDS).iterator(chunk_size=5000):
+        add(deltas, row)
+    rates = {room_id: Decimal(rate or 0) for room_id, rate in Room.objects.values_list('id', 'hourly_rate')}
+    BookingDailyRollup.objects.bulk_create([
+        BookingDailyRollup(
+            day=day, room_id=room_id, department=department, status=status,
+            **dict(zip(MEASURES, vector)),
+            cost=(Decimal(vector[1]) * rates.get(room_id, Decimal(0)) / 60).quantize(Decimal('0.01')),
+        )
+        for (day, room_id, department, status), vector in deltas.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0012_notification_retention'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookingDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('department', models.CharField(blank=True, default='', max_length=50)),
+                ('status', models.CharField(max_length=20)),
+                ('bookings', models.IntegerField(default=0)),
+                ('minutes', models.BigIntegerField(default=0)),
+                ('attendees', models.BigIntegerField(default=0)),
+                ('cost', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('len_0_30', models.IntegerField(default=0)),
+                ('len_30_60', models.IntegerField(default=0)),
+                ('len_60_90', models.IntegerField(default=0)),
+                ('len_90_120', models.IntegerField(default=0)),
+                ('len_120_plus', models.IntegerField(default=0)),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='bookings.room')),
+            ],
+            options={
+                'verbose_name': 'Dzienny agregat rezerwacji',
+                'verbose_name_plural': 'Dzienne agregaty rezerwacji',
+                'db_table': 'booking_daily_rollups',
+                'constraints': [models.UniqueConstraint(fields=('day', 'room', 'department', 'status'), name='uniq_booking_rollup')],
+            },
+        ),
+        migrations.RunPython(fill_rollups, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,11 @@
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
-from django.db.models import Sum, Count, Q
+from django.db.models import Sum, Count, F, Q
 from decimal import Decimal
 
+from .cache import bump_notifications_version
+
+
 class User(models.Model):
     """Model użytkownika systemu."""
     email = models.EmailField(unique=True, verbose_name="Adres e-mail")
@@ -50,15 +53,23 @@ class Room(models.Model):
     def __str__(self):
         return f"{self.name} (pojemność: {self.capacity})"
 
-    def is_available(self, start_time, end_time, exclude_booking_id=None):
-        query = self.bookings.filter(
-            ~Q(status="cancelled"),
-            start_time__lt=end_time,
-            end_time__gt=start_time
+    def is_available(self, start_time, end_time, exclude_booking_id=None, refresh=False):
+        """Sprawdza kolizje w indeksie zajętości; refresh=True wymusza świeży odczyt z bazy."""
+        from .availability import schedule_index
+        return schedule_index.is_available(
+            self.id, start_time, end_time,
+            exclude_booking_id=exclude_booking_id,
+            refresh=refresh,
         )
-        if exclude_booking_id:
-            query = query.exclude(id=exclude_booking_id)
-        return not query.exists()
+
+# Nazwa ograniczenia/triggerów blokujących nakładające się rezerwacje sali (migracja 0004)
+OVERLAP_CONSTRAINT = 'bookings_no_overlap'
+
+
+def is_overlap_violation(exc):
+    """Czy IntegrityError pochodzi z ograniczenia kolizji rezerwacji."""
+    return OVERLAP_CONSTRAINT in str(exc)
+
 
 class Booking(models.Model):
     """Model rezerwacji sali."""
@@ -92,6 +103,9 @@ class Booking(models.Model):
         verbose_name_plural = 'Rezerwacje'
         indexes = [
             models.Index(fields=['room', 'start_time', 'end_time'], name='idx_booking_room_time'),
+            models.Index(fields=['updated_at', 'id'], name='idx_booking_updated_id'),
+            # Stronicowanie kluczem (start_time, id) w /api/summaries/bookings
+            models.Index(fields=['start_time', 'id'], name='idx_booking_start_id'),
         ]
 
     def __str__(self):
@@ -108,17 +122,355 @@ class Booking(models.Model):
             return Decimal(self.room.hourly_rate) * Decimal(self.duration_hours)
         return Decimal(0)
 
+class BookingSeries(models.Model):
+    """Reguła rezerwacji cyklicznej; wystąpienia w tabeli bookings powstają tylko w horyzoncie."""
+    FREQUENCY_CHOICES = [
+        ('daily', 'Codziennie'),
+        ('weekdays', 'Dni robocze (pn–pt)'),
+        ('weekly', 'Co tydzień'),
+        ('biweekly', 'Co dwa tygodnie'),
+        ('monthly', 'Co miesiąc'),
+    ]
+
+    series_id = models.CharField(max_length=36, unique=True)
+    room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name="series")
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="booking_series")
+    title = models.CharField(max_length=200)
+    description = models.TextField(blank=True, null=True)
+    attendees_count = models.IntegerField(default=1, null=True, blank=True)
+    frequency = models.CharField(max_length=20, choices=FREQUENCY_CHOICES)
+    # Pierwsze wystąpienie; kolejne wyznacza reguła w czasie lokalnym
+    start_time = models.DateTimeField()
+    end_time = models.DateTimeField()
+    # Koniec serii: liczba wystąpień i/lub ostatni możliwy start; oba puste = seria otwarta
+    count = models.IntegerField(blank=True, null=True)
+    until = models.DateTimeField(blank=True, null=True)
+    # Wystąpienia ze startem przed tą datą są już zapisane w bookings
+    materialized_until = models.DateTimeField()
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'booking_series'
+        verbose_name = 'Seria rezerwacji'
+        verbose_name_plural = 'Serie rezerwacji'
+        indexes = [
+            models.Index(fields=['room', 'materialized_until'], name='idx_series_room_materialized'),
+        ]
+
+    def __str__(self):
+        return f"{self.title} ({self.get_frequency_display()})"
+
+
+class BookingDailyRollup(models.Model):
+    """
+    Dzienny agregat rezerwacji: (dzień lokalny startu, sala, departament, status).
+    Utrzymywany przyrostowo przez bookings/rollups.py.
+    """
+    day = models.DateField()
+    room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name="daily_rollups")
+    # Departament użytkownika; pusty napis = brak departamentu
+    department = models.CharField(max_length=50, blank=True, default='')
+    status = models.CharField(max_length=20)
+    bookings = models.IntegerField(default=0)
+    minutes = models.BigIntegerField(default=0)
+    attendees = models.BigIntegerField(default=0)
+    cost = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    # Liczba rezerwacji w przedziałach długości (minuty) – histogram bez sięgania do bookings
+    len_0_30 = models.IntegerField(default=0)
+    len_30_60 = models.IntegerField(default=0)
+    len_60_90 = models.IntegerField(default=0)
+    len_90_120 = models.IntegerField(default=0)
+    len_120_plus = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'booking_daily_rollups'
+        verbose_name = 'Dzienny agregat rezerwacji'
+        verbose_name_plural = 'Dzienne agregaty rezerwacji'
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'room', 'department', 'status'], name='uniq_booking_rollup'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.room_id} {self.department or '-'} {self.status}: {self.bookings}"
+
+
+class NotificationQuerySet(models.QuerySet):
+    def unread_for(self, user_id):
+        """
+        Nieprzeczytane z perspektywy użytkownika: broadcasty bez jego potwierdzenia
+        w NotificationRead oraz nieprzeczytane powiadomienia imienne.
+        """
+        read = NotificationRead.objects.filter(notification=models.OuterRef('pk'), user_id=user_id)
+        return self.filter(
+            Q(user__isnull=True) & ~models.Exists(read)
+            | Q(user__isnull=False, is_read=False)
+        )
+
+    def mark_read(self, user_id):
+        """
+        Oznacza powiadomienia z querysetu jako przeczytane przez user_id zapytaniami
+        zbiorowymi: imienne jednym UPDATE tylko kolumny is_read, broadcasty jednym
+        INSERT potwierdzeń. Zwraca liczbę faktycznie oznaczonych.
+
+        Wiersze broadcastów blokujemy (jak Notification.mark_read) i dopiero
+        potem ustalamy, których potwierdzeń brakuje – równoległe oznaczenie
+        (druga karta) czeka, więc licznik rośnie tylko o wstawione wiersze.
+        """
+        with transaction.atomic():
+            direct = self.filter(user__isnull=False, is_read=False).update(is_read=True)
+            candidates = list(
+                self.unread_for(user_id).filter(user__isnull=True).values_list('id', flat=True)
+            )
+            locked = list(
+                Notification.objects.select_for_update().filter(id__in=candidates)
+                .order_by('id').values_list('id', flat=True)
+            )
+            broadcast_ids = list(
+                Notification.objects.filter(id__in=locked).unread_for(user_id).values_list('id', flat=True)
+            )
+            NotificationRead.objects.bulk_create(
+                [NotificationRead(notification_id=i, user_id=user_id) for i in broadcast_ids],
+                batch_size=1000, ignore_conflicts=True,
+            )
+            NotificationCounter.bump(NotificationCounter.GLOBAL, -direct)
+            NotificationCounter.bump(NotificationCounter.user_scope(user_id), len(broadcast_ids))
+        return direct + len(broadcast_ids)
+
+
 class Notification(models.Model):
-    """Model powiadomienia systemu."""
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="notifications")
+    """
+    Model powiadomienia systemu. Powiadomienie bez użytkownika (broadcast) jest
+    jednym wierszem dla wszystkich, a przeczytanie zapisujemy w NotificationRead.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="notifications", null=True, blank=True)
     message = models.TextField()
     is_read = models.BooleanField(default=False, null=True, blank=True)
     created_at = models.DateTimeField(default=timezone.now, null=True, blank=True)
 
+    objects = NotificationQuerySet.as_manager()
+
     class Meta:
         db_table = 'notifications'
         verbose_name = 'Powiadomienie'
         verbose_name_plural = 'Powiadomienia'
+        indexes = [
+            models.Index(fields=['is_read', 'created_at', 'id'], name='idx_notification_unread'),
+            # date_hierarchy w adminie i filtry po dacie
+            models.Index(fields=['created_at', 'id'], name='idx_notification_created'),
+        ]
+
+    def __str__(self):
+        return f"Powiadomienie #{self.id} dla {self.user.name if self.user_id else 'wszystkich'}"
+
+    @property
+    def is_broadcast(self):
+        return self.user_id is None
+
+    def mark_read(self, user_id):
+        """Oznacza jako przeczytane: broadcast tylko dla danego użytkownika, imienne dla adresata."""
+        if self.is_broadcast:
+            with transaction.atomic():
+                # Ta sama blokada co w NotificationQuerySet.mark_read
+                list(Notification.objects.select_for_update().filter(pk=self.pk).values_list('pk', flat=True))
+                _, created = NotificationRead.objects.get_or_create(notification=self, user_id=user_id)
+                if created:
+                    NotificationCounter.bump(NotificationCounter.user_scope(user_id), 1)
+        elif not self.is_read:
+            self.is_read = True
+            # Warunkowy UPDATE: przy dwóch równoległych kliknięciach licznik zmniejszy tylko jedno
+            if Notification.objects.filter(pk=self.pk, is_read=False).update(is_read=True):
+                NotificationCounter.bump(NotificationCounter.GLOBAL, -1)
+
+    @property
+    def counts_as_unread(self):
+        """Czy wiersz wlicza się do licznika globalnego (patrz NotificationCounter)."""
+        return self.is_broadcast or self.is_read is False
+
+
+class NotificationRead(models.Model):
+    """Potwierdzenie przeczytania powiadomienia broadcast przez użytkownika."""
+    notification = models.ForeignKey(Notification, on_delete=models.CASCADE, related_name="reads")
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="notification_reads")
+    read_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'notification_reads'
+        verbose_name = 'Odczyt powiadomienia'
+        verbose_name_plural = 'Odczyty powiadomień'
+        constraints = [
+            models.UniqueConstraint(fields=['notification', 'user'], name='uniq_notification_read'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} przeczytał #{self.notification_id}"
+
+
+class NotificationArchive(models.Model):
+    """
+    Zwarta kopia powiadomień usuniętych przez retencję (NOTIFICATION_ARCHIVE).
+    Bez kluczy obcych i indeksów poza kluczem głównym; potwierdzenia odczytu
+    broadcastów zastępuje ich liczba.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    user_id = models.BigIntegerField(blank=True, null=True)
+    message = models.TextField()
+    is_read = models.BooleanField(blank=True, null=True)
+    read_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField(blank=True, null=True)
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'notifications_archive'
+        verbose_name = 'Archiwalne powiadomienie'
+        verbose_name_plural = 'Archiwum powiadomień'
+
+    def __str__(self):
+        return f"Archiwalne powiadomienie #{self.id}"
+
+
+class NotificationCounter(models.Model):
+    """
+    Licznik nieprzeczytanych powiadomień utrzymywany przyrostowo.
+
+    Broadcast jest jednym wierszem dla wszystkich, więc nie trzymamy licznika
+    per użytkownik dla każdego z nich (nowy broadcast musiałby zmienić wiersz
+    każdego użytkownika). Zamiast tego:
+
+    - ``global`` – liczba broadcastów + nieprzeczytanych powiadomień imiennych,
+    - ``user:<id>`` – ile broadcastów użytkownik już przeczytał.
+
+    Nieprzeczytane dla użytkownika = global - user:<id>, czyli dwa wiersze
+    odczytane po kluczu głównym jednym zapytaniem. Zmiany idą przez F(), więc
+    równoległe zapisy się nie gubią; rozjazdy (np. po masowym usuwaniu) naprawia
+    komenda reconcile_notification_counters.
+    """
+    GLOBAL = 'global'
+
+    scope = models.CharField(max_length=32, primary_key=True)
+    value = models.BigIntegerField(default=0)
+
+    class Meta:
+        db_table = 'notification_counters'
+        verbose_name = 'Licznik powiadomień'
+        verbose_name_plural = 'Liczniki powiadomień'
+
+    def __str__(self):
+        return f"{self.scope}: {self.value}"
+
+    @staticmethod
+    def user_scope(user_id):
+        return f"user:{user_id}"
+
+    @classmethod
+    def bump(cls, scope, delta):
+        """
+        Atomowo zmienia licznik o delta, zakładając wiersz przy pierwszym użyciu.
+        Każda zmiana zbioru nieprzeczytanych przechodzi tędy, więc tu też
+        unieważniamy ETagi listy powiadomień (po commicie).
+        """
+        if not delta:
+            return
+        transaction.on_commit(bump_notifications_version)
+        if cls.objects.filter(scope=scope).update(value=F('value') + delta):
+            return
+        cls.objects.get_or_create(scope=scope)
+        cls.objects.filter(scope=scope).update(value=F('value') + delta)
+
+    @classmethod
+    def notifications_created(cls, notifications):
+        """Do wywołania po bulk_create powiadomień (bulk_create nie wysyła post_save)."""
+        cls.bump(cls.GLOBAL, sum(1 for n in notifications if n.counts_as_unread))
+
+    @classmethod
+    def unread_for(cls, user_id):
+        values = dict(
+            cls.objects.filter(scope__in=[cls.GLOBAL, cls.user_scope(user_id)]).values_list('scope', 'value')
+        )
+        return max(values.get(cls.GLOBAL, 0) - values.get(cls.user_scope(user_id), 0), 0)
+
+    @classmethod
+    def reconcile(cls):
+        """
+        Przelicza wszystkie liczniki od zera na podstawie tabel powiadomień.
+        Zwraca listę (scope, stara wartość, nowa wartość) dla liczników, które się rozjechały.
+        """
+        expected = {
+            cls.GLOBAL: Notification.objects.filter(Q(user__isnull=True) | Q(is_read=False)).count(),
+        }
+        reads = (
+            NotificationRead.objects.filter(notification__user__isnull=True)
+            .values('user_id').annotate(total=Count('id')).values_list('user_id', 'total')
+        )
+        for user_id, total in reads:
+            expected[cls.user_scope(user_id)] = total
+
+        with transaction.atomic():
+            current = dict(cls.objects.select_for_update().values_list('scope', 'value'))
+            drift = []
+            for scope in current.keys() | expected.keys():
+                old, new = current.get(scope), expected.get(scope, 0)
+                if old != new:
+                    drift.append((scope, old or 0, new))
+            cls.objects.exclude(scope__in=expected.keys()).delete()
+            cls.objects.bulk_create(
+                [cls(scope=scope, value=value) for scope, value in expected.items()],
+                update_conflicts=True, unique_fields=['scope'], update_fields=['value'],
+                batch_size=1000,
+            )
+            transaction.on_commit(bump_notifications_version)
+        return drift
+
+
+class Reminder(models.Model):
+    """
+    Zaplanowane przypomnienie o rezerwacji. Indeks po due_at pełni rolę kolejki
+    priorytetowej dla komendy dispatch_reminders; po wysłaniu wiersz jest usuwany.
+    """
+    booking = models.OneToOneField(Booking, on_delete=models.CASCADE, related_name="reminder")
+    due_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        db_table = 'booking_reminders'
+        verbose_name = 'Przypomnienie'
+        verbose_name_plural = 'Przypomnienia'
+
+    def __str__(self):
+        return f"Przypomnienie o rezerwacji #{self.booking_id} ({self.due_at:%Y-%m-%d %H:%M})"
+
+
+class OutboxEvent(models.Model):
+    """
+    Zdarzenie do asynchronicznego przetworzenia (transactional outbox). Zapisywane
+    w tej samej transakcji co rezerwacja; obsługuje je komenda process_outbox.
+    """
+    BOOKING_CREATED = 'booking_created'
+    BOOKINGS_BULK_CREATED = 'bookings_bulk_created'
+    EVENT_CHOICES = [
+        (BOOKING_CREATED, 'Utworzono rezerwację'),
+        (BOOKINGS_BULK_CREATED, 'Utworzono rezerwacje hurtowo'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Oczekujące'),
+        ('dead', 'Porzucone'),
+    ]
+
+    event_type = models.CharField(max_length=50, choices=EVENT_CHOICES)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.IntegerField(default=0)
+    last_error = models.TextField(blank=True, null=True)
+    # Najwcześniejszy moment kolejnej próby (backoff po błędzie)
+    available_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'outbox_events'
+        verbose_name = 'Zdarzenie outbox'
+        verbose_name_plural = 'Zdarzenia outbox'
+        indexes = [
+            models.Index(fields=['status', 'available_at', 'id'], name='idx_outbox_pending'),
+        ]
 
     def __str__(self):
-        return f"Powiadomienie #{self.id} dla {self.user.name}"
+        return f"{self.event_type} #{self.id} ({self.status})"
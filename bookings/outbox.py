@@ -0,0 +1,145 @@
+"""
+Obsługa zdarzeń outbox: tworzenie powiadomień i planowanie przypomnień
+poza ścieżką żądania.
+
+Sygnały rezerwacji zapisują jeden wiersz OutboxEvent w transakcji rezerwacji,
+a komenda process_outbox odbiera je paczkami. Paczkę blokujemy przez
+SELECT ... FOR UPDATE SKIP LOCKED, więc kilka workerów może działać naraz bez
+przetwarzania tego samego zdarzenia dwa razy. Przetworzone zdarzenia są
+usuwane; nieudane wracają do kolejki z rosnącym opóźnieniem, a po
+OUTBOX_MAX_ATTEMPTS próbach dostają status ``dead``.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Booking, Notification, NotificationCounter, OutboxEvent
+from .reminders import schedule as schedule_reminders
+
+DEFAULT_BATCH_SIZE = 100
+
+# Opóźnienie ponowienia: 10 s, 20 s, 40 s, ... maksymalnie godzina
+RETRY_BASE = timedelta(seconds=10)
+RETRY_MAX = timedelta(hours=1)
+
+
+def max_attempts():
+    return getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 5)
+
+
+def retry_delay(attempts):
+    return min(RETRY_BASE * (2 ** (attempts - 1)), RETRY_MAX)
+
+
+def enqueue(event_type, **payload):
+    return OutboxEvent.objects.create(event_type=event_type, payload=payload)
+
+
+def _booking_ids(event):
+    if event.event_type == OutboxEvent.BOOKING_CREATED:
+        return [event.payload['booking_id']]
+    return event.payload['booking_ids']
+
+
+def build_notifications(event, bookings):
+    """
+    Zwraca (powiadomienia broadcast, rezerwacje do przypomnienia) dla zdarzenia.
+    ``bookings`` to {id: Booking} dla całej paczki; rezerwacje usunięte przed
+    przetworzeniem zdarzenia pomijamy.
+    """
+    found = [bookings[i] for i in _booking_ids(event) if i in bookings]
+    if not found:
+        return [], []
+
+    if event.event_type == OutboxEvent.BOOKING_CREATED:
+        booking = found[0]
+        return [
+            Notification(
+                message=f"Nowa rezerwacja: '{booking.title}' w sali {booking.room.name} przez {booking.user.name}",
+                created_at=event.created_at,
+            ),
+        ], found
+
+    if event.event_type == OutboxEvent.BOOKINGS_BULK_CREATED:
+        notifications = []
+        if event.payload.get('announce'):
+            first = found[0]
+            notifications.append(Notification(
+                message=f"Nowa seria rezerwacji: '{first.title}' w sali {first.room.name} przez {first.user.name} ({len(found)} terminów)",
+                created_at=event.created_at,
+            ))
+        return notifications, found
+
+    raise ValueError(f"Nieznany typ zdarzenia: {event.event_type}")
+
+
+def process_batch(batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Przetwarza jedną paczkę oczekujących zdarzeń w jednej transakcji.
+    Zwraca (przetworzone, nieudane).
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        events = list(
+            OutboxEvent.objects.select_for_update(skip_locked=True)
+            .filter(status='pending', available_at__lte=now)
+            .order_by('id')[:batch_size]
+        )
+        if not events:
+            return 0, 0
+
+        booking_ids = set()
+        for event in events:
+            booking_ids.update(_booking_ids(event))
+        bookings = Booking.objects.select_related('room', 'user').in_bulk(booking_ids)
+
+        notifications = []
+        to_remind = []
+        done = []
+        failed = []
+        for event in events:
+            try:
+                event_notifications, event_bookings = build_notifications(event, bookings)
+            except Exception as exc:
+                failed.append((event, exc))
+            else:
+                notifications.extend(event_notifications)
+                to_remind.extend(event_bookings)
+                done.append(event.id)
+
+        Notification.objects.bulk_create(notifications, batch_size=1000)
+        NotificationCounter.notifications_created(notifications)
+        schedule_reminders(to_remind)
+        OutboxEvent.objects.filter(id__in=done).delete()
+        for event, exc in failed:
+            _record_failure(event, exc, now)
+    return len(done), len(failed)
+
+
+def _record_failure(event, exc, now):
+    event.attempts += 1
+    event.last_error = f"{type(exc).__name__}: {exc}"
+    if event.attempts >= max_attempts():
+        event.status = 'dead'
+    else:
+        event.available_at = now + retry_delay(event.attempts)
+    event.save(update_fields=['attempts', 'last_error', 'status', 'available_at'])
+
+
+def fail_batch(batch_size, exc):
+    """
+    Gdy cała paczka wywróciła się na zapisie (np. błąd bazy), odkładamy jej
+    zdarzenia z backoffem, żeby worker nie kręcił się w pętli na tych samych.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        events = list(
+            OutboxEvent.objects.select_for_update(skip_locked=True)
+            .filter(status='pending', available_at__lte=now)
+            .order_by('id')[:batch_size]
+        )
+        for event in events:
+            _record_failure(event, exc, now)
+    return len(events)
@@ -0,0 +1,177 @@
+"""
+Reguły rezerwacji cyklicznych (BookingSeries) w stylu RRULE.
+
+Wystąpienia serii zapisujemy w tabeli bookings tylko w kroczącym horyzoncie
+(BOOKING_SERIES_HORIZON_DAYS), co robi komenda materialize_series. Poza
+horyzontem wystąpienia są rozwijane wirtualnie z reguły przy sprawdzaniu
+dostępności i w listach rezerwacji. Reguły liczymy w czasie lokalnym, więc
+spotkanie o 9:00 zostaje o 9:00 także po zmianie czasu.
+"""
+from datetime import timedelta
+
+from dateutil import rrule
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+# częstotliwość -> argumenty dateutil.rrule
+FREQUENCIES = {
+    'daily': {'freq': rrule.DAILY},
+    'weekdays': {'freq': rrule.DAILY, 'byweekday': (rrule.MO, rrule.TU, rrule.WE, rrule.TH, rrule.FR)},
+    'weekly': {'freq': rrule.WEEKLY},
+    'biweekly': {'freq': rrule.WEEKLY, 'interval': 2},
+    # Miesiące bez danego dnia (np. 31.) są pomijane, jak w RFC 5545
+    'monthly': {'freq': rrule.MONTHLY},
+}
+
+# Zapas na długość wystąpienia przy filtrowaniu serii po dacie końcowej (until to ostatni start)
+MAX_OCCURRENCE_LENGTH = timedelta(days=1)
+
+# Górna granica liczby wystąpień serii z końcem (sprawdzanej w całości przy tworzeniu)
+MAX_SERIES_OCCURRENCES = 1000
+
+
+def horizon(now=None):
+    """Koniec okna, w którym wystąpienia serii są zapisane w tabeli bookings."""
+    days = getattr(settings, 'BOOKING_SERIES_HORIZON_DAYS', 90)
+    return (now or timezone.now()) + timedelta(days=days)
+
+
+def _local_naive(dt):
+    return timezone.localtime(dt).replace(tzinfo=None)
+
+
+def _aware(naive):
+    return timezone.make_aware(naive, timezone.get_current_timezone())
+
+
+def build_rule(frequency, start_time, count=None, until=None):
+    return rrule.rrule(
+        dtstart=_local_naive(start_time),
+        count=count,
+        until=_local_naive(until) if until else None,
+        **FREQUENCIES[frequency],
+    )
+
+
+def expand(series, start, end, limit=None):
+    """
+    Wystąpienia (start, end) serii nachodzące na [start, end), rosnąco;
+    z ``limit`` najwyżej tyle pierwszych.
+    """
+    duration = series.end_time - series.start_time
+    rule = build_rule(series.frequency, series.start_time, series.count, series.until)
+    occurrences = []
+    for occ in rule.xafter(_local_naive(start - duration), inc=False):
+        occ_start = _aware(occ)
+        if occ_start >= end or (limit is not None and len(occurrences) >= limit):
+            break
+        occurrences.append((occ_start, occ_start + duration))
+    return occurrences
+
+
+def pending_series(start, end, room_ids=None):
+    """Aktywne serie, których niezmaterializowane wystąpienia mogą trafić w [start, end)."""
+    from .models import BookingSeries
+
+    qs = BookingSeries.objects.filter(
+        Q(until__isnull=True) | Q(until__gt=start - MAX_OCCURRENCE_LENGTH),
+        is_active=True,
+        materialized_until__lt=end,
+        start_time__lt=end,
+    )
+    if room_ids is not None:
+        qs = qs.filter(room_id__in=room_ids)
+    return qs
+
+
+def iter_virtual(series_qs, start, end):
+    """(series, start, end) dla wystąpień z [start, end), które nie są jeszcze w bookings."""
+    for series in series_qs:
+        lower = max(start, series.materialized_until)
+        for occ_start, occ_end in expand(series, lower, end):
+            if occ_start >= series.materialized_until:
+                yield series, occ_start, occ_end
+
+
+def virtual_occurrences(room_ids, start, end):
+    """{room_id: [(start, end, series_id), ...]} dla wystąpień jeszcze nie zapisanych w bookings."""
+    result = {}
+    for series, occ_start, occ_end in iter_virtual(pending_series(start, end, room_ids), start, end):
+        result.setdefault(series.room_id, []).append((occ_start, occ_end, series.series_id))
+    for occurrences in result.values():
+        occurrences.sort()
+    return result
+
+
+def virtual_conflict(room_id, start, end):
+    return bool(virtual_occurrences([room_id], start, end).get(room_id))
+
+
+def materialize(series, until=None, notify=True, announce=False):
+    """
+    Zapisuje wystąpienia serii ze startem w [series.materialized_until, until)
+    jednym bulk_create. Wystąpienia kolidujące z istniejącymi rezerwacjami są
+    pomijane. Zwraca (utworzone rezerwacje, pominięte (start, end)).
+    """
+    from django.db import IntegrityError, transaction
+
+    from .availability import schedule_index, series_interval_id
+    from .models import Booking, is_overlap_violation
+    from .signals import bookings_bulk_created
+
+    until = until or horizon()
+    if until <= series.materialized_until:
+        return [], []
+
+    occurrences = [
+        (s, e) for s, e in expand(series, series.materialized_until, until)
+        if series.materialized_until <= s < until
+    ]
+    skipped = []
+    new_bookings = []
+    if occurrences:
+        schedule = schedule_index.schedule(series.room_id, occurrences[0][0], occurrences[-1][1], refresh=True)
+        own = series_interval_id(series.series_id)
+        for s, e in occurrences:
+            if schedule.overlaps(s, e, exclude_booking_id=own):
+                skipped.append((s, e))
+                continue
+            new_bookings.append(Booking(
+                room_id=series.room_id, user_id=series.user_id, title=series.title,
+                description=series.description, start_time=s, end_time=e,
+                attendees_count=series.attendees_count,
+                recurrence_rule=series.frequency.upper(),
+                series_id=series.series_id,
+                recurring_end_date=series.until,
+            ))
+
+    def finish(created):
+        series.materialized_until = until
+        series.save(update_fields=['materialized_until'])
+        if created:
+            bookings_bulk_created.send(sender=Booking, bookings=created, notify=notify, announce=announce)
+
+    try:
+        with transaction.atomic():
+            created = Booking.objects.bulk_create(new_bookings)
+            finish(created)
+        return created, skipped
+    except IntegrityError as exc:
+        if not is_overlap_violation(exc):
+            raise
+
+    # Ktoś zarezerwował salę między sprawdzeniem a zapisem – wstawiamy wiersz po wierszu
+    created = []
+    with transaction.atomic():
+        for booking in new_bookings:
+            booking.pk = None
+            try:
+                with transaction.atomic():
+                    created.extend(Booking.objects.bulk_create([booking]))
+            except IntegrityError as exc:
+                if not is_overlap_violation(exc):
+                    raise
+                skipped.append((booking.start_time, booking.end_time))
+        finish(created)
+    return created, sorted(skipped)
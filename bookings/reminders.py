@@ -0,0 +1,99 @@
+"""
+Przypomnienia o rezerwacjach wysyłane o czasie.
+
+Zamiast wierszy notifications z created_at w przyszłości trzymamy w tabeli
+booking_reminders jeden wpis na rezerwację z terminem due_at. Komenda
+dispatch_reminders zdejmuje wpisy, których termin minął, paczkami w kolejności
+due_at (indeks działa jak kopiec) i dopiero wtedy tworzy powiadomienie.
+Przy wysyłce sprawdzamy aktualny stan rezerwacji: anulowane i już rozpoczęte
+pomijamy, a przesunięte na później planujemy ponownie.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Notification, NotificationCounter, Reminder
+
+# Z jakim wyprzedzeniem przypominamy (treść powiadomienia mówi o godzinie)
+REMINDER_LEAD = timedelta(hours=1)
+
+DEFAULT_BATCH_SIZE = 500
+
+
+def due_time(booking):
+    return booking.start_time - REMINDER_LEAD
+
+
+def schedule(bookings):
+    """Planuje przypomnienia dla nadchodzących, nieanulowanych rezerwacji jednym bulk_create."""
+    now = timezone.now()
+    reminders = [
+        Reminder(booking_id=booking.id, due_at=due_time(booking))
+        for booking in bookings
+        if booking.status != 'cancelled' and booking.start_time > now
+    ]
+    # ignore_conflicts: zdarzenie outbox mogło zostać przetworzone ponownie
+    Reminder.objects.bulk_create(reminders, batch_size=1000, ignore_conflicts=True)
+
+
+def reschedule(booking):
+    """
+    Po zmianie rezerwacji przesuwa jej przypomnienie albo je usuwa przy anulowaniu.
+    Wiersz może już nie istnieć (przypomnienie wysłane przed przesunięciem
+    rezerwacji albo przywrócenie anulowanej), więc nadchodzącym rezerwacjom
+    zakładamy go od nowa.
+    """
+    if booking.status == 'cancelled':
+        Reminder.objects.filter(booking_id=booking.id).delete()
+    elif booking.start_time > timezone.now():
+        Reminder.objects.update_or_create(
+            booking_id=booking.id, defaults={'due_at': due_time(booking)},
+        )
+
+
+def next_due():
+    """Termin najbliższego przypomnienia albo None, gdy kolejka jest pusta."""
+    return Reminder.objects.order_by('due_at').values_list('due_at', flat=True).first()
+
+
+def dispatch_due(batch_size=DEFAULT_BATCH_SIZE, now=None):
+    """
+    Wysyła jedną paczkę przypomnień z due_at <= now. Paczka jest blokowana przez
+    SKIP LOCKED, więc kilka dispatcherów może działać równolegle.
+    Zwraca (wysłane, pominięte, przełożone).
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        reminders = list(
+            Reminder.objects.select_for_update(skip_locked=True)
+            .filter(due_at__lte=now)
+            .select_related('booking__room')
+            .order_by('due_at')[:batch_size]
+        )
+        if not reminders:
+            return 0, 0, 0
+
+        notifications = []
+        finished = []
+        rescheduled = []
+        for reminder in reminders:
+            booking = reminder.booking
+            if booking.status == 'cancelled' or booking.start_time <= now:
+                finished.append(reminder.id)
+            elif due_time(booking) > now:
+                # Rezerwacja przesunięta na później, a przypomnienie nie zostało zaktualizowane
+                reminder.due_at = due_time(booking)
+                rescheduled.append(reminder)
+            else:
+                notifications.append(Notification(
+                    message=f"Przypomnienie: Rezerwacja '{booking.title}' w sali {booking.room.name} zaczyna się za godzinę!",
+                    created_at=now,
+                ))
+                finished.append(reminder.id)
+
+        Notification.objects.bulk_create(notifications)
+        NotificationCounter.notifications_created(notifications)
+        Reminder.objects.filter(id__in=finished).delete()
+        Reminder.objects.bulk_update(rescheduled, ['due_at'])
+    return len(notifications), len(finished) - len(notifications), len(rescheduled)
@@ -0,0 +1,145 @@
+"""
+Retencja powiadomień: usuwanie (opcjonalnie z archiwizacją) starych wierszy
+tabeli notifications według reguł z ustawień NOTIFICATION_*_RETENTION_DAYS.
+
+Tabelę przechodzimy zakresami klucza głównego (id >= lo AND id < lo + batch)
+i każdy zakres usuwamy w osobnej, krótkiej transakcji, więc blokady trwają
+tylko tyle, co jedna paczka. Przejście kończy się na największym id wśród
+wierszy starszych niż najpóźniejsza granica retencji (indeks created_at, id),
+więc nie czytamy świeżej części tabeli. Liczniki nieprzeczytanych
+(NotificationCounter) zmniejszamy o to, co faktycznie usunięto.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Q
+from django.db.models.functions import Length
+from django.utils import timezone
+
+from .models import Notification, NotificationArchive, NotificationCounter, NotificationRead
+
+# Szerokość zakresu id przetwarzanego w jednej transakcji
+DEFAULT_BATCH_SIZE = 1000
+
+# Szacunkowy rozmiar wiersza bez treści (nagłówek krotki, kolumny stałej
+# długości, wpisy w indeksach) i jednego potwierdzenia odczytu – do raportu
+ROW_OVERHEAD_BYTES = 80
+READ_ROW_BYTES = 60
+
+
+def policy(now=None):
+    """
+    Zwraca (warunek Q, najpóźniejsza granica) dla powiadomień do usunięcia albo
+    (None, None), gdy wszystkie reguły są wyłączone.
+    """
+    now = now or timezone.now()
+    rules = []
+    cutoffs = []
+
+    def cutoff(setting, default):
+        days = getattr(settings, setting, default)
+        if not days:
+            return None
+        cutoffs.append(now - timedelta(days=days))
+        return cutoffs[-1]
+
+    read_before = cutoff('NOTIFICATION_READ_RETENTION_DAYS', 30)
+    if read_before:
+        rules.append(Q(user__isnull=False, is_read=True, created_at__lt=read_before))
+    broadcast_before = cutoff('NOTIFICATION_BROADCAST_RETENTION_DAYS', 90)
+    if broadcast_before:
+        rules.append(Q(user__isnull=True, created_at__lt=broadcast_before))
+    any_before = cutoff('NOTIFICATION_RETENTION_DAYS', 365)
+    if any_before:
+        rules.append(Q(created_at__lt=any_before))
+
+    if not rules:
+        return None, None
+    condition = rules[0]
+    for rule in rules[1:]:
+        condition |= rule
+    return condition, max(cutoffs)
+
+
+def purge(batch_size=DEFAULT_BATCH_SIZE, archive=None, dry_run=False, sleep=0.0, now=None, progress=None):
+    """
+    Usuwa powiadomienia objęte retencją. ``progress`` (opcjonalnie) dostaje
+    statystyki po każdej paczce. Zwraca słownik: notifications, receipts,
+    archived, bytes (szacunek), batches.
+    """
+    if archive is None:
+        archive = getattr(settings, 'NOTIFICATION_ARCHIVE', False)
+    stats = {'notifications': 0, 'receipts': 0, 'archived': 0, 'bytes': 0, 'batches': 0}
+    condition, latest_cutoff = policy(now)
+    if condition is None:
+        return stats
+
+    top = Notification.objects.filter(created_at__lt=latest_cutoff).aggregate(top=Max('id'))['top']
+    if top is None:
+        return stats
+
+    ids = Notification.objects.filter(id__lte=top).order_by('id').values_list('id', flat=True)
+    lo = ids.first()
+    while lo is not None:
+        hi = lo + batch_size
+        _purge_range(Notification.objects.filter(condition, id__gte=lo, id__lt=hi), archive, dry_run, stats)
+        stats['batches'] += 1
+        if progress:
+            progress(stats)
+
+        # Następny istniejący id – przeskakuje dziury po wcześniejszych czystkach
+        lo = ids.filter(id__gte=hi).first()
+        if sleep and lo is not None:
+            time.sleep(sleep)
+    return stats
+
+
+def _purge_range(expired, archive, dry_run, stats):
+    with transaction.atomic():
+        # FOR UPDATE: równoległe potwierdzenie odczytu czeka, więc liczniki się nie rozjadą
+        ids = list(expired.select_for_update().values_list('id', flat=True))
+        if not ids:
+            return
+
+        fields = ['id', 'user_id', 'is_read', 'created_at', 'length']
+        if archive:
+            fields.append('message')
+        rows = list(
+            Notification.objects.filter(id__in=ids)
+            .annotate(length=Length('message'), read_count=Count('reads'))
+            .values(*fields, 'read_count')
+        )
+        receipts = dict(
+            NotificationRead.objects.filter(notification_id__in=ids)
+            .values('user_id').annotate(total=Count('id')).values_list('user_id', 'total')
+        )
+        read_total = sum(receipts.values())
+
+        stats['notifications'] += len(rows)
+        stats['receipts'] += read_total
+        stats['bytes'] += sum(ROW_OVERHEAD_BYTES + (row['length'] or 0) for row in rows)
+        stats['bytes'] += READ_ROW_BYTES * read_total
+        if dry_run:
+            return
+
+        if archive:
+            NotificationArchive.objects.bulk_create([
+                NotificationArchive(
+                    id=row['id'], user_id=row['user_id'], message=row['message'], is_read=row['is_read'],
+                    read_count=row['read_count'], created_at=row['created_at'],
+                )
+                for row in rows
+            ], batch_size=1000, ignore_conflicts=True)
+            stats['archived'] += len(rows)
+
+        # Potwierdzenia odczytu usuwa kaskada jednym DELETE ... WHERE notification_id IN
+        Notification.objects.filter(id__in=ids).delete()
+
+        NotificationCounter.bump(
+            NotificationCounter.GLOBAL,
+            -sum(1 for row in rows if row['user_id'] is None or row['is_read'] is False),
+        )
+        for user_id, total in receipts.items():
+            NotificationCounter.bump(NotificationCounter.user_scope(user_id), -total)
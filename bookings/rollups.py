@@ -0,0 +1,330 @@
+"""
+Dzienne agregaty rezerwacji (booking_daily_rollups) utrzymywane przyrostowo.
+
+Wiersz to (dzień lokalny startu, sala, departament, status) z liczbą
+rezerwacji, minutami, uczestnikami, kosztem i licznikami przedziałów
+długości (histogram). Podsumowania za dowolny okres kosztują wtedy
+O(dni × sale) zamiast O(rezerwacje).
+
+Zmiany nanosimy w transakcji zapisu rezerwacji:
+
+- save/delete pojedynczej rezerwacji – sygnały (bookings/signals.py),
+- bulk_create – sygnał bookings_bulk_created,
+- QuerySet.update – tylko przez ``update_bookings`` z tego modułu,
+- zmiana departamentu użytkownika lub stawki sali – sygnały User/Room.
+
+Masowe usuwanie (kaskady, czyszczenie) warto otoczyć ``with batch():`` –
+sygnały zbierają wtedy delty w pamięci i nanosimy je raz, na końcu bloku.
+
+Koszt to zawsze minuty × bieżąca stawka sali / 60, więc po zmianie stawki
+wystarczy przeliczyć wiersze sali. Rozjazdy (np. po loaddata albo ręcznym SQL)
+naprawia ``rebuild`` / manage.py rebuild_rollups.
+
+Na PostgreSQL zapis delty bierze współdzieloną blokadę doradczą na każdy
+dotknięty dzień, a przebudowa – wyłączną (bez czekania, z ponowieniem), więc
+przebudowa nie zgubi ani nie policzy podwójnie równoległych zmian.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import DecimalField, ExpressionWrapper, F
+from django.utils import timezone
+
+from .cache import bump_version
+from .models import Booking, BookingDailyRollup, Room, User
+
+# Górne granice przedziałów histogramu długości w minutach; ostatni przedział jest otwarty
+HISTOGRAM_BINS = [30, 60, 90, 120]
+BUCKET_FIELDS = ['len_0_30', 'len_30_60', 'len_60_90', 'len_90_120', 'len_120_plus']
+MEASURES = ['bookings', 'minutes', 'attendees'] + BUCKET_FIELDS
+
+# Kolumny rezerwacji potrzebne do wyznaczenia wkładu w agregat
+STATE_FIELDS = ('start_time', 'end_time', 'room_id', 'status', 'attendees_count', 'user__department')
+
+# Przestrzeń kluczy blokad doradczych PostgreSQL (pierwszy argument pg_advisory_*)
+LOCK_NAMESPACE = 2101
+REBUILD_LOCK_RETRIES = 50
+REBUILD_LOCK_SLEEP = 0.2
+
+ID_BATCH = 1000
+
+# Delty i departamenty zbierane w bieżącym bloku batch() (per wątek)
+_pending = threading.local()
+
+
+def _bucket(minutes):
+    for i, upper in enumerate(HISTOGRAM_BINS):
+        if minutes < upper:
+            return i
+    return len(HISTOGRAM_BINS)
+
+
+def contribution(row):
+    """(klucz, wektor miar w kolejności MEASURES) dla wiersza ze STATE_FIELDS."""
+    tz = timezone.get_current_timezone()
+    minutes = int(round((row['end_time'] - row['start_time']).total_seconds() / 60))
+    key = (
+        timezone.localtime(row['start_time'], tz).date(),
+        row['room_id'],
+        row['user__department'] or '',
+        row['status'],
+    )
+    vector = [1, minutes, row['attendees_count'] or 0] + [0] * len(BUCKET_FIELDS)
+    vector[3 + _bucket(minutes)] = 1
+    return key, vector
+
+
+def add(deltas, row, sign=1):
+    key, vector = contribution(row)
+    current = deltas.setdefault(key, [0] * len(MEASURES))
+    for i, value in enumerate(vector):
+        current[i] += sign * value
+    return deltas
+
+
+def instance_row(booking, base=None, update_fields=None):
+    """
+    Wiersz STATE_FIELDS z instancji (departament z załadowanego użytkownika albo
+    z bazy). Przy save(update_fields=...) pozostałe pola bierzemy z ``base`` –
+    stanu w bazie – bo niezapisane wartości instancji mogą być nieaktualne.
+    """
+    row = _instance_state(booking)
+    if base and update_fields is not None:
+        fields = {'room': 'room_id', 'room_id': 'room_id', 'user': 'user__department', 'user_id': 'user__department'}
+        written = {fields.get(name, name) for name in update_fields}
+        row = {key: row[key] if key in written else base[key] for key in STATE_FIELDS}
+    return row
+
+
+def _instance_state(booking):
+    departments = getattr(_pending, 'departments', None)
+    if Booking.user.is_cached(booking):
+        department = booking.user.department
+    elif departments is not None and booking.user_id in departments:
+        department = departments[booking.user_id]
+    else:
+        # Przy kaskadowym usuwaniu użytkownika jego wiersz może już nie istnieć
+        department = User.objects.filter(pk=booking.user_id).values_list('department', flat=True).first()
+        if departments is not None:
+            departments[booking.user_id] = department
+    return {
+        'start_time': booking.start_time,
+        'end_time': booking.end_time,
+        'room_id': booking.room_id,
+        'status': booking.status,
+        'attendees_count': booking.attendees_count,
+        'user__department': department,
+    }
+
+
+def state_rows(queryset):
+    return queryset.order_by().values(*STATE_FIELDS)
+
+
+def _rates(room_ids):
+    rates = dict(Room.objects.filter(id__in=room_ids).values_list('id', 'hourly_rate'))
+    return {room_id: Decimal(rates.get(room_id) or 0) for room_id in room_ids}
+
+
+def _cost(minutes, rate):
+    return (Decimal(minutes) * rate / 60).quantize(Decimal('0.01'))
+
+
+def _cost_expression(minutes, rate):
+    return ExpressionWrapper(minutes * rate / 60, output_field=DecimalField(max_digits=14, decimal_places=2))
+
+
+def _lock_days(days, shared):
+    """Blokady doradcze na dni (tylko PostgreSQL). Zwraca False, gdy wyłącznej nie udało się wziąć."""
+    if connection.vendor != 'postgresql' or not days:
+        return True
+    ordinals = sorted({d.toordinal() for d in days})
+    with connection.cursor() as cursor:
+        if shared:
+            cursor.execute(
+                "SELECT pg_advisory_xact_lock_shared(%s, d) FROM unnest(%s::int[]) AS d",
+                [LOCK_NAMESPACE, ordinals],
+            )
+            return True
+        cursor.execute(
+            "SELECT bool_and(pg_try_advisory_xact_lock(%s, d)) FROM unnest(%s::int[]) AS d",
+            [LOCK_NAMESPACE, ordinals],
+        )
+        return bool(cursor.fetchone()[0])
+
+
+def apply(deltas):
+    """Nanosi delty na tabelę agregatów (UPDATE ... SET x = x + d, a brakujące wiersze tworzy)."""
+    deltas = {key: vector for key, vector in deltas.items() if any(vector)}
+    if not deltas:
+        return
+    rates = _rates({key[1] for key in deltas})
+    with transaction.atomic():
+        _lock_days({key[0] for key in deltas}, shared=True)
+        emptied = []
+        for (day, room_id, department, status), vector in sorted(deltas.items()):
+            lookup = {'day': day, 'room_id': room_id, 'department': department, 'status': status}
+            changes = {field: F(field) + value for field, value in zip(MEASURES, vector) if value}
+            # W SET po prawej stronie są wartości sprzed UPDATE
+            changes['cost'] = _cost_expression(F('minutes') + vector[1], rates[room_id])
+            rows = BookingDailyRollup.objects.filter(**lookup)
+            if not rows.update(**changes) and vector[0] > 0:
+                try:
+                    with transaction.atomic():
+                        BookingDailyRollup.objects.create(
+                            **lookup, **dict(zip(MEASURES, vector)), cost=_cost(vector[1], rates[room_id]),
+                        )
+                except IntegrityError:
+                    # Równoległy zapis utworzył wiersz w międzyczasie
+                    rows.update(**changes)
+            if vector[0] < 0:
+                emptied.append(lookup)
+        # Wiersze bez rezerwacji usuwamy, żeby liczba sal w okresie była poprawna
+        for lookup in emptied:
+            BookingDailyRollup.objects.filter(**lookup, bookings__lte=0).delete()
+
+
+def _record(deltas):
+    pending = getattr(_pending, 'deltas', None)
+    if pending is None:
+        apply(deltas)
+        return
+    for key, vector in deltas.items():
+        current = pending.setdefault(key, [0] * len(MEASURES))
+        for i, value in enumerate(vector):
+            current[i] += value
+
+
+def record_rows(rows, sign=1):
+    deltas = {}
+    for row in rows:
+        add(deltas, row, sign)
+    _record(deltas)
+
+
+def record_change(old, new):
+    """Zmiana jednej rezerwacji: odejmuje poprzedni stan (jeśli był) i dodaje nowy."""
+    deltas = {}
+    if old:
+        add(deltas, old, -1)
+    add(deltas, new)
+    _record(deltas)
+
+
+def batch_active():
+    return getattr(_pending, 'deltas', None) is not None
+
+
+@contextmanager
+def batch():
+    """Odkłada delty z record_rows do końca bloku (zagnieżdżone bloki łączą się z zewnętrznym)."""
+    if batch_active():
+        yield
+        return
+    _pending.deltas, _pending.departments = {}, {}
+    try:
+        with transaction.atomic():
+            yield
+            deltas, _pending.deltas = _pending.deltas, None
+            apply(deltas)
+    finally:
+        _pending.deltas = _pending.departments = None
+
+
+def record_bulk_created(bookings):
+    """Wkład rezerwacji z bulk_create; departamenty jednym zapytaniem."""
+    departments = dict(User.objects.filter(id__in={b.user_id for b in bookings}).values_list('id', 'department'))
+    record_rows({
+        'start_time': b.start_time,
+        'end_time': b.end_time,
+        'room_id': b.room_id,
+        'status': b.status,
+        'attendees_count': b.attendees_count,
+        'user__department': departments.get(b.user_id),
+    } for b in bookings)
+
+
+def update_bookings(queryset, **changes):
+    """
+    QuerySet.update dla rezerwacji z aktualizacją agregatów (update nie wysyła
+    sygnałów). Stan przed i po odczytujemy paczkami id. Zwraca liczbę zmienionych.
+
+    update pomija też auto_now, więc updated_at ustawiamy sami – po nim
+    poller zdarzeń (bookings/events.py) wykrywa zmiany.
+    """
+    changes.setdefault('updated_at', timezone.now())
+    with transaction.atomic():
+        ids = list(queryset.values_list('id', flat=True))
+        updated = 0
+        for i in range(0, len(ids), ID_BATCH):
+            batch = Booking.objects.filter(id__in=ids[i:i + ID_BATCH])
+            deltas = {}
+            for row in state_rows(batch):
+                add(deltas, row, -1)
+            updated += batch.update(**changes)
+            for row in state_rows(batch):
+                add(deltas, row, 1)
+            apply(deltas)
+        if updated:
+            # update nie wysyła sygnałów, więc cache odpowiedzi unieważniamy tutaj
+            transaction.on_commit(bump_version)
+    return updated
+
+
+def move_department(user_id, old, new):
+    """Przenosi rezerwacje użytkownika między departamentami w agregatach."""
+    deltas = {}
+    for row in state_rows(Booking.objects.filter(user_id=user_id)):
+        add(deltas, dict(row, user__department=old), -1)
+        add(deltas, dict(row, user__department=new), 1)
+    apply(deltas)
+
+
+def restate_cost(room_id, rate):
+    BookingDailyRollup.objects.filter(room_id=room_id).update(cost=_cost_expression(F('minutes'), Decimal(rate or 0)))
+
+
+def local_bounds(start_date, end_date):
+    """[początek start_date, początek dnia po end_date) w strefie TIME_ZONE."""
+    tz = timezone.get_current_timezone()
+    return (
+        timezone.make_aware(datetime.combine(start_date, datetime.min.time()), tz),
+        timezone.make_aware(datetime.combine(end_date + timedelta(days=1), datetime.min.time()), tz),
+    )
+
+
+def rebuild(start_date, end_date):
+    """
+    Przelicza od zera agregaty dni [start_date, end_date] z tabeli bookings.
+    Zwraca (liczba rezerwacji, liczba wierszy agregatów).
+    """
+    days = [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)]
+    start_dt, end_dt = local_bounds(start_date, end_date)
+    for _ in range(REBUILD_LOCK_RETRIES):
+        with transaction.atomic():
+            if not _lock_days(days, shared=False):
+                # Trwają zapisy w tych dniach – wycofujemy się, żeby nie trzymać części blokad
+                transaction.set_rollback(True)
+            else:
+                deltas = {}
+                count = 0
+                rows = state_rows(Booking.objects.filter(start_time__gte=start_dt, start_time__lt=end_dt))
+                for row in rows.iterator(chunk_size=5000):
+                    add(deltas, row)
+                    count += 1
+                rates = _rates({key[1] for key in deltas})
+                BookingDailyRollup.objects.filter(day__gte=start_date, day__lte=end_date).delete()
+                BookingDailyRollup.objects.bulk_create([
+                    BookingDailyRollup(
+                        day=day, room_id=room_id, department=department, status=status,
+                        **dict(zip(MEASURES, vector)), cost=_cost(vector[1], rates[room_id]),
+                    )
+                    for (day, room_id, department, status), vector in deltas.items()
+                ], batch_size=1000)
+                return count, len(deltas)
+        time.sleep(REBUILD_LOCK_SLEEP)
+    raise RuntimeError(f"Nie udało się zablokować dni {start_date}–{end_date} do przebudowy")
@@ -1,30 +1,174 @@
-from django.db.models.signals import post_save
-from django.dispatch import receiver
-from .models import Booking, Notification, User
-from django.utils import timezone
-from datetime import timedelta
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_save, pre_delete
+from django.dispatch import receiver, Signal
+from .availability import schedule_index
+from .events import booking_event, broadcaster, notification_event
+from . import rollups
+from .cache import bump_notifications_version, bump_version
+from .models import Booking, BookingSeries, Notification, NotificationCounter, OutboxEvent, Room, User
+from .outbox import enqueue
+from .reminders import reschedule as reschedule_reminder
+
+# Wysyłany po bulk_create rezerwacji (bulk_create nie wywołuje post_save).
+# Argumenty: bookings (lista utworzonych), notify (czy wysłać przypomnienia),
+# announce (czy ogłosić nową serię).
+bookings_bulk_created = Signal()
 
 @receiver(post_save, sender=Booking)
 def create_notifications_after_booking(sender, instance, created, **kwargs):
     if created:
-        # Pobierz wszystkich użytkowników
-        all_users = User.objects.all()
-
-        # 1. Powiadomienie o utworzeniu nowej rezerwacji - DLA WSZYSTKICH UŻYTKOWNIKÓW
-        for user in all_users:
-            Notification.objects.create(
-                user=user,
-                message=f"Nowa rezerwacja: '{instance.title}' w sali {instance.room.name} przez {instance.user.name}",
-                created_at=timezone.now()
-            )
-
-        # 2. Powiadomienie przypominające 1 godzinę przed rozpoczęciem - DLA WSZYSTKICH UŻYTKOWNIKÓW
-        scheduled_time = instance.start_time - timedelta(hours=1)
-        for user in all_users:
-            Notification.objects.create(
-                user=user,
-                message=f"Przypomnienie: Rezerwacja '{instance.title}' w sali {instance.room.name} zaczyna się za godzinę!",
-                created_at=scheduled_time
-            )
+        # Ogłoszenie i przypomnienie tworzy worker process_outbox;
+        # tutaj tylko jeden wiersz outbox w transakcji rezerwacji
+        enqueue(OutboxEvent.BOOKING_CREATED, booking_id=instance.id)
+
+
+@receiver(post_save, sender=Booking)
+def reschedule_reminder_on_save(sender, instance, created, **kwargs):
+    # Nowe rezerwacje dostają przypomnienie z outboxa; tu tylko zmiany terminu i anulowanie
+    if not created:
+        reschedule_reminder(instance)
+
+
+@receiver(post_save, sender=Booking)
+def update_schedule_index_on_save(sender, instance, **kwargs):
+    # Indeks aktualizujemy dopiero po commicie, żeby wycofane zapisy nie zostawiały w nim śladu
+    transaction.on_commit(lambda: schedule_index.booking_saved(instance))
+
+
+@receiver(post_delete, sender=Booking)
+def update_schedule_index_on_delete(sender, instance, **kwargs):
+    # Po delete() Django zeruje instance.pk, a callback wykona się dopiero po commicie
+    booking_id = instance.pk
+    transaction.on_commit(lambda: schedule_index.booking_deleted(booking_id))
+
+
+@receiver(bookings_bulk_created)
+def update_schedule_index_on_bulk_create(sender, bookings, **kwargs):
+    def apply():
+        for booking in bookings:
+            schedule_index.booking_saved(booking)
+    transaction.on_commit(apply)
+
+
+@receiver(bookings_bulk_created)
+def create_notifications_after_series(sender, bookings, notify=True, announce=True, **kwargs):
+    """Jedno zdarzenie outbox na całą paczkę; powiadomienia tworzy worker process_outbox."""
+    if not notify or not bookings:
+        return
+    enqueue(
+        OutboxEvent.BOOKINGS_BULK_CREATED,
+        booking_ids=[booking.id for booking in bookings],
+        announce=announce,
+    )
+
+
+@receiver(post_save, sender=Booking)
+def publish_booking_event(sender, instance, created, **kwargs):
+    # Strumień SSE w tym procesie; bez podłączonych klientów nic nie kosztuje
+    if not broadcaster.has_subscribers:
+        return
+    event = booking_event(
+        instance.id, instance.room_id, instance.title, instance.start_time, instance.end_time,
+        instance.status, instance.updated_at, created,
+    )
+    transaction.on_commit(lambda: broadcaster.publish(event))
+
+
+@receiver(post_save, sender=Notification)
+def publish_notification_event(sender, instance, created, **kwargs):
+    if created and broadcaster.has_subscribers:
+        event = notification_event(instance)
+        transaction.on_commit(lambda: broadcaster.publish(event))
+
+
+@receiver(post_save, sender=Notification)
+def count_created_notification(sender, instance, created, **kwargs):
+    # Pojedyncze zapisy (admin, shell); ścieżki bulk_create liczą same
+    if created and not kwargs.get('raw'):
+        NotificationCounter.notifications_created([instance])
+
+
+@receiver(pre_save, sender=Booking)
+def remember_rollup_state(sender, instance, raw=False, **kwargs):
+    # Stan sprzed zmiany do odjęcia z dziennych agregatów (bookings/rollups.py)
+    instance._rollup_old = None
+    if not raw and not instance._state.adding and instance.pk is not None:
+        instance._rollup_old = rollups.state_rows(Booking.objects.filter(pk=instance.pk)).first()
+
+
+@receiver(post_save, sender=Booking)
+def update_rollup_on_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    old = getattr(instance, '_rollup_old', None)
+    rollups.record_change(old, rollups.instance_row(instance, base=old, update_fields=update_fields))
+    instance._rollup_old = None
+
+
+@receiver(pre_delete, sender=Booking)
+def remember_rollup_state_on_delete(sender, instance, **kwargs):
+    # Instancja mogła się zestarzeć (np. po update_bookings); w batch() instancje
+    # pochodzą z zapytania kolektora w tej samej transakcji, więc są aktualne
+    instance._rollup_old = None
+    if not rollups.batch_active():
+        instance._rollup_old = rollups.state_rows(Booking.objects.filter(pk=instance.pk)).first()
+
+
+@receiver(post_delete, sender=Booking)
+def update_rollup_on_delete(sender, instance, **kwargs):
+    old = getattr(instance, '_rollup_old', None) or rollups.instance_row(instance)
+    rollups.record_rows([old], sign=-1)
+    instance._rollup_old = None
+
+
+@receiver(bookings_bulk_created)
+def update_rollup_on_bulk_create(sender, bookings, **kwargs):
+    rollups.record_bulk_created(bookings)
+
+
+@receiver(pre_save, sender=User)
+def remember_department(sender, instance, raw=False, **kwargs):
+    instance._old_department = None
+    if not raw and not instance._state.adding and instance.pk is not None:
+        instance._old_department = User.objects.filter(pk=instance.pk).values_list('department', flat=True).first()
+
+
+@receiver(post_save, sender=User)
+def move_department_in_rollups(sender, instance, created, raw=False, **kwargs):
+    old = getattr(instance, '_old_department', None) or ''
+    if not created and not raw and old != (instance.department or ''):
+        rollups.move_department(instance.pk, old, instance.department)
+
+
+@receiver(pre_save, sender=Room)
+def remember_hourly_rate(sender, instance, raw=False, **kwargs):
+    instance._old_hourly_rate = None
+    if not raw and not instance._state.adding and instance.pk is not None:
+        instance._old_hourly_rate = Room.objects.filter(pk=instance.pk).values_list('hourly_rate', flat=True).first()
+
+
+@receiver(post_save, sender=Room)
+def restate_rollup_cost(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw and instance._old_hourly_rate != instance.hourly_rate:
+        rollups.restate_cost(instance.pk, instance.hourly_rate)
+
+
+@receiver(post_save, sender=Booking)
+@receiver(post_delete, sender=Booking)
+@receiver(post_save, sender=Room)
+@receiver(post_delete, sender=Room)
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+@receiver(post_save, sender=BookingSeries)
+@receiver(post_delete, sender=BookingSeries)
+@receiver(bookings_bulk_created)
+def invalidate_response_cache(sender, **kwargs):
+    # Po commicie: odczyt w trakcie transakcji nie zapisze starych danych pod nową wersją
+    transaction.on_commit(bump_version)
 
 
+@receiver(post_save, sender=Notification)
+def invalidate_notification_etags(sender, instance, created, **kwargs):
+    # Nowe powiadomienia unieważnia NotificationCounter.bump; tu edycje (np. w adminie)
+    if not created:
+        transaction.on_commit(bump_notifications_version)
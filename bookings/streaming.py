@@ -0,0 +1,96 @@
+"""
+Strumieniowe odpowiedzi JSON dla dużych list rezerwacji (?stream=json|ndjson).
+
+Wiersze czytamy przez ``.values().iterator(chunk_size=...)`` (na PostgreSQL
+kursor po stronie serwera), serializujemy pojedynczo i wysyłamy paczkami po
+około STREAM_BUFFER bajtów. W pamięci workera jest naraz jedna paczka
+wierszy z bazy i jeden bufor wyjścia, niezależnie od liczby rezerwacji,
+a pierwsze bajty wychodzą zaraz po pierwszej paczce.
+
+- ``json`` – tablica JSON ``[{...},{...}]``,
+- ``ndjson`` – jeden obiekt w linii (application/x-ndjson).
+"""
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+FORMATS = ('json', 'ndjson')
+CONTENT_TYPES = {
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson',
+}
+
+# Wiersze pobierane z bazy naraz i docelowy rozmiar jednego kawałka odpowiedzi
+CHUNK_SIZE = 2000
+STREAM_BUFFER = 32 * 1024
+
+
+class _Chunks:
+    """Skleja zserializowane wiersze w kawałki bajtów po około STREAM_BUFFER."""
+
+    def __init__(self, serialize, fmt):
+        self.serialize = serialize
+        self.encode = DjangoJSONEncoder(ensure_ascii=False).encode
+        self.ndjson = fmt == 'ndjson'
+        self.separator = ''
+        self.buffer = [] if self.ndjson else ['[']
+        self.size = 0
+
+    def add(self, row):
+        """Dokłada wiersz; zwraca kawałek do wysłania albo None."""
+        if self.ndjson:
+            part = self.encode(self.serialize(row)) + '\n'
+        else:
+            part = self.separator + self.encode(self.serialize(row))
+            self.separator = ','
+        self.buffer.append(part)
+        self.size += len(part)
+        if self.size < STREAM_BUFFER:
+            return None
+        return self.flush()
+
+    def flush(self):
+        data = ''.join(self.buffer).encode()
+        self.buffer = []
+        self.size = 0
+        return data
+
+    def close(self):
+        if not self.ndjson:
+            self.buffer.append(']')
+        return self.flush()
+
+
+def _content(queryset, chunks, chunk_size):
+    for row in queryset.iterator(chunk_size=chunk_size):
+        data = chunks.add(row)
+        if data:
+            yield data
+    yield chunks.close()
+
+
+async def _acontent(queryset, chunks, chunk_size):
+    # Pod ASGI synchroniczny iterator Django najpierw zebrałby całą treść
+    # w liście (StreamingHttpResponse.__aiter__); aiterator czyta paczkami
+    async for row in queryset.aiterator(chunk_size=chunk_size):
+        data = chunks.add(row)
+        if data:
+            yield data
+    yield chunks.close()
+
+
+def stream_rows(request, queryset, serialize, fmt, chunk_size=CHUNK_SIZE):
+    """
+    StreamingHttpResponse z wierszami querysetu ``.values()`` przepuszczonymi
+    przez ``serialize`` (dict -> obiekt JSON). Pod ASGI treść jest
+    asynchronicznym iteratorem, pod WSGI zwykłym generatorem.
+    """
+    chunks = _Chunks(serialize, fmt)
+    if isinstance(request, ASGIRequest):
+        content = _acontent(queryset, chunks, chunk_size)
+    else:
+        content = _content(queryset, chunks, chunk_size)
+    response = StreamingHttpResponse(content, content_type=CONTENT_TYPES[fmt])
+    # Bez buforowania w proxy (nginx) – klient dostaje dane od razu
+    response['X-Accel-Buffering'] = 'no'
+    return response
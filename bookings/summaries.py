@@ -0,0 +1,424 @@
+"""
+Agregaty dla strony podsumowań (/api/summaries) i raportu miesięcznego.
+
+Trzy silniki o tym samym interfejsie:
+
+- ``rollup`` (domyślny w widokach) – bloki z dziennych agregatów
+  booking_daily_rollups (bookings/rollups.py); koszt zależy od liczby dni
+  i sal, nie rezerwacji. Agregaty nie mają wymiaru użytkownika, więc liczba
+  użytkowników, ranking i wykres punktowy pochodzą z tabeli bookings.
+- ``sql`` – każdy blok to jedno zapytanie GROUP BY na przefiltrowanym
+  querysecie; dni w strefie TIME_ZONE przez TruncDate z tzinfo.
+- ``numpy`` – jedno zapytanie values_list do kolumn NumPy (początek/koniec
+  jako epoch, sala, użytkownik, kod departamentu, kod statusu, uczestnicy),
+  a wszystkie bloki z operacji wektorowych (bincount, searchsorted, lexsort).
+  Opłaca się, gdy baza jest obciążona, a worker ma wolne CPU – tabela jest
+  czytana raz zamiast raz na blok.
+
+Wszystkie zwracają surowe agregaty; odpowiedź API składa z nich ``summarize``.
+Tygodnie i miesiące liczymy z wyniku dziennego (najwyżej kilkaset wierszy).
+Porównanie silników: manage.py benchmark_summaries.
+"""
+from datetime import date, datetime, timedelta
+
+from django.db.models import Case, Count, DurationField, ExpressionWrapper, F, IntegerField, Q, Sum, Value, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Booking
+from .rollups import BUCKET_FIELDS, HISTOGRAM_BINS
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+DURATION = ExpressionWrapper(F('end_time') - F('start_time'), output_field=DurationField())
+
+# Godziny pracy do wyliczenia wykorzystania sal
+WORK_HOURS = (8, 18)
+
+WEEKDAY_LABELS = ['Pn', 'Wt', 'Śr', 'Cz', 'Pt', 'Sb', 'Nd']
+MONTH_NAMES_PL = [
+    'styczeń', 'luty', 'marzec', 'kwiecień', 'maj', 'czerwiec',
+    'lipiec', 'sierpień', 'wrzesień', 'październik', 'listopad', 'grudzień'
+]
+
+# Etykiety przedziałów HISTOGRAM_BINS (minuty); ostatni jest otwarty
+HISTOGRAM_LABELS = ['0-30', '30-60', '60-90', '90-120', '120+']
+
+NO_DEPARTMENT = 'Brak departamentu'
+SCATTER_LIMIT = 500
+
+ENGINES = ('rollup', 'sql', 'numpy')
+
+
+def _hours(duration):
+    return duration.total_seconds() / 3600 if duration else 0.0
+
+
+def _days(start_date, end_date):
+    return [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)]
+
+
+def get_engine(name, qs, rollups=None):
+    """
+    Silnik po nazwie; ValueError dla nieznanej (albo rollup bez querysetu
+    agregatów o tych samych filtrach co qs), RuntimeError gdy brak NumPy.
+    """
+    if name == 'rollup':
+        if rollups is None:
+            raise ValueError("Silnik rollup wymaga querysetu BookingDailyRollup")
+        return RollupSummaries(qs, rollups)
+    if name == 'sql':
+        return SqlSummaries(qs)
+    if name == 'numpy':
+        if not NUMPY_AVAILABLE:
+            raise RuntimeError("NumPy nie zainstalowany")
+        return NumpySummaries(qs)
+    raise ValueError(f"Nieznany silnik podsumowań: {name}")
+
+
+class SqlSummaries:
+    """Każdy blok jednym zapytaniem agregującym w bazie."""
+
+    def __init__(self, qs):
+        self.qs = qs.order_by()
+
+    def totals(self):
+        """{total, hours, cancelled, rooms, users}"""
+        totals = self.qs.aggregate(
+            total=Count('id'),
+            duration=Sum(DURATION),
+            cancelled=Count('id', filter=Q(status='cancelled')),
+            rooms=Count('room_id', distinct=True),
+            users=Count('user_id', distinct=True),
+        )
+        totals['hours'] = _hours(totals.pop('duration'))
+        return totals
+
+    def daily(self):
+        """{dzień lokalny: (liczba, godziny)}"""
+        rows = (
+            self.qs.annotate(day=TruncDate('start_time', tzinfo=timezone.get_current_timezone()))
+            .values('day')
+            .annotate(count=Count('id'), duration=Sum(DURATION))
+        )
+        return {row['day']: (row['count'], _hours(row['duration'])) for row in rows}
+
+    def rooms(self):
+        """{room_id: (liczba, godziny)}"""
+        rows = self.qs.values('room_id').annotate(count=Count('id'), duration=Sum(DURATION))
+        return {row['room_id']: (row['count'], _hours(row['duration'])) for row in rows}
+
+    def departments(self):
+        """{departament: (liczba, godziny)}; NULL i pusty to ta sama kategoria."""
+        rows = self.qs.values('user__department').annotate(count=Count('id'), duration=Sum(DURATION))
+        merged = {}
+        for row in rows:
+            name = row['user__department'] or NO_DEPARTMENT
+            count, hours = merged.get(name, (0, 0.0))
+            merged[name] = (count + row['count'], hours + _hours(row['duration']))
+        return merged
+
+    def top_users(self, limit):
+        """[(user_id, liczba, godziny)] malejąco po liczbie."""
+        rows = (
+            self.qs.values('user_id')
+            .annotate(count=Count('id'), duration=Sum(DURATION))
+            .order_by('-count', 'user_id')[:limit]
+        )
+        return [(row['user_id'], row['count'], _hours(row['duration'])) for row in rows]
+
+    def histogram(self):
+        whens = [
+            When(duration__lt=timedelta(minutes=upper), then=Value(i))
+            for i, upper in enumerate(HISTOGRAM_BINS)
+        ]
+        rows = (
+            self.qs.alias(duration=DURATION)
+            .annotate(bucket=Case(*whens, default=Value(len(HISTOGRAM_BINS)), output_field=IntegerField()))
+            .values('bucket')
+            .annotate(count=Count('id'))
+        )
+        values = [0] * len(HISTOGRAM_LABELS)
+        for row in rows:
+            values[row['bucket']] += row['count']
+        return values
+
+    def scatter(self, limit):
+        rows = self.qs.annotate(duration=DURATION).values_list(
+            'attendees_count', 'duration', 'room__name', 'user__name',
+        )[:limit]
+        return [
+            [int(attendees or 0), int(round(duration.total_seconds() / 60)), f"{room} · {user}"]
+            for attendees, duration, room, user in rows
+        ]
+
+
+class RollupSummaries:
+    """Bloki z dziennych agregatów; to, czego w nich nie ma, z SqlSummaries."""
+
+    def __init__(self, qs, rollups):
+        self.rollups = rollups.order_by()
+        self.bookings = SqlSummaries(qs)
+
+    def totals(self):
+        sums = self.rollups.aggregate(
+            total=Sum('bookings'),
+            minutes=Sum('minutes'),
+            cancelled=Sum('bookings', filter=Q(status='cancelled')),
+            rooms=Count('room_id', distinct=True),
+        )
+        return {
+            'total': sums['total'] or 0,
+            'hours': (sums['minutes'] or 0) / 60,
+            'cancelled': sums['cancelled'] or 0,
+            'rooms': sums['rooms'],
+            'users': self.bookings.qs.aggregate(users=Count('user_id', distinct=True))['users'],
+        }
+
+    def _grouped(self, field):
+        rows = self.rollups.values(field).annotate(count=Sum('bookings'), minutes=Sum('minutes'))
+        return [(row[field], row['count'], row['minutes'] / 60) for row in rows]
+
+    def daily(self):
+        return {day: (count, hours) for day, count, hours in self._grouped('day')}
+
+    def rooms(self):
+        return {room_id: (count, hours) for room_id, count, hours in self._grouped('room_id')}
+
+    def departments(self):
+        # Agregaty trzymają brak departamentu jako pusty napis
+        return {name or NO_DEPARTMENT: (count, hours) for name, count, hours in self._grouped('department')}
+
+    def top_users(self, limit):
+        return self.bookings.top_users(limit)
+
+    def histogram(self):
+        sums = self.rollups.aggregate(**{field: Sum(field) for field in BUCKET_FIELDS})
+        return [sums[field] or 0 for field in BUCKET_FIELDS]
+
+    def scatter(self, limit):
+        return self.bookings.scatter(limit)
+
+
+class NumpySummaries:
+    """
+    Wszystkie bloki z kolumn załadowanych jednym zapytaniem. Departament
+    i status trzymamy jako kody całkowite; słowniki kodów są małe.
+    """
+    STATUSES = [value for value, _ in Booking.STATUS_CHOICES]
+
+    def __init__(self, qs):
+        self.qs = qs.order_by()
+        rows = list(self.qs.values_list(
+            'start_time', 'end_time', 'room_id', 'user_id', 'user__department', 'status', 'attendees_count',
+        ))
+        n = len(rows)
+        self.start = np.fromiter((r[0].timestamp() for r in rows), dtype=np.float64, count=n)
+        self.end = np.fromiter((r[1].timestamp() for r in rows), dtype=np.float64, count=n)
+        # Długość z różnicy datetime, nie epoch – bez błędu zaokrągleń na granicach histogramu
+        seconds = np.fromiter(((r[1] - r[0]).total_seconds() for r in rows), dtype=np.float64, count=n)
+        self.room = np.fromiter((r[2] for r in rows), dtype=np.int64, count=n)
+        self.user = np.fromiter((r[3] for r in rows), dtype=np.int64, count=n)
+
+        self.department_names = []
+        codes = {}
+        statuses = {name: i for i, name in enumerate(self.STATUSES)}
+
+        def code(mapping, names, value):
+            if value not in mapping:
+                mapping[value] = len(names)
+                names.append(value)
+            return mapping[value]
+
+        self.department = np.fromiter(
+            (code(codes, self.department_names, r[4] or NO_DEPARTMENT) for r in rows), dtype=np.int32, count=n,
+        )
+        status_names = list(self.STATUSES)
+        self.status = np.fromiter((code(statuses, status_names, r[5]) for r in rows), dtype=np.int32, count=n)
+        self.attendees = np.fromiter((r[6] or 0 for r in rows), dtype=np.int64, count=n)
+        del rows
+
+        self.hours = seconds / 3600
+        self._cancelled = statuses['cancelled']
+
+    def _grouped(self, keys):
+        """(unikalne klucze, liczba, godziny) przez np.unique + bincount."""
+        unique, inverse = np.unique(keys, return_inverse=True)
+        counts = np.bincount(inverse, minlength=len(unique))
+        hours = np.bincount(inverse, weights=self.hours, minlength=len(unique))
+        return unique, counts, hours
+
+    def totals(self):
+        return {
+            'total': int(len(self.start)),
+            'hours': float(self.hours.sum()),
+            'cancelled': int(np.count_nonzero(self.status == self._cancelled)),
+            'rooms': int(len(np.unique(self.room))),
+            'users': int(len(np.unique(self.user))),
+        }
+
+    def daily(self):
+        if not len(self.start):
+            return {}
+        # Granice lokalnych dni jako epoch – searchsorted uwzględnia zmiany czasu
+        tz = timezone.get_current_timezone()
+        first = datetime.fromtimestamp(self.start.min(), tz).date()
+        last = datetime.fromtimestamp(self.start.max(), tz).date()
+        days = _days(first, last + timedelta(days=1))
+        bounds = np.array([
+            timezone.make_aware(datetime.combine(d, datetime.min.time()), tz).timestamp() for d in days
+        ])
+        index = np.searchsorted(bounds, self.start, side='right') - 1
+        counts = np.bincount(index, minlength=len(days))
+        hours = np.bincount(index, weights=self.hours, minlength=len(days))
+        return {days[i]: (int(counts[i]), float(hours[i])) for i in np.flatnonzero(counts)}
+
+    def rooms(self):
+        unique, counts, hours = self._grouped(self.room)
+        return {int(r): (int(c), float(h)) for r, c, h in zip(unique, counts, hours)}
+
+    def departments(self):
+        counts = np.bincount(self.department, minlength=len(self.department_names))
+        hours = np.bincount(self.department, weights=self.hours, minlength=len(self.department_names))
+        return {name: (int(counts[i]), float(hours[i])) for i, name in enumerate(self.department_names)}
+
+    def top_users(self, limit):
+        unique, counts, hours = self._grouped(self.user)
+        # Malejąco po liczbie, przy remisie rosnąco po id (jak ORDER BY -count, user_id)
+        order = np.lexsort((unique, -counts))[:limit]
+        return [(int(unique[i]), int(counts[i]), float(hours[i])) for i in order]
+
+    def histogram(self):
+        minutes = self.hours * 60
+        buckets = np.searchsorted(np.array(HISTOGRAM_BINS, dtype=np.float64), minutes, side='right')
+        return np.bincount(buckets, minlength=len(HISTOGRAM_LABELS)).tolist()
+
+    def scatter(self, limit):
+        # Punkty to pojedyncze wiersze z nazwami – krótkie zapytanie jak w silniku SQL
+        return SqlSummaries(self.qs).scatter(limit)
+
+
+def trend_blocks(per_day, start_date, end_date):
+    """Trend dzienny, porównanie tygodni i statystyki dzienne/tygodniowe/miesięczne."""
+    days = _days(start_date, end_date)
+    trend = []
+    for d in days:
+        count, hours = per_day.get(d, (0, 0.0))
+        trend.append({'date': d.isoformat(), 'count': count, 'hours': round(hours, 2)})
+
+    # Bieżący tydzień (wg end_date) i poprzedni; dni spoza zakresu mają 0
+    week_start = end_date - timedelta(days=end_date.isoweekday() - 1)
+    week_days = [week_start + timedelta(days=i) for i in range(7)]
+    prev_week_days = [d - timedelta(days=7) for d in week_days]
+
+    def count_in_range(d):
+        return per_day.get(d, (0, 0.0))[0] if start_date <= d <= end_date else 0
+
+    weekly_compare = {
+        'labels': WEEKDAY_LABELS,
+        'this_week_dates': [d.isoformat() for d in week_days],
+        'prev_week_dates': [d.isoformat() for d in prev_week_days],
+        'this_week': [count_in_range(d) for d in week_days],
+        'prev_week': [count_in_range(d) for d in prev_week_days],
+    }
+
+    weekly = {}
+    monthly = {}
+    for d, (count, _) in per_day.items():
+        if not start_date <= d <= end_date:
+            continue
+        iso_year, iso_week, _ = d.isocalendar()
+        weekly[(iso_year, iso_week)] = weekly.get((iso_year, iso_week), 0) + count
+        monthly[(d.year, d.month)] = monthly.get((d.year, d.month), 0) + count
+
+    stats_weekly = []
+    for (y, w), value in sorted(weekly.items()):
+        wk_start = date.fromisocalendar(y, w, 1)
+        wk_end = date.fromisocalendar(y, w, 7)
+        stats_weekly.append({
+            'label': f"{y}-W{w:02d}",
+            'label_pretty': f"{wk_start.strftime('%d.%m')}–{wk_end.strftime('%d.%m')}",
+            'start': wk_start.isoformat(),
+            'end': wk_end.isoformat(),
+            'value': value,
+        })
+
+    stats_monthly = []
+    for (y, m), value in sorted(monthly.items()):
+        m_start = date(y, m, 1)
+        m_end = (date(y + 1, 1, 1) if m == 12 else date(y, m + 1, 1)) - timedelta(days=1)
+        stats_monthly.append({
+            'label': f"{y}-{m:02d}",
+            'label_pretty': f"{MONTH_NAMES_PL[m - 1]} {y}",
+            'start': m_start.isoformat(),
+            'end': m_end.isoformat(),
+            'value': value,
+        })
+
+    return {
+        'trend': trend,
+        'weekly_compare': weekly_compare,
+        'reservation_stats': {
+            'daily': [{'label': t['date'], 'value': t['count']} for t in trend],
+            'weekly': stats_weekly,
+            'monthly': stats_monthly,
+        },
+    }
+
+
+def summarize(qs, start_date, end_date, room_names, user_names, engine='sql', rollups=None):
+    """Wszystkie bloki odpowiedzi /api/summaries poza 'meta'."""
+    source = get_engine(engine, qs, rollups)
+
+    totals = source.totals()
+    total, hours = totals['total'], totals['hours']
+    result = {
+        'kpi': {
+            'total_bookings': total,
+            'total_hours': round(hours, 2),
+            'cancel_rate': (totals['cancelled'] / total) if total else 0,
+            'avg_minutes': round(hours * 60 / total, 2) if total else 0,
+            'unique_rooms': totals['rooms'],
+            'unique_users': totals['users'],
+        },
+    }
+    result.update(trend_blocks(source.daily(), start_date, end_date))
+
+    possible = (WORK_HOURS[1] - WORK_HOURS[0]) * max(1, (end_date - start_date).days + 1)
+    room_items = [
+        {
+            'room_id': room_id,
+            'room': room_names.get(room_id, str(room_id)),
+            'hours': round(room_hours, 2),
+            'utilization': round(room_hours / possible * 100, 1) if possible else 0,
+            'count': count,
+        }
+        for room_id, (count, room_hours) in source.rooms().items()
+    ]
+    room_items.sort(key=lambda x: x['hours'], reverse=True)
+    result['top_rooms'] = room_items[:10]
+
+    dept_items = [
+        {'dept': name, 'count': count, 'hours': round(dept_hours, 2)}
+        for name, (count, dept_hours) in source.departments().items()
+    ]
+    dept_items.sort(key=lambda x: x['hours'], reverse=True)
+    result['dept_overview'] = dept_items[:12]
+
+    result['treemap'] = [{'name': x['room'], 'value': x['hours']} for x in room_items if x['hours'] > 0]
+    result['scatter'] = source.scatter(SCATTER_LIMIT)
+    result['histogram'] = {'labels': HISTOGRAM_LABELS, 'values': source.histogram()}
+    result['top_users'] = [
+        {
+            'user_id': user_id,
+            'user': user_names.get(user_id, str(user_id)),
+            'count': count,
+            'hours': round(user_hours, 2),
+        }
+        for user_id, count, user_hours in source.top_users(10)
+    ]
+    return result
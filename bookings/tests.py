@@ -1,3 +1,1061 @@
-from django.test import TestCase
+import asyncio
+import json
+import unittest
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import outbox, recurrence, reminders, retention, rollups
+from .availability import NUMPY_AVAILABLE, RoomSchedule, schedule_index
+from .events import Broadcaster, notification_event
+from .importer import BookingImporter, _validate, iter_records
+from .models import (
+    Booking, BookingDailyRollup, BookingSeries, Equipment, Notification, NotificationArchive, NotificationCounter, OutboxEvent, Reminder, Room, User,
+    is_overlap_violation,
+)
+
+# Widoki z cache odpowiedzi (bookings/cache.py) – osobny, pusty cache w pamięci na test
+isolated_cache = override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+
+
+class FindAvailableQueryCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='anna@example.com', name='Anna')
+        cls.projector = Equipment.objects.create(name='Projektor')
+        cls.start = (timezone.now() + timedelta(days=1)).replace(microsecond=0)
+        cls.end = cls.start + timedelta(hours=1)
+
+    def _create_rooms(self, count):
+        rooms = []
+        for _ in range(count):
+            room = Room.objects.create(name=f'Sala {Room.objects.count() + 1}', capacity=10)
+            room.equipment.add(self.projector)
+            rooms.append(room)
+        return rooms
+
+    def _search(self, **params):
+        params.setdefault('start_time', self.start.isoformat())
+        params.setdefault('end_time', self.end.isoformat())
+        response = self.client.get(reverse('find_available'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()['available_rooms']
+
+    def test_busy_rooms_are_excluded(self):
+        busy, free = self._create_rooms(2)
+        Booking.objects.create(
+            room=busy, user=self.user, title='Spotkanie',
+            start_time=self.start - timedelta(minutes=30), end_time=self.start + timedelta(minutes=30),
+        )
+        Booking.objects.create(
+            room=free, user=self.user, title='Anulowane', status='cancelled',
+            start_time=self.start, end_time=self.end,
+        )
+
+        rooms = self._search(equipment='Projektor')
+
+        self.assertEqual([r['id'] for r in rooms], [free.id])
+        self.assertEqual(rooms[0]['equipment'], ['Projektor'])
+
+    def test_query_count_does_not_grow_with_rooms(self):
+        self._create_rooms(3)
+        with self.assertNumQueries(2):
+            self.assertEqual(len(self._search()), 3)
+
+        self._create_rooms(20)
+        with self.assertNumQueries(2):
+            self.assertEqual(len(self._search(equipment='Projektor')), 23)
+
+
+@isolated_cache
+class StreamingListTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create(email='ewa@example.com', name='Ewa', department='IT')
+        room = Room.objects.create(name='Sala A', capacity=10)
+        start = (timezone.now() + timedelta(days=2)).replace(microsecond=0)
+        for i in range(5):
+            Booking.objects.create(
+                room=room, user=user, title=f'Spotkanie {i}',
+                start_time=start + timedelta(hours=i), end_time=start + timedelta(hours=i, minutes=30),
+            )
+
+    def _paged(self):
+        return self.client.get(reverse('get_bookings'), {'per_page': 100}).json()['bookings']
+
+    def test_json_and_ndjson_match_paged_response(self):
+        expected = self._paged()
+
+        response = self.client.get(reverse('get_bookings'), {'stream': 'json'})
+        self.assertTrue(response.streaming)
+        self.assertEqual(json.loads(b''.join(response.streaming_content)), expected)
+
+        response = self.client.get(reverse('get_bookings'), {'stream': 'ndjson'})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line) for line in lines], expected)
+
+    async def test_asgi_response_is_async_iterator(self):
+        expected = await sync_to_async(self._paged)()
+        response = await self.async_client.get(reverse('get_bookings'), {'stream': 'ndjson'})
+        self.assertTrue(response.is_async)
+        body = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual([json.loads(line) for line in body.decode().splitlines()], expected)
+
+    def test_unknown_format_is_rejected(self):
+        self.assertEqual(self.client.get(reverse('get_bookings'), {'stream': 'xml'}).status_code, 400)
+
+
+@isolated_cache
+class SummariesBookingsPagingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='jan@example.com', name='Jan', department='HR')
+        cls.rooms = [Room.objects.create(name=f'Sala {i}', capacity=10) for i in range(4)]
+
+    def _book(self, room, start, minutes=30):
+        return Booking.objects.create(
+            room=room, user=self.user, title='Spotkanie',
+            start_time=start, end_time=start + timedelta(minutes=minutes),
+        )
+
+    def _get(self, **params):
+        response = self.client.get(reverse('get_summaries_bookings_api'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_cursor_pages_through_equal_start_times(self):
+        start = timezone.localtime().replace(hour=10, minute=0, second=0, microsecond=0) - timedelta(days=3)
+        # Po cztery rezerwacje o tej samej godzinie – granice stron wypadają w ich środku
+        for hours in range(3):
+            for room in self.rooms:
+                self._book(room, start + timedelta(hours=hours))
+        expected = list(Booking.objects.order_by('-start_time', '-id').values_list('id', flat=True))
+
+        ids, cursor = [], None
+        while True:
+            params = {'limit': 3, 'start': str(start.date()), 'end': str(start.date())}
+            if cursor:
+                params['cursor'] = cursor
+            data = self._get(**params)
+            ids += [b['id'] for b in data['bookings']]
+            cursor = data['next_cursor']
+            if not data['has_more']:
+                break
+
+        self.assertEqual(ids, expected)
+
+    def test_weekday_hour_filter_uses_local_time_across_dst(self):
+        # 29.03.2026 Polska przechodzi na czas letni: 9:00 w piątek to 8:00 UTC, w poniedziałek 7:00 UTC
+        tz = timezone.get_current_timezone()
+        friday = self._book(self.rooms[0], timezone.make_aware(datetime(2026, 3, 27, 9), tz))
+        monday = self._book(self.rooms[0], timezone.make_aware(datetime(2026, 3, 30, 9), tz))
+        self._book(self.rooms[0], timezone.make_aware(datetime(2026, 3, 30, 10), tz))
+        period = {'start': '2026-03-23', 'end': '2026-04-05'}
+
+        monday_nine = self._get(weekday=0, hour=9, **period)['bookings']
+        friday_nine = self._get(weekday=4, hour=9, **period)['bookings']
+
+        self.assertEqual([b['id'] for b in monday_nine], [monday.id])
+        self.assertEqual([b['id'] for b in friday_nine], [friday.id])
+
+    def test_matching_etag_returns_304(self):
+        response = self.client.get(reverse('get_summaries_bookings_api'))
+        self.assertIn('no-cache', response['Cache-Control'])
+
+        response = self.client.get(reverse('get_summaries_bookings_api'), HTTP_IF_NONE_MATCH=response['ETag'])
+
+        self.assertEqual(response.status_code, 304)
+
+
+@isolated_cache
+class NotificationApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_since_repeats_recent_ids_below_cursor(self):
+        # Wiersz z niższym id zatwierdzony po wyższym (dwa workery process_outbox)
+        late = Notification.objects.create(message='Późny commit')
+        seen = Notification.objects.create(message='Już widziane')
+
+        data = self.client.get(reverse('get_notifications_api'), {'since': seen.id}).json()
+
+        self.assertEqual([n['id'] for n in data['notifications']], [late.id, seen.id])
+        self.assertEqual(data['next_cursor'], seen.id)
+        self.assertFalse(data['has_more'])
+
+        count = self.client.get(reverse('notifications_count_api'), {'cursor': 1}).json()
+        self.assertEqual(count['next_cursor'], seen.id)
+        self.assertEqual(count['recent_ids'], [late.id, seen.id])
+
+    def test_invalid_user_id_is_rejected(self):
+        notification = Notification.objects.create(message='Przerwa techniczna')
+
+        self.assertEqual(self.client.get(reverse('get_notifications_api'), {'user_id': 'abc'}).status_code, 400)
+        response = self.client.post(reverse('mark_notification_read', args=[notification.id]) + '?user_id=abc')
+        self.assertEqual(response.status_code, 400)
+
+
+class AvailabilitySearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='ola@example.com', name='Ola')
+        cls.room = Room.objects.create(name='Sala B', capacity=6)
+        cls.start = (timezone.now() + timedelta(days=1)).replace(minute=0, second=0, microsecond=0)
+
+    def _get(self, **params):
+        return self.client.get(reverse('find_free_slots'), params)
+
+    def test_returns_every_slot_in_a_gap(self):
+        Booking.objects.create(
+            room=self.room, user=self.user, title='Spotkanie',
+            start_time=self.start + timedelta(hours=1), end_time=self.start + timedelta(hours=2),
+        )
+
+        response = self._get(
+            duration=30, step=15, limit=10,
+            start_time=self.start.isoformat(), end_time=(self.start + timedelta(hours=3)).isoformat(),
+        )
+
+        starts = [s['start_time'] for s in response.json()['slots']]
+        expected = [self.start + timedelta(minutes=m) for m in (0, 15, 30, 120, 135, 150)]
+        self.assertEqual(starts, [s.isoformat() for s in expected])
+
+    def test_invalid_capacity_is_rejected(self):
+        self.assertEqual(self._get(duration=30, capacity='abc').status_code, 400)
+
+    def test_grid_rejects_invalid_room_id(self):
+        self.assertEqual(self.client.get(reverse('availability_grid'), {'room_id': '1,abc'}).status_code, 400)
+
+        response = self.client.get(reverse('availability_grid'), {'room_id': f' {self.room.id} ', 'slot': 60})
+        self.assertEqual([r['id'] for r in response.json()['rooms']], [self.room.id])
+
+    def test_window_is_clamped(self):
+        end = self.start + timedelta(days=365)
+        response = self._get(duration=30, start_time=self.start.isoformat(), end_time=end.isoformat())
+
+        criteria = response.json()['search_criteria']
+        self.assertEqual(criteria['end_time'], (self.start + timedelta(days=31)).isoformat())
+
+
+class OverlapConstraintTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='piotr@example.com', name='Piotr')
+        cls.room = Room.objects.create(name='Sala C', capacity=8)
+        cls.start = (timezone.now() + timedelta(days=1)).replace(minute=0, second=0, microsecond=0)
+        cls.booking = Booking.objects.create(
+            room=cls.room, user=cls.user, title='Spotkanie',
+            start_time=cls.start, end_time=cls.start + timedelta(hours=1),
+        )
+
+    def _create(self, start, end):
+        return self.client.post(reverse('create_booking'), json.dumps({
+            'room_id': self.room.id, 'user_id': self.user.id, 'title': 'Nowe',
+            'start_time': start.isoformat(), 'end_time': end.isoformat(),
+        }), content_type='application/json')
+
+    def test_overlapping_booking_is_conflict(self):
+        response = self._create(self.start + timedelta(minutes=30), self.start + timedelta(minutes=90))
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Booking.objects.filter(room=self.room).count(), 1)
+
+    def test_adjacent_and_cancelled_bookings_do_not_conflict(self):
+        self.assertEqual(self._create(self.start + timedelta(hours=1), self.start + timedelta(hours=2)).status_code, 201)
+
+        Booking.objects.filter(pk=self.booking.pk).update(status='cancelled')
+        self.assertEqual(self._create(self.start, self.start + timedelta(minutes=30)).status_code, 201)
+
+    def test_moving_into_busy_slot_is_rejected_by_database(self):
+        other = Booking.objects.create(
+            room=self.room, user=self.user, title='Później',
+            start_time=self.start + timedelta(hours=2), end_time=self.start + timedelta(hours=3),
+        )
+        other.start_time = self.start + timedelta(minutes=30)
+
+        with self.assertRaises(IntegrityError) as ctx, transaction.atomic():
+            other.save()
+        self.assertTrue(is_overlap_violation(ctx.exception))
+
+
+class RollupConsistencyTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.anna = User.objects.create(email='anna.r@example.com', name='Anna', department='IT')
+        cls.jan = User.objects.create(email='jan.r@example.com', name='Jan', department='HR')
+        cls.small = Room.objects.create(name='Mała', capacity=4, hourly_rate=Decimal('40.00'))
+        cls.big = Room.objects.create(name='Duża', capacity=20, hourly_rate=Decimal('100.00'))
+        cls.day = timezone.localdate() + timedelta(days=10)
+
+    def _at(self, day_offset, hour):
+        return timezone.make_aware(datetime.combine(self.day + timedelta(days=day_offset), datetime.min.time())) + timedelta(hours=hour)
+
+    def _book(self, room, user, day_offset, hour, minutes):
+        start = self._at(day_offset, hour)
+        return Booking.objects.create(
+            room=room, user=user, title='Spotkanie', attendees_count=3,
+            start_time=start, end_time=start + timedelta(minutes=minutes),
+        )
+
+    def _rollups(self):
+        return list(BookingDailyRollup.objects.order_by('day', 'room_id', 'department', 'status').values(
+            'day', 'room_id', 'department', 'status', 'bookings', 'minutes', 'attendees', 'cost',
+            'len_0_30', 'len_30_60', 'len_60_90', 'len_90_120', 'len_120_plus',
+        ))
+
+    def assertMatchesRebuild(self):
+        incremental = self._rollups()
+        self.assertTrue(incremental)
+        rollups.rebuild(self.day - timedelta(days=1), self.day + timedelta(days=3))
+        self.assertEqual(incremental, self._rollups())
+
+    def test_incremental_rollups_match_rebuild(self):
+        moved = self._book(self.small, self.anna, 0, 9, 45)
+        self._book(self.small, self.jan, 0, 11, 150)
+        cancelled = self._book(self.big, self.anna, 1, 9, 30)
+        deleted = self._book(self.big, self.jan, 1, 13, 90)
+        self.assertMatchesRebuild()
+
+        # Przeniesienie do innej sali i dnia, z inną długością
+        moved.room = self.big
+        moved.start_time = self._at(2, 8)
+        moved.end_time = moved.start_time + timedelta(minutes=100)
+        moved.save()
+        self.assertMatchesRebuild()
+
+        # Anulowanie przez update (bez sygnałów) i usunięcie
+        rollups.update_bookings(Booking.objects.filter(pk=cancelled.pk), status='cancelled')
+        deleted.delete()
+        self.assertMatchesRebuild()
+
+        # Departament użytkownika i stawka sali
+        self.jan.department = 'Finanse'
+        self.jan.save()
+        self.big.hourly_rate = Decimal('120.00')
+        self.big.save()
+        self.assertMatchesRebuild()
+
+
+class NotificationCounterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.ewa = User.objects.create(email='ewa.n@example.com', name='Ewa')
+        cls.adam = User.objects.create(email='adam.n@example.com', name='Adam')
+
+    def assertCountersConsistent(self):
+        self.assertEqual(NotificationCounter.reconcile(), [])
+        for user in (self.ewa, self.adam):
+            self.assertEqual(NotificationCounter.unread_for(user.id), Notification.objects.unread_for(user.id).count())
+
+    def test_counters_follow_mark_read(self):
+        broadcasts = [Notification.objects.create(message=f'Ogłoszenie {i}') for i in range(4)]
+        Notification.objects.create(message='Do Ewy', user=self.ewa)
+        self.assertCountersConsistent()
+
+        # Potwierdzenie z innej karty przed zbiorczym oznaczeniem
+        broadcasts[0].mark_read(self.ewa.id)
+        marked = Notification.objects.all().mark_read(self.ewa.id)
+        self.assertEqual(marked, 4)
+        self.assertEqual(Notification.objects.all().mark_read(self.ewa.id), 0)
+        broadcasts[1].mark_read(self.adam.id)
+        broadcasts[1].mark_read(self.adam.id)
+        self.assertCountersConsistent()
+
+    def test_purge_keeps_counters_consistent(self):
+        old = timezone.now() - timedelta(days=400)
+        expired = [Notification.objects.create(message='Stare', created_at=old) for _ in range(3)]
+        Notification.objects.create(message='Stare, imienne', user=self.adam, created_at=old)
+        fresh = Notification.objects.create(message='Nowe')
+        expired[0].mark_read(self.ewa.id)
+        fresh.mark_read(self.adam.id)
+
+        stats = retention.purge(batch_size=2, archive=True)
+
+        self.assertEqual((stats['notifications'], stats['receipts'], stats['archived']), (4, 1, 4))
+        self.assertEqual(list(Notification.objects.values_list('id', flat=True)), [fresh.id])
+        self.assertEqual(NotificationArchive.objects.get(id=expired[0].id).read_count, 1)
+        self.assertCountersConsistent()
+
+
+@isolated_cache
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='marta@example.com', name='Marta', department='IT')
+        cls.room = Room.objects.create(name='Sala D', capacity=10)
+        cls.start = (timezone.now() + timedelta(days=1)).replace(minute=0, second=0, microsecond=0)
+
+    def _book(self, hours):
+        return Booking.objects.create(
+            room=self.room, user=self.user, title='Spotkanie',
+            start_time=self.start + timedelta(hours=hours), end_time=self.start + timedelta(hours=hours, minutes=30),
+        )
+
+    def test_write_invalidates_cached_responses(self):
+        self._book(0)
+        for hours, name in enumerate(('get_bookings', 'get_summaries_api'), start=1):
+            with self.subTest(view=name):
+                first = self.client.get(reverse(name))
+                second = self.client.get(reverse(name))
+                self.assertEqual((first['X-Cache'], second['X-Cache']), ('MISS', 'HIT'))
+                self.assertEqual(first.content, second.content)
+
+                # Wersja danych rośnie po commicie zapisu
+                with self.captureOnCommitCallbacks(execute=True):
+                    self._book(hours)
+                self.assertEqual(self.client.get(reverse(name))['X-Cache'], 'MISS')
+
+
+@isolated_cache
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.room = Room.objects.create(name='Sala E', capacity=12)
+
+    def test_matching_etag_returns_304_until_data_changes(self):
+        for name in ('get_rooms_api', 'get_users_api', 'get_bookings', 'get_notifications_api'):
+            with self.subTest(view=name):
+                response = self.client.get(reverse(name))
+                self.assertEqual(response.status_code, 200)
+                etag = response['ETag']
+
+                response = self.client.get(reverse(name), HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b'')
+
+        etag = self.client.get(reverse('get_rooms_api'))['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Room.objects.create(name='Sala F', capacity=6)
+        response = self.client.get(reverse('get_rooms_api'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class ImporterConflictTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='iga@example.com', name='Iga')
+        cls.room = Room.objects.create(name='Sala G', capacity=10)
+        cls.start = (timezone.now() + timedelta(days=3)).replace(minute=0, second=0, microsecond=0)
+        Booking.objects.create(
+            room=cls.room, user=cls.user, title='Istniejąca',
+            start_time=cls.start, end_time=cls.start + timedelta(hours=1),
+        )
+
+    def _line(self, hours, minutes=30, **extra):
+        start = self.start + timedelta(hours=hours)
+        return json.dumps({
+            'room_id': self.room.id, 'user_id': self.user.id, 'title': 'Import',
+            'start_time': start.isoformat(), 'end_time': (start + timedelta(minutes=minutes)).isoformat(),
+            **extra,
+        })
+
+    def _conflicting_lines(self):
+        return [
+            self._line(0.5),                         # 1: koliduje z istniejącą
+            self._line(2),                           # 2: przyjęta
+            self._line(2.25),                        # 3: koliduje z wierszem 2 (ta sama paczka)
+            self._line(2.5, minutes=60),             # 4: przyjęta
+            self._line(3),                           # 5: koliduje z wierszem 4 (poprzednia paczka)
+            self._line(0, status='cancelled'),       # 6: anulowana – bez sprawdzania kolizji
+            '{"room_id": ',                          # 7: niepoprawny JSON
+            self._line(5, room_id=999999),           # 8: brak sali
+        ]
+
+    def assertConflictsReported(self, summary):
+        self.assertEqual((summary['rows'], summary['imported'], summary['rejected']), (8, 3, 5))
+        self.assertEqual([e['line'] for e in summary['errors']], [1, 3, 5, 7, 8])
+        conflict = "Sala jest już zarezerwowana w tym czasie."
+        self.assertEqual([e['error'] for e in summary['errors'][:3]], [conflict] * 3)
+
+    def test_conflicts_are_reported_per_line(self):
+        summary = BookingImporter(chunk_size=4).run(iter_records(self._conflicting_lines(), 'ndjson'))
+
+        self.assertConflictsReported(summary)
+        self.assertEqual(Booking.objects.filter(title='Import').count(), 3)
+
+    def test_dry_run_reports_conflicts_across_chunks(self):
+        summary = BookingImporter(chunk_size=4, dry_run=True).run(iter_records(self._conflicting_lines(), 'ndjson'))
+
+        self.assertConflictsReported(summary)
+        self.assertFalse(Booking.objects.filter(title='Import').exists())
+
+    def test_conflict_committed_after_check_is_reported(self):
+        importer = BookingImporter()
+        candidates = [(n, _validate(json.loads(self._line(h)))) for n, h in ((1, 2), (2, 4))]
+        # Inny proces zajął salę między sprawdzeniem kolizji a zapisem
+        Booking.objects.create(
+            room=self.room, user=self.user, title='Równoległa',
+            start_time=self.start + timedelta(hours=4), end_time=self.start + timedelta(hours=5),
+        )
+
+        importer._insert(candidates)
+
+        self.assertEqual(importer.imported, 1)
+        self.assertEqual(importer.errors, [{'line': 2, 'error': "Sala jest już zarezerwowana w tym czasie."}])
+
+
+class ReminderDispatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='ola@example.com', name='Ola')
+        cls.room = Room.objects.create(name='Sala H', capacity=8)
+
+    def setUp(self):
+        start = (timezone.now() + timedelta(hours=3)).replace(microsecond=0)
+        self.booking = Booking.objects.create(
+            room=self.room, user=self.user, title='Przegląd',
+            start_time=start, end_time=start + timedelta(hours=1),
+        )
+        reminders.schedule([self.booking])
+        self.due = reminders.due_time(self.booking)
+
+    def _sent(self):
+        return Notification.objects.filter(message__startswith='Przypomnienie').count()
+
+    def test_due_reminder_is_sent_once(self):
+        self.assertEqual(reminders.dispatch_due(now=self.due - timedelta(minutes=1)), (0, 0, 0))
+
+        self.assertEqual(reminders.dispatch_due(now=self.due), (1, 0, 0))
+        self.assertEqual(reminders.dispatch_due(now=self.due + timedelta(minutes=5)), (0, 0, 0))
+        self.assertEqual(self._sent(), 1)
+        self.assertFalse(Reminder.objects.exists())
+
+    def test_cancelled_booking_is_skipped(self):
+        # update() omija sygnały, więc przypomnienie zostaje w kolejce
+        Booking.objects.filter(pk=self.booking.pk).update(status='cancelled')
+
+        self.assertEqual(reminders.dispatch_due(now=self.due), (0, 1, 0))
+        self.assertEqual(self._sent(), 0)
+        self.assertFalse(Reminder.objects.exists())
+
+    def test_booking_moved_later_is_rescheduled(self):
+        later = self.booking.start_time + timedelta(hours=2)
+        Booking.objects.filter(pk=self.booking.pk).update(start_time=later, end_time=later + timedelta(hours=1))
+
+        self.assertEqual(reminders.dispatch_due(now=self.due), (0, 0, 1))
+        self.assertEqual(self._sent(), 0)
+        self.assertEqual(Reminder.objects.get().due_at, later - reminders.REMINDER_LEAD)
+
+    def test_save_recreates_sent_reminder_and_cancel_removes_it(self):
+        reminders.dispatch_due(now=self.due)
+        self.booking.start_time += timedelta(days=1)
+        self.booking.end_time += timedelta(days=1)
+        self.booking.save()
+
+        self.assertEqual(Reminder.objects.get(booking=self.booking).due_at, reminders.due_time(self.booking))
+
+        self.booking.status = 'cancelled'
+        self.booking.save()
+        self.assertFalse(Reminder.objects.exists())
+
+
+@isolated_cache
+@override_settings(BOOKING_SERIES_HORIZON_DAYS=14)
+class RecurringSeriesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='ula@example.com', name='Ula')
+        cls.room = Room.objects.create(name='Sala I', capacity=10)
+        cls.day = timezone.localdate() + timedelta(days=7)
+
+    def setUp(self):
+        cache.clear()
+
+    def _at(self, day, hour, minute=0):
+        return timezone.make_aware(datetime.combine(day, time(hour, minute)))
+
+    def _rule(self, frequency, start, **extra):
+        return BookingSeries(frequency=frequency, start_time=start, end_time=start + timedelta(hours=1), **extra)
+
+    def _post(self, start, **extra):
+        payload = {
+            'room_id': self.room.id, 'user_id': self.user.id, 'title': 'Seria',
+            'start_time': start.isoformat(), 'end_time': (start + timedelta(hours=1)).isoformat(),
+            'frequency': 'daily', **extra,
+        }
+        return self.client.post(reverse('create_recurring'), json.dumps(payload), content_type='application/json')
+
+    def test_monthly_skips_months_without_the_day(self):
+        rule = self._rule('monthly', self._at(date(2027, 1, 31), 10), count=4)
+
+        starts = [s for s, _ in recurrence.expand(rule, rule.start_time, self._at(date(2028, 1, 1), 0))]
+
+        self.assertEqual([(s.month, s.day, timezone.localtime(s).hour) for s in starts],
+                         [(1, 31, 10), (3, 31, 10), (5, 31, 10), (7, 31, 10)])
+
+    def test_weekdays_skip_weekend(self):
+        friday = date(2027, 1, 8)
+        rule = self._rule('weekdays', self._at(friday, 9), count=3)
+
+        starts = [s for s, _ in recurrence.expand(rule, rule.start_time, self._at(friday + timedelta(days=30), 0))]
+
+        self.assertEqual([s.date() for s in starts], [friday, friday + timedelta(days=3), friday + timedelta(days=4)])
+
+    def test_until_date_includes_the_whole_day(self):
+        start = self._at(self.day, 10)
+
+        by_date = self._post(start, until=(self.day + timedelta(days=2)).isoformat())
+        by_datetime = self._post(start + timedelta(hours=2), until=self._at(self.day + timedelta(days=2), 11).isoformat())
+
+        self.assertEqual((by_date.status_code, by_date.json()['total']), (201, 3))
+        self.assertEqual((by_datetime.status_code, by_datetime.json()['total']), (201, 2))
+
+    def test_too_many_occurrences_are_rejected(self):
+        start = self._at(self.day, 10)
+        limit = recurrence.MAX_SERIES_OCCURRENCES
+
+        self.assertEqual(self._post(start, occurrences=limit + 1).status_code, 400)
+        self.assertEqual(self._post(start, until=(self.day + timedelta(days=limit + 10)).isoformat()).status_code, 400)
+        self.assertFalse(BookingSeries.objects.exists())
+
+    def test_open_series_is_materialized_up_to_horizon(self):
+        response = self._post(self._at(self.day, 10), frequency='weekly', until=None)
+        self.assertEqual(response.status_code, 201)
+        series = BookingSeries.objects.get(series_id=response.json()['series_id'])
+        starts = list(Booking.objects.filter(series_id=series.series_id).order_by('start_time').values_list('start_time', flat=True))
+
+        self.assertAlmostEqual(series.materialized_until, recurrence.horizon(), delta=timedelta(minutes=1))
+        self.assertTrue(starts and starts[-1] < series.materialized_until <= starts[-1] + timedelta(days=7))
+        self.assertIsNone(response.json()['total'])
+
+        created, skipped = recurrence.materialize(series, until=series.materialized_until + timedelta(days=21))
+        self.assertEqual((len(created), skipped), (3, []))
+
+    def test_virtual_occurrences_beyond_horizon_occupy_the_room(self):
+        self.assertEqual(self._post(self._at(self.day, 10), until=None).status_code, 201)
+        far = self.day + timedelta(days=30)
+
+        listed = self.client.get(reverse('get_bookings'), {'date': far.isoformat()}).json()
+        self.assertEqual(listed['bookings'], [])
+        self.assertEqual([b['start_time'] for b in listed['virtual_bookings']], [self._at(far, 10).isoformat()])
+
+        window = {'start_time': self._at(far, 10, 30).isoformat(), 'end_time': self._at(far, 11, 30).isoformat()}
+        available = self.client.get(reverse('find_available'), window).json()['available_rooms']
+        self.assertNotIn(self.room.id, [r['id'] for r in available])
+
+        response = self.client.post(reverse('create_booking'), json.dumps({
+            'room_id': self.room.id, 'user_id': self.user.id, 'title': 'Kolizja', **window,
+        }), content_type='application/json')
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(Booking.objects.filter(title='Kolizja').exists())
+
+    def test_materialize_skips_occurrence_taken_after_the_check(self):
+        start = self._at(self.day, 10)
+        series = BookingSeries.objects.create(
+            series_id='seria-rownolegla', room=self.room, user=self.user, title='Seria',
+            frequency='daily', start_time=start, end_time=start + timedelta(hours=1),
+            count=3, materialized_until=start,
+        )
+        # Inny proces zajął salę po sprawdzeniu harmonogramu, ale przed INSERT
+        taken = Booking.objects.create(
+            room=self.room, user=self.user, title='Równoległa',
+            start_time=start + timedelta(days=1), end_time=start + timedelta(days=1, hours=1),
+        )
+        stale = RoomSchedule(self.room.id, start, start + timedelta(days=3), [])
+
+        with mock.patch.object(schedule_index, 'schedule', return_value=stale):
+            created, skipped = recurrence.materialize(series, until=start + timedelta(days=5))
+
+        self.assertEqual([b.start_time for b in created], [start, start + timedelta(days=2)])
+        self.assertEqual(skipped, [(taken.start_time, taken.end_time)])
+        series.refresh_from_db()
+        self.assertEqual(series.materialized_until, start + timedelta(days=5))
+
+
+class OutboxProcessingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='ela@example.com', name='Ela')
+        cls.room = Room.objects.create(name='Sala J', capacity=6)
+        cls.start = (timezone.now() + timedelta(days=2)).replace(microsecond=0)
+
+    def _book(self, title='Demo'):
+        return Booking.objects.create(
+            room=self.room, user=self.user, title=title,
+            start_time=self.start, end_time=self.start + timedelta(hours=1),
+        )
+
+    def test_event_creates_broadcast_and_reminder(self):
+        booking = self._book()
+        self.assertEqual(OutboxEvent.objects.count(), 1)
+
+        self.assertEqual(outbox.process_batch(), (1, 0))
+
+        self.assertEqual(
+            list(Notification.objects.values_list('message', flat=True)),
+            ["Nowa rezerwacja: 'Demo' w sali Sala J przez Ela"],
+        )
+        self.assertEqual(Reminder.objects.get().booking_id, booking.id)
+        self.assertFalse(OutboxEvent.objects.exists())
+        self.assertEqual(outbox.process_batch(), (0, 0))
+
+    @override_settings(OUTBOX_MAX_ATTEMPTS=2)
+    def test_failing_event_backs_off_then_dies(self):
+        booking = self._book()
+        OutboxEvent.objects.all().delete()
+        event = OutboxEvent.objects.create(event_type='nieznane', payload={'booking_ids': [booking.id]})
+
+        self.assertEqual(outbox.process_batch(), (0, 1))
+        event.refresh_from_db()
+        self.assertEqual((event.status, event.attempts), ('pending', 1))
+        self.assertGreater(event.available_at, timezone.now())
+        self.assertIn('ValueError', event.last_error)
+        # Przed upływem opóźnienia zdarzenie nie wraca do paczki
+        self.assertEqual(outbox.process_batch(), (0, 0))
+
+        OutboxEvent.objects.filter(pk=event.pk).update(available_at=timezone.now())
+        self.assertEqual(outbox.process_batch(), (0, 1))
+        event.refresh_from_db()
+        self.assertEqual((event.status, event.attempts), ('dead', 2))
+        self.assertEqual(outbox.process_batch(), (0, 0))
+        self.assertFalse(Notification.objects.exists())
+
+    def test_event_for_deleted_booking_is_dropped(self):
+        self._book().delete()
+
+        self.assertEqual(outbox.process_batch(), (1, 0))
+
+        self.assertFalse(Notification.objects.exists())
+        self.assertFalse(Reminder.objects.exists())
+        self.assertFalse(OutboxEvent.objects.exists())
+
+
+class BookingAlternativesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='iza@example.com', name='Iza')
+        projector = Equipment.objects.create(name='Projektor')
+        board = Equipment.objects.create(name='Tablica')
+        cls.day = timezone.localdate() + timedelta(days=3)
+        cls.start = timezone.make_aware(datetime.combine(cls.day, time(10)))
+        cls.end = cls.start + timedelta(hours=1)
+
+        def room(name, capacity, equipment=(), **extra):
+            r = Room.objects.create(name=name, capacity=capacity, **extra)
+            r.equipment.set(equipment)
+            return r
+
+        cls.room = room('Sala A', 10, [projector, board])
+        cls.twin = room('Sala B', 10, [projector, board])
+        cls.bigger = room('Sala C', 20, [projector, board])
+        cls.no_board = room('Sala D', 12, [projector])
+        room('Sala E', 4, [projector, board])                       # za mała
+        room('Sala F', 10, [projector, board], is_active=False)     # nieaktywna
+        busy = room('Sala G', 10, [projector, board])
+        for r in (cls.room, busy):
+            Booking.objects.create(room=r, user=cls.user, title='Zajęte', start_time=cls.start, end_time=cls.end)
+
+    def test_conflict_suggests_nearest_slots_and_similar_rooms(self):
+        response = self.client.post(reverse('create_booking'), json.dumps({
+            'room_id': self.room.id, 'user_id': self.user.id, 'title': 'Kolizja', 'attendees_count': 8,
+            'start_time': self.start.isoformat(), 'end_time': self.end.isoformat(),
+        }), content_type='application/json')
+
+        self.assertEqual(response.status_code, 409)
+        alternatives = response.json()['alternatives']
+        hours = [timezone.localtime(datetime.fromisoformat(a['start_time'])).hour for a in alternatives['same_room']]
+        self.assertEqual(hours, [9, 11, 8, 12, 7])
+        self.assertEqual({a['room_id'] for a in alternatives['same_room']}, {self.room.id})
+        # Najpierw pełne wyposażenie, potem najbliższa pojemność
+        other = alternatives['other_rooms']
+        self.assertEqual([r['room_id'] for r in other], [self.twin.id, self.bigger.id, self.no_board.id])
+        self.assertEqual(sorted(other[0]['equipment']), ['Projektor', 'Tablica'])
+        self.assertEqual(other[0]['start_time'], self.start.isoformat())
+
+
+class ScheduleIndexTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='jan@example.com', name='Jan')
+        cls.room = Room.objects.create(name='Sala K', capacity=8)
+        cls.start = (timezone.now() + timedelta(days=4)).replace(microsecond=0)
+        cls.end = cls.start + timedelta(hours=1)
+
+    def setUp(self):
+        schedule_index.invalidate()
+        # Ładuje harmonogram sali do indeksu – kolejne odczyty idą z pamięci
+        self.assertTrue(self.room.is_available(self.start, self.end))
+
+    def _book(self):
+        return Booking.objects.create(
+            room=self.room, user=self.user, title='Indeks', start_time=self.start, end_time=self.end,
+        )
+
+    def test_index_follows_committed_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            booking = self._book()
+        self.assertFalse(self.room.is_available(self.start, self.end))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            booking.status = 'cancelled'
+            booking.save()
+        self.assertTrue(self.room.is_available(self.start, self.end))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            booking = self._book()
+        with self.captureOnCommitCallbacks(execute=True):
+            booking.delete()
+        self.assertTrue(self.room.is_available(self.start, self.end))
+
+    def test_rolled_back_save_leaves_no_trace(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(RuntimeError):
+                with transaction.atomic():
+                    self._book()
+                    raise RuntimeError
+
+        self.assertEqual(callbacks, [])
+        self.assertEqual(len(schedule_index.schedule(self.room.id, self.start, self.end)), 0)
+        self.assertTrue(self.room.is_available(self.start, self.end))
+
+    def test_admin_cancel_action_invalidates_index(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            booking = self._book()
+        self.assertFalse(self.room.is_available(self.start, self.end))
+        admin = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'haslo')
+        self.client.force_login(admin)
+
+        response = self.client.post(reverse('admin:bookings_booking_changelist'), {
+            'action': 'cancel_bookings', '_selected_action': [booking.id],
+        })
+
+        self.assertEqual(response.status_code, 302)
+        booking.refresh_from_db()
+        self.assertEqual(booking.status, 'cancelled')
+        self.assertTrue(self.room.is_available(self.start, self.end))
+
+
+class RecurringConflictTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='kuba@example.com', name='Kuba')
+        cls.room = Room.objects.create(name='Sala L', capacity=10)
+        cls.start = timezone.make_aware(datetime.combine(timezone.localdate() + timedelta(days=5), time(14)))
+        cls.taken = [cls.start + timedelta(days=1), cls.start + timedelta(days=3)]
+        for taken in cls.taken:
+            Booking.objects.create(
+                room=cls.room, user=cls.user, title='Zajęte',
+                start_time=taken + timedelta(minutes=30), end_time=taken + timedelta(hours=2),
+            )
+
+    def _post(self, **extra):
+        return self.client.post(reverse('create_recurring'), json.dumps({
+            'room_id': self.room.id, 'user_id': self.user.id, 'title': 'Seria',
+            'start_time': self.start.isoformat(), 'end_time': (self.start + timedelta(hours=1)).isoformat(),
+            'frequency': 'daily', 'occurrences': 5, **extra,
+        }), content_type='application/json')
+
+    def _occurrence(self, start):
+        return {'start_time': start.isoformat(), 'end_time': (start + timedelta(hours=1)).isoformat()}
+
+    def test_conflicts_are_listed_and_nothing_is_created(self):
+        response = self._post()
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['conflicts'], [self._occurrence(s) for s in self.taken])
+        self.assertFalse(BookingSeries.objects.exists())
+        self.assertFalse(Booking.objects.filter(title='Seria').exists())
+
+    def test_skip_conflicts_reports_skipped_and_inserts_in_one_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self._post(skip_conflicts=True)
+
+        self.assertEqual(response.status_code, 201)
+        body = response.json()
+        self.assertEqual((body['created'], body['total']), (3, 5))
+        self.assertEqual(body['skipped'], [self._occurrence(s) for s in self.taken])
+        self.assertEqual(
+            list(Booking.objects.filter(title='Seria').order_by('start_time').values_list('start_time', flat=True)),
+            [self.start, self.start + timedelta(days=2), self.start + timedelta(days=4)],
+        )
+        inserts = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('INSERT INTO "bookings" ')]
+        self.assertEqual(len(inserts), 1)
+
+
+@isolated_cache
+@unittest.skipUnless(NUMPY_AVAILABLE, "NumPy nie zainstalowany")
+class SummaryEngineParityTests(TestCase):
+    FILTERS = [{}, {'status': 'confirmed'}, {'dept': 'IT'}, {'dept': 'HR,Finanse', 'status': 'confirmed,cancelled'}]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.anna = User.objects.create(email='anna.s@example.com', name='Anna', department='IT')
+        cls.jan = User.objects.create(email='jan.s@example.com', name='Jan', department='HR')
+        cls.small = Room.objects.create(name='Mała', capacity=4, hourly_rate=Decimal('40.00'))
+        cls.big = Room.objects.create(name='Duża', capacity=20, hourly_rate=Decimal('100.00'))
+        cls.day = timezone.localdate() - timedelta(days=5)
+
+    def _book(self, room, user, day_offset, hour, minutes, status='confirmed'):
+        start = timezone.make_aware(datetime.combine(self.day + timedelta(days=day_offset), time(hour)))
+        return Booking.objects.create(
+            room=room, user=user, title='Spotkanie', attendees_count=3, status=status,
+            start_time=start, end_time=start + timedelta(minutes=minutes),
+        )
+
+    def assertEnginesAgree(self):
+        cache.clear()
+        for params in self.FILTERS:
+            results = {}
+            for engine in ('sql', 'numpy', 'rollup'):
+                response = self.client.get(reverse('get_summaries_api'), {**params, 'engine': engine})
+                self.assertEqual(response.status_code, 200)
+                results[engine] = response.json()
+            with self.subTest(**params):
+                self.assertEqual(results['numpy'], results['sql'])
+                self.assertEqual(results['rollup'], results['sql'])
+
+    def test_engines_return_the_same_summaries(self):
+        moved = self._book(self.small, self.anna, 0, 9, 45)
+        self._book(self.small, self.jan, 0, 11, 150)
+        self._book(self.big, self.anna, 1, 9, 30, status='cancelled')
+        deleted = self._book(self.big, self.jan, 2, 13, 90)
+        self._book(self.big, self.jan, 3, 8, 60, status='pending')
+        self.assertEnginesAgree()
+
+        moved.room = self.big
+        moved.start_time += timedelta(days=1, hours=2)
+        moved.end_time = moved.start_time + timedelta(minutes=100)
+        moved.save()
+        self.jan.department = 'Finanse'
+        self.jan.save()
+        self.big.hourly_rate = Decimal('120.00')
+        self.big.save()
+        deleted.delete()
+        self.assertEnginesAgree()
+
+
+@override_settings(EVENTS_POLL_INTERVAL=0, EVENTS_HEARTBEAT=60)
+class EventsStreamTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.ala = User.objects.create(email='ala@example.com', name='Ala')
+        cls.olek = User.objects.create(email='olek@example.com', name='Olek')
+
+    def setUp(self):
+        # Własny Broadcaster na test: pamięć kluczy nie przechodzi między testami
+        self.broadcaster = Broadcaster()
+        for module in ('bookings.views', 'bookings.signals'):
+            patcher = mock.patch(f'{module}.broadcaster', self.broadcaster)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _notify(self, message, user=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Notification.objects.create(message=message, user=user)
+
+    async def _open(self, user, **headers):
+        response = await self.async_client.get(reverse('events_stream'), {'user_id': user.id}, headers=headers)
+        self.assertEqual(response.status_code, 200)
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await self._next(stream), "retry: 5000\n\n")
+        return stream
+
+    async def _next(self, stream):
+        return (await asyncio.wait_for(anext(stream), 2)).decode()
+
+    def _event_id(self, chunk):
+        return int(chunk.split("\n")[0].removeprefix("id: "))
+
+    def test_wsgi_is_not_supported(self):
+        self.assertEqual(self.client.get(reverse('events_stream')).status_code, 501)
+
+    async def test_published_notification_reaches_stream(self):
+        stream = await self._open(self.ala)
+
+        notification = await sync_to_async(self._notify)("Nowa rezerwacja")
+
+        chunk = await self._next(stream)
+        self.assertTrue(chunk.startswith(f"id: {notification.id}\nevent: notification\n"))
+        self.assertIn('"message": "Nowa rezerwacja"', chunk)
+
+    async def test_direct_notification_only_reaches_recipient(self):
+        ala, olek = await self._open(self.ala), await self._open(self.olek)
+
+        direct = await sync_to_async(self._notify)("Dla Olka", user=self.olek)
+        broadcast = await sync_to_async(self._notify)("Dla wszystkich")
+
+        self.assertEqual(self._event_id(await self._next(ala)), broadcast.id)
+        self.assertEqual([self._event_id(await self._next(olek)) for _ in range(2)], [direct.id, broadcast.id])
+
+    async def test_last_event_id_replays_missed_notifications(self):
+        seen, *missed = [await sync_to_async(self._notify)(f"Powiadomienie {i}") for i in range(3)]
+
+        with mock.patch('bookings.views.NOTIFICATIONS_POLL_OVERLAP', 0):
+            stream = await self._open(self.ala, **{'Last-Event-ID': str(seen.id)})
+
+        self.assertEqual([self._event_id(await self._next(stream)) for _ in missed], [n.id for n in missed])
+
+    async def test_event_with_the_same_key_is_delivered_once(self):
+        stream = await self._open(self.ala)
+        first = await sync_to_async(self._notify)("Pierwsze")
+        # To samo zdarzenie z pollera bazy po sygnale z tego procesu
+        self.broadcaster.publish(notification_event(first))
+        second = await sync_to_async(self._notify)("Drugie")
+
+        self.assertEqual([self._event_id(await self._next(stream)) for _ in range(2)], [first.id, second.id])
+
+
+class MarkNotificationsReadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.ewa = User.objects.create(email='ewa.m@example.com', name='Ewa')
+
+    def setUp(self):
+        self.first, self.second = [Notification.objects.create(message=f'Ogłoszenie {i}') for i in range(2)]
+        self.direct = Notification.objects.create(message='Do Ewy', user=self.ewa)
+        self.last = Notification.objects.create(message='Ogłoszenie 3')
+
+    def _mark(self, user_id, **data):
+        url = f"{reverse('mark_notifications_read')}?user_id={user_id}"
+        return self.client.post(url, json.dumps(data), content_type='application/json')
+
+    def _unread(self):
+        counted = NotificationCounter.unread_for(self.ewa.id)
+        self.assertEqual(counted, Notification.objects.unread_for(self.ewa.id).count())
+        return counted
+
+    def test_mark_by_ids(self):
+        response = self._mark(self.ewa.id, ids=[self.first.id, self.direct.id])
+
+        self.assertEqual(response.json(), {'marked': 2, 'success': True})
+        self.assertEqual(self._unread(), 2)
+        self.assertEqual(self._mark(self.ewa.id, ids=[self.first.id, self.direct.id]).json()['marked'], 0)
+        self.assertEqual(self._unread(), 2)
+
+    def test_mark_up_to_cursor(self):
+        response = self._mark(self.ewa.id, up_to=self.direct.id)
+
+        self.assertEqual(response.json()['marked'], 3)
+        self.assertEqual(list(Notification.objects.unread_for(self.ewa.id).values_list('id', flat=True)), [self.last.id])
+        self.assertEqual(self._unread(), 1)
+        self.assertEqual(self._mark(self.ewa.id, up_to=self.direct.id).json()['marked'], 0)
+        self.assertEqual(self._unread(), 1)
+
+    def test_unknown_user_and_missing_selection_are_rejected(self):
+        self.assertEqual(self._mark(999999, up_to=self.last.id).status_code, 404)
+        self.assertEqual(self._mark(self.ewa.id).status_code, 400)
+        self.assertEqual(self._unread(), 4)
@@ -13,10 +13,17 @@ urlpatterns = [
     path('api/bookings/create', views.create_booking, name='create_booking'),
     path('api/bookings/<int:booking_id>', views.cancel_booking, name='cancel_booking'),
     path('api/available-rooms', views.find_available, name='find_available'),
+    path('api/free-slots', views.find_free_slots, name='find_free_slots'),
+    path('api/availability-grid', views.availability_grid, name='availability_grid'),
     path('api/bookings/recurring', views.create_recurring, name='create_recurring'),
+    path('api/bookings/import', views.import_bookings, name='import_bookings'),
     path('api/notifications', views.get_notifications_api, name='get_notifications_api'),
+    path('api/notifications/count', views.notifications_count_api, name='notifications_count_api'),
+    path('api/notifications/read', views.mark_notifications_read, name='mark_notifications_read'),
+    path('api/events', views.events_stream, name='events_stream'),
     path('api/notifications/<int:notification_id>/read', views.mark_notification_read, name='mark_notification_read'),
     path('api/reports/monthly', views.monthly_report, name='monthly_report'),
     path('api/summaries', views.get_summaries_api, name='get_summaries_api'),
     path('api/summaries/bookings', views.get_summaries_bookings_api, name='get_summaries_bookings_api'),
+    path('api/cache/stats', views.response_cache_stats_api, name='response_cache_stats_api'),
 ]
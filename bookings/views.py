@@ -1,18 +1,33 @@
 from django.shortcuts import render
-from django.http import JsonResponse, HttpResponse
-from django.views.decorators.http import require_http_methods
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from asgiref.sync import sync_to_async
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 from django.utils import timezone
 from django.utils.dateparse import parse_datetime
 from django.utils.dateparse import parse_date
 from django.core.paginator import Paginator
-from django.db import transaction
-from .models import Room, User, Booking, Equipment, Notification
+from django.db import transaction, IntegrityError
+from .models import Room, User, Booking, BookingDailyRollup, BookingSeries, Equipment, Notification, NotificationCounter, is_overlap_violation
+from .locks import create_booking_exclusive
+from .recurrence import FREQUENCIES, pending_series, iter_virtual, virtual_conflict, expand, horizon, materialize, MAX_SERIES_OCCURRENCES
+from .availability import schedule_index, drop_virtual_conflicts, free_rooms, free_slots, suggest_alternatives, occupancy_grid, encode_bitmap, encode_rle, NUMPY_AVAILABLE, FREE_SLOTS_MAX_WINDOW
+from .importer import FORMATS as IMPORT_FORMATS, BookingImporter, iter_records
+from .events import POLL_OVERLAP as NOTIFICATIONS_POLL_OVERLAP, broadcaster, format_sse, heartbeat_interval, notification_event
+from .cache import DATA, NOTIFICATIONS, cached_response, etag as version_etag, etag_func, stats as response_cache_stats
+from .rollups import update_bookings
+from .streaming import FORMATS as STREAM_FORMATS, stream_rows
+from .summaries import ENGINES as SUMMARY_ENGINES, get_engine as summary_engine, summarize
+import asyncio
+import csv
 import json
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
 import uuid
 from django.db.models import Q, Count, Sum, F
-from django.db.models.functions import TruncDate, ExtractHour, ExtractWeekDay
+from django.db.models.functions import ExtractHour, ExtractIsoWeekDay, ExtractWeekDay
 import io
 
 # Imports for reports
@@ -101,6 +116,11 @@ def _summaries_time_range(request):
     return start_date, end_date, start_dt, end_dt
 
 
+def _list_param(request, name):
+    value = request.GET.get(name)
+    return [x.strip() for x in str(value).split(',') if x.strip()] if value else []
+
+
 def _filtered_bookings_qs(request):
     start_date, end_date, start_dt, end_dt = _summaries_time_range(request)
 
@@ -109,34 +129,49 @@ def _filtered_bookings_qs(request):
         start_time__lte=end_dt,
     )
 
-    room_id = request.GET.get('room_id')
-    if room_id:
-        room_ids = [x.strip() for x in str(room_id).split(',') if x.strip()]
-        if len(room_ids) == 1:
-            qs = qs.filter(room_id=room_ids[0])
-        elif room_ids:
-            qs = qs.filter(room_id__in=room_ids)
-
-    dept = request.GET.get('dept')
-    if dept:
-        depts = [x.strip() for x in str(dept).split(',') if x.strip()]
-        if len(depts) == 1:
-            qs = qs.filter(user__department=depts[0])
-        elif depts:
-            qs = qs.filter(user__department__in=depts)
-
-    status = request.GET.get('status')
-    if status:
-        statuses = [x.strip() for x in str(status).split(',') if x.strip()]
-        if len(statuses) == 1:
-            qs = qs.filter(status=statuses[0])
-        elif statuses:
-            qs = qs.filter(status__in=statuses)
+    room_ids = _list_param(request, 'room_id')
+    if room_ids:
+        qs = qs.filter(room_id__in=room_ids)
+
+    depts = _list_param(request, 'dept')
+    if depts:
+        qs = qs.filter(user__department__in=depts)
+
+    statuses = _list_param(request, 'status')
+    if statuses:
+        qs = qs.filter(status__in=statuses)
 
     return qs, (start_date, end_date)
 
 
+def _filtered_rollups_qs(request):
+    """Dzienne agregaty z tymi samymi filtrami co _filtered_bookings_qs."""
+    start_date, end_date, _, _ = _summaries_time_range(request)
+
+    qs = BookingDailyRollup.objects.filter(day__gte=start_date, day__lte=end_date)
+
+    room_ids = _list_param(request, 'room_id')
+    if room_ids:
+        qs = qs.filter(room_id__in=room_ids)
+
+    depts = _list_param(request, 'dept')
+    if depts:
+        qs = qs.filter(department__in=depts)
+
+    statuses = _list_param(request, 'status')
+    if statuses:
+        qs = qs.filter(status__in=statuses)
+
+    return qs
+
+
+SUMMARY_LISTS = ('room_id', 'dept', 'status')
+
+
 @require_http_methods(["GET"])
+@cache_control(no_cache=True)
+@condition(etag_func=etag_func('summaries', lists=SUMMARY_LISTS))
+@cached_response('summaries', lists=SUMMARY_LISTS)
 def get_summaries_api(request):
     qs, (start_date, end_date) = _filtered_bookings_qs(request)
 
@@ -144,217 +179,78 @@ def get_summaries_api(request):
     departments_meta = list(User.objects.exclude(department__isnull=True).exclude(department='').values_list('department', flat=True).distinct().order_by('department'))
     users_meta = list(User.objects.values('id', 'name').order_by('name'))
 
-    total_bookings = qs.count()
-    total_hours = sum(b.duration_hours for b in qs)
-    cancelled = qs.filter(status='cancelled').count()
-    cancel_rate = (cancelled / total_bookings) if total_bookings else 0
-    avg_minutes = (total_hours * 60 / total_bookings) if total_bookings else 0
-    unique_rooms = qs.values('room_id').distinct().count()
-    unique_users = qs.values('user_id').distinct().count()
-
-    days = []
-    cur = start_date
-    while cur <= end_date:
-        days.append(cur)
-        cur += timedelta(days=1)
-
-    trend_map = {d: {'count': 0, 'hours': 0.0} for d in days}
-    for b in qs:
-        d = _safe_localtime(b.start_time).date()
-        if d in trend_map:
-            trend_map[d]['count'] += 1
-            trend_map[d]['hours'] += float(b.duration_hours)
-
-    trend = [{'date': d.isoformat(), 'count': trend_map[d]['count'], 'hours': round(trend_map[d]['hours'], 2)} for d in days]
-
-    # Weekly compare (this week vs previous week; based on end_date)
-    end_weekday = end_date.isoweekday()  # 1..7
-    week_start = end_date - timedelta(days=end_weekday - 1)
-    prev_week_start = week_start - timedelta(days=7)
-    week_days = [week_start + timedelta(days=i) for i in range(7)]
-    prev_week_days = [prev_week_start + timedelta(days=i) for i in range(7)]
-
-    this_week_counts = {d: 0 for d in week_days}
-    prev_week_counts = {d: 0 for d in prev_week_days}
-    for b in qs:
-        d = _safe_localtime(b.start_time).date()
-        if d in this_week_counts:
-            this_week_counts[d] += 1
-        if d in prev_week_counts:
-            prev_week_counts[d] += 1
-
-    weekdays_labels = ['Pn', 'Wt', 'Śr', 'Cz', 'Pt', 'Sb', 'Nd']
-    weekly_compare = {
-        'labels': weekdays_labels,
-        'this_week_dates': [d.isoformat() for d in week_days],
-        'prev_week_dates': [d.isoformat() for d in prev_week_days],
-        'this_week': [this_week_counts[d] for d in week_days],
-        'prev_week': [prev_week_counts[d] for d in prev_week_days],
-    }
-
-    # Reservation stats: daily/weekly/monthly counts
-    stats_daily = [{'label': d.isoformat(), 'value': trend_map[d]['count']} for d in days]
-
-    weekly_map = {}
-    monthly_map = {}
-    for b in qs:
-        d = _safe_localtime(b.start_time).date()
-        iso_year, iso_week, _ = d.isocalendar()
-        wk_key = f"{iso_year}-W{iso_week:02d}"
-        mo_key = f"{d.year}-{d.month:02d}"
-        weekly_map[wk_key] = weekly_map.get(wk_key, 0) + 1
-        monthly_map[mo_key] = monthly_map.get(mo_key, 0) + 1
-
-    month_names_pl = [
-        'styczeń', 'luty', 'marzec', 'kwiecień', 'maj', 'czerwiec',
-        'lipiec', 'sierpień', 'wrzesień', 'październik', 'listopad', 'grudzień'
-    ]
-
-    stats_weekly = []
-    for k, v in sorted(weekly_map.items(), key=lambda x: x[0]):
-        try:
-            year_str, week_str = k.split('-W')
-            y = int(year_str)
-            w = int(week_str)
-            wk_start = date.fromisocalendar(y, w, 1)
-            wk_end = date.fromisocalendar(y, w, 7)
-            pretty = f"{wk_start.strftime('%d.%m')}–{wk_end.strftime('%d.%m')}"
-            stats_weekly.append({'label': k, 'label_pretty': pretty, 'start': wk_start.isoformat(), 'end': wk_end.isoformat(), 'value': v})
-        except Exception:
-            stats_weekly.append({'label': k, 'label_pretty': k, 'value': v})
-
-    stats_monthly = []
-    for k, v in sorted(monthly_map.items(), key=lambda x: x[0]):
-        try:
-            y_str, m_str = k.split('-')
-            y = int(y_str)
-            m = int(m_str)
-            m_start = date(y, m, 1)
-            if m == 12:
-                m_end = date(y + 1, 1, 1) - timedelta(days=1)
-            else:
-                m_end = date(y, m + 1, 1) - timedelta(days=1)
-            pretty = f"{month_names_pl[m - 1]} {y}"
-            stats_monthly.append({'label': k, 'label_pretty': pretty, 'start': m_start.isoformat(), 'end': m_end.isoformat(), 'value': v})
-        except Exception:
-            stats_monthly.append({'label': k, 'label_pretty': k, 'value': v})
-
-    wh_start, wh_end = 8, 18
-    possible_per_day = max(0, wh_end - wh_start)
-    num_days = max(1, (end_date - start_date).days + 1)
-
-    room_hours = {}
-    room_counts = {}
-    for b in qs:
-        rid = b.room_id
-        room_hours[rid] = room_hours.get(rid, 0.0) + float(b.duration_hours)
-        room_counts[rid] = room_counts.get(rid, 0) + 1
-
-    room_id_to_name = {r['id']: r['name'] for r in rooms_meta}
-    top_room_items = []
-    for rid, hrs in room_hours.items():
-        util = (hrs / (num_days * possible_per_day) * 100) if possible_per_day else 0
-        top_room_items.append({
-            'room_id': rid, 
-            'room': room_id_to_name.get(rid, str(rid)), 
-            'hours': round(hrs, 2), 
-            'utilization': round(util, 1),
-            'count': room_counts.get(rid, 0)
-        })
-    top_room_items.sort(key=lambda x: x['hours'], reverse=True)
-    top_rooms = top_room_items[:10]
-
-    dept_counts = {}
-    dept_hours = {}
-    for b in qs:
-        d = b.user.department or 'Brak departamentu'
-        dept_counts[d] = dept_counts.get(d, 0) + 1
-        dept_hours[d] = dept_hours.get(d, 0.0) + float(b.duration_hours)
-
-    dept_items = []
-    for d, c in dept_counts.items():
-        dept_items.append({
-            'dept': d,
-            'count': c,
-            'hours': round(dept_hours.get(d, 0.0), 2),
-        })
-    dept_items.sort(key=lambda x: x['hours'], reverse=True)
-    dept_items = dept_items[:12]
-
-    treemap = [{'name': x['room'], 'value': x['hours']} for x in top_room_items if x['hours'] > 0]
-
-    scatter = []
-    for b in qs[:500]:
-        attendees = int(b.attendees_count or 0)
-        minutes = int(round(float(b.duration_hours) * 60))
-        scatter.append([attendees, minutes, f"{b.room.name} · {b.user.name}"])
-
-    bins = [(0, 30), (30, 60), (60, 90), (90, 120)]
-    hist_labels = ['0-30', '30-60', '60-90', '90-120', '120+']
-    hist_vals = [0, 0, 0, 0, 0]
-    for b in qs:
-        minutes = float(b.duration_hours) * 60
-        placed = False
-        for i, (a, z) in enumerate(bins):
-            if a <= minutes < z:
-                hist_vals[i] += 1
-                placed = True
-                break
-        if not placed:
-            if minutes >= 120:
-                hist_vals[4] += 1
-
-    user_counts = {}
-    user_hours = {}
-    for b in qs:
-        user_counts[b.user_id] = user_counts.get(b.user_id, 0) + 1
-        user_hours[b.user_id] = user_hours.get(b.user_id, 0.0) + float(b.duration_hours)
-    user_id_to_name = {u['id']: u['name'] for u in users_meta}
-    top_users = []
-    for uid, c in user_counts.items():
-        top_users.append({
-            'user_id': uid,
-            'user': user_id_to_name.get(uid, str(uid)),
-            'count': c,
-            'hours': round(user_hours.get(uid, 0.0), 2),
-        })
-    top_users.sort(key=lambda x: x['count'], reverse=True)
-    top_users = top_users[:10]
-
+    # Agregaty z bookings/summaries.py: domyślnie z dziennych agregatów,
+    # ?engine=sql z tabeli bookings, ?engine=numpy w procesie z jednego odczytu
+    engine = request.GET.get('engine', 'rollup')
+    if engine not in SUMMARY_ENGINES:
+        return JsonResponse({'error': f"Nieznany silnik. Dostępne: {', '.join(SUMMARY_ENGINES)}"}, status=400)
+    if engine == 'numpy' and not NUMPY_AVAILABLE:
+        return HttpResponse("NumPy nie zainstalowany", status=501)
+    data = summarize(
+        qs, start_date, end_date,
+        room_names={r['id']: r['name'] for r in rooms_meta},
+        user_names={u['id']: u['name'] for u in users_meta},
+        engine=engine,
+        rollups=_filtered_rollups_qs(request),
+    )
     return JsonResponse({
         'meta': {
             'rooms': rooms_meta,
             'departments': departments_meta,
             'users': users_meta,
         },
-        'kpi': {
-            'total_bookings': total_bookings,
-            'total_hours': round(total_hours, 2),
-            'cancel_rate': cancel_rate,
-            'avg_minutes': round(avg_minutes, 2),
-            'unique_rooms': unique_rooms,
-            'unique_users': unique_users,
-        },
-        'trend': trend,
-        'weekly_compare': weekly_compare,
-        'reservation_stats': {
-            'daily': stats_daily,
-            'weekly': stats_weekly,
-            'monthly': stats_monthly,
-        },
-        'top_rooms': top_rooms,
-        'dept_overview': dept_items,
-        'treemap': treemap,
-        'scatter': scatter,
-        'histogram': {
-            'labels': hist_labels,
-            'values': hist_vals,
-        },
-        'top_users': top_users,
+        **data,
     })
 
 
 @require_http_methods(["GET"])
+def response_cache_stats_api(request):
+    """Trafienia i chybienia cache odpowiedzi API (bookings/cache.py) oraz bieżąca wersja danych."""
+    return JsonResponse(response_cache_stats())
+
+
+SUMMARY_BOOKINGS_PAGE = 1000
+SUMMARY_BOOKINGS_PAGE_LIMIT = 5000
+_CURSOR_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+SUMMARY_BOOKING_FIELDS = (
+    'id', 'start_time', 'end_time', 'title', 'status', 'attendees_count',
+    'room__name', 'user__name', 'user__department',
+)
+
+
+def _summary_booking_json(row):
+    return {
+        'id': row['id'],
+        'start': _safe_localtime(row['start_time']).strftime('%Y-%m-%d %H:%M'),
+        'end': _safe_localtime(row['end_time']).strftime('%Y-%m-%d %H:%M'),
+        'room': row['room__name'],
+        'user': row['user__name'],
+        'department': row['user__department'],
+        'title': row['title'],
+        'status': row['status'],
+        'attendees': int(row['attendees_count'] or 0),
+        'minutes': int(round((row['end_time'] - row['start_time']).total_seconds() / 60)),
+    }
+
+
+def _keyset_cursor(row):
+    """Kursor "<mikrosekundy od epoki>.<id>" – dokładny, bez strefy i znaków do kodowania w URL."""
+    return f"{(row['start_time'] - _CURSOR_EPOCH) // timedelta(microseconds=1)}.{row['id']}"
+
+
+def _parse_keyset_cursor(value):
+    if not value:
+        return None
+    micros, pk = value.split('.')
+    return _CURSOR_EPOCH + timedelta(microseconds=int(micros)), int(pk)
+
+
+@require_http_methods(["GET"])
+@cache_control(no_cache=True)
+@condition(etag_func=etag_func('summaries-bookings', lists=SUMMARY_LISTS))
+@cached_response('summaries-bookings', lists=SUMMARY_LISTS)
 def get_summaries_bookings_api(request):
     qs, _ = _filtered_bookings_qs(request)
 
@@ -378,41 +274,49 @@ def get_summaries_bookings_api(request):
         try:
             w = int(weekday)
             h = int(hour)
-            matched_ids = []
-            for b in qs:
-                lt = _safe_localtime(b.start_time)
-                if (lt.isoweekday() - 1) == w and lt.hour == h:
-                    matched_ids.append(b.id)
-            qs = qs.filter(id__in=matched_ids)
-        except Exception:
+        except ValueError:
             pass
+        else:
+            # weekday: 0 = poniedziałek; dzień i godzina w strefie TIME_ZONE, liczone w bazie
+            tz = timezone.get_current_timezone()
+            qs = qs.alias(
+                local_weekday=ExtractIsoWeekDay('start_time', tzinfo=tz),
+                local_hour=ExtractHour('start_time', tzinfo=tz),
+            ).filter(local_weekday=w + 1, local_hour=h)
 
     user_id = request.GET.get('user_id')
     if user_id:
         qs = qs.filter(user_id=user_id)
 
-    # Zwiększamy limit do 5000 aby umożliwić filtrowanie po wszystkich rezerwacjach
-    qs = qs.order_by('-start_time')[:5000]
-
-    items = []
-    for b in qs:
-        lt_s = _safe_localtime(b.start_time)
-        lt_e = _safe_localtime(b.end_time)
-        minutes = int(round(float(b.duration_hours) * 60))
-        items.append({
-            'id': b.id,
-            'start': lt_s.strftime('%Y-%m-%d %H:%M'),
-            'end': lt_e.strftime('%Y-%m-%d %H:%M'),
-            'room': b.room.name,
-            'user': b.user.name,
-            'department': b.user.department,
-            'title': b.title,
-            'status': b.status,
-            'attendees': int(b.attendees_count or 0),
-            'minutes': minutes,
-        })
+    stream = request.GET.get('stream')
+    if stream and stream not in STREAM_FORMATS:
+        return JsonResponse({'error': f"Dostępne formaty strumienia: {', '.join(STREAM_FORMATS)}."}, status=400)
+
+    # Stronicowanie po (start_time, id) malejąco; kursor to ostatni wiersz poprzedniej strony
+    try:
+        limit = min(max(int(request.GET.get('limit', SUMMARY_BOOKINGS_PAGE)), 1), SUMMARY_BOOKINGS_PAGE_LIMIT)
+        cursor = _parse_keyset_cursor(request.GET.get('cursor'))
+    except ValueError:
+        return JsonResponse({'error': 'Niepoprawny parametr limit lub cursor.'}, status=400)
+    if cursor:
+        start, pk = cursor
+        qs = qs.filter(Q(start_time__lt=start) | Q(start_time=start, id__lt=pk))
 
-    return JsonResponse({'bookings': items})
+    rows = qs.order_by('-start_time', '-id').values(*SUMMARY_BOOKING_FIELDS)
+    if stream:
+        # Eksport: wszystkie wiersze od kursora, bez limitu strony
+        return stream_rows(request, rows, _summary_booking_json, stream)
+
+    # limit + 1, żeby bez osobnego zapytania wiedzieć, czy jest kolejna strona
+    page = list(rows[:limit + 1])
+    has_more = len(page) > limit
+    page = page[:limit]
+
+    return JsonResponse({
+        'bookings': [_summary_booking_json(row) for row in page],
+        'next_cursor': _keyset_cursor(page[-1]) if has_more else None,
+        'has_more': has_more,
+    })
 
 def dashboard(request):
     """Strona główna dashboardu."""
@@ -421,10 +325,11 @@ def dashboard(request):
 
     # Automatyczna aktualizacja statusów rezerwacji
     # Zmień status z "confirmed" na "completed" dla zakończonych rezerwacji
-    Booking.objects.filter(
+    # (przez update_bookings – zwykły update ominąłby dzienne agregaty)
+    update_bookings(Booking.objects.filter(
         status="confirmed",
         end_time__lt=now
-    ).update(status="completed")
+    ), status="completed")
 
     # Statystyki - pokazują AKTYWNE rezerwacje (przyszłe + dzisiejsze trwające)
     stats = {
@@ -470,18 +375,19 @@ def dashboard(request):
         is_active=True
     ).count()
 
+    # Wykorzystanie i trend z dziennych agregatów (dokładność do dnia)
+    month_rollups = BookingDailyRollup.objects.filter(
+        day__gte=timezone.localdate(month_ago),
+    ).exclude(status="cancelled")
+    minutes_by_room = dict(
+        month_rollups.values('room_id').annotate(total=Sum('minutes')).values_list('room_id', 'total')
+    )
+
     room_utilization = []
     active_rooms = Room.objects.filter(is_active=True)
 
     for room in active_rooms:
-        total_seconds = Booking.objects.filter(
-            room=room,
-            start_time__gte=month_ago,
-        ).filter(~Q(status="cancelled")).annotate(
-            duration=F('end_time') - F('start_time')
-        ).aggregate(total=Sum('duration'))['total']
-
-        total_hours = total_seconds.total_seconds() / 3600 if total_seconds else 0
+        total_hours = (minutes_by_room.get(room.id) or 0) / 60
         max_hours = 176
         utilization = (total_hours / max_hours) * 100 if max_hours else 0
 
@@ -502,18 +408,7 @@ def dashboard(request):
         hour=ExtractHour('start_time')
     ).values('weekday', 'hour').annotate(count=Count('id'))
 
-    trend_data = Booking.objects.filter(
-        start_time__gte=month_ago,
-    ).filter(~Q(status="cancelled")).annotate(
-        date=TruncDate('start_time')
-    ).values('date').annotate(count=Count('id')).order_by('date')
-
-    # Pobierz WSZYSTKIE nieprzeczytane powiadomienia (dla wszystkich użytkowników)
-    # FILTRUJ: tylko te, których czas już nadszedł (created_at <= teraz)
-    all_notifications = Notification.objects.filter(
-        is_read=False,
-        created_at__lte=timezone.now()  # Tylko powiadomienia, których czas już nadszedł
-    ).select_related('user').order_by('-created_at')
+    trend_data = month_rollups.values(date=F('day')).annotate(count=Sum('bookings')).order_by('date')
 
     # Inteligentne wykrywanie użytkownika (dla dropdown - opcjonalne)
     user_id = request.GET.get('user_id')
@@ -524,6 +419,10 @@ def dashboard(request):
 
     user_id = int(user_id)
 
+    # Nieprzeczytane powiadomienia z perspektywy bieżącego użytkownika
+    # (przypomnienia powstają dopiero w chwili wysyłki, więc nie ma wierszy z przyszłości)
+    all_notifications = Notification.objects.unread_for(user_id).select_related('user').order_by('-created_at')
+
     return render(request, "dashboard.html", {
         "stats": stats,
         "upcoming": upcoming,
@@ -535,7 +434,7 @@ def dashboard(request):
         "trend_data": trend_data,
         "current_user_id": user_id,
         "all_notifications": all_notifications,  # Wszystkie powiadomienia
-        "notifications_count": all_notifications.count(),  # Liczba powiadomień
+        "notifications_count": NotificationCounter.unread_for(user_id),  # Liczba powiadomień
     })
 
 def notifications_page(request):
@@ -546,11 +445,8 @@ def notifications_page(request):
     else:
         request.session['current_user_id'] = int(user_id)
 
-    # Pobierz WSZYSTKIE powiadomienia, których czas już nadszedł
-    all_notifications = Notification.objects.filter(
-        is_read=False,
-        created_at__lte=timezone.now()  # Tylko powiadomienia, których czas już nadszedł
-    ).select_related('user').order_by('-created_at')
+    # Pobierz nieprzeczytane powiadomienia
+    all_notifications = Notification.objects.unread_for(int(user_id)).select_related('user').order_by('-created_at')
 
     return render(request, 'notifications.html', {
         'current_user_id': int(user_id),
@@ -560,37 +456,196 @@ def notifications_page(request):
 
 
 
+def _notification_reader_id(request):
+    """Użytkownik, dla którego rozstrzygamy przeczytanie broadcastów (?user_id= lub sesja)."""
+    return int(request.GET.get('user_id') or request.session.get('current_user_id', 1))
+
+
+NOTIFICATIONS_PAGE_LIMIT = 200
+
+
+def _notification_json(n):
+    return {
+        "id": n.id,
+        "message": n.message,
+        "created_at": n.created_at.isoformat(),
+        "is_read": False,
+        "broadcast": n.is_broadcast,
+        "user_name": n.user.name if n.user else "Wszyscy",  # Dodaj nazwę użytkownika
+        "user_id": n.user_id,
+    }
+
+
+def _notifications_etag(request):
+    # ETag zależy od czytelnika (broadcasty), a nie tylko od adresu
+    try:
+        reader = _notification_reader_id(request)
+    except ValueError:
+        return None
+    return version_etag(f'notifications:{reader}', request, scopes=(DATA, NOTIFICATIONS))
+
+
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_notifications_etag)
 def get_notifications_api(request):
-    # Zwróć WSZYSTKIE nieprzeczytane powiadomienia dla WSZYSTKICH użytkowników
-    # FILTRUJ: tylko te, których czas już nadszedł
-    notifications = Notification.objects.filter(
-        is_read=False,
-        created_at__lte=timezone.now()  # Tylko powiadomienia, których czas już nadszedł
-    ).select_related('user').order_by('-created_at')
+    """
+    Nieprzeczytane powiadomienia: broadcasty (dla wszystkich) i imienne.
+
+    Z ?since=<kursor> zwraca powiadomienia nowsze niż kursor (rosnąco,
+    co najwyżej ?limit=) oraz next_cursor do kolejnego odpytania. Kursor to
+    największe widziane id. Id przydziela się przy INSERT, a nie przy commicie,
+    więc przy kilku workerach process_outbox wiersz z niższym id może pojawić
+    się po wyższym – dlatego odpowiedź zawiera też nieprzeczytane z ostatnich
+    NOTIFICATIONS_POLL_OVERLAP id przed kursorem, a klient odrzuca powtórzenia po id.
+    """
+    try:
+        reader = _notification_reader_id(request)
+    except ValueError:
+        return JsonResponse({"error": "Parametr user_id musi być liczbą."}, status=400)
+    notifications = Notification.objects.unread_for(reader).select_related('user')
+
+    since = request.GET.get("since")
+    if since is None:
+        items = list(notifications.order_by('-created_at', '-id'))
+        return JsonResponse({
+            "notifications": [_notification_json(n) for n in items],
+            "count": len(items),
+            "next_cursor": max((n.id for n in items), default=0),
+        })
 
+    try:
+        since = int(since)
+        limit = min(max(int(request.GET.get("limit", 50)), 1), NOTIFICATIONS_PAGE_LIMIT)
+    except ValueError:
+        return JsonResponse({"error": "Parametry since i limit muszą być liczbami."}, status=400)
+
+    # Oba zapytania to zakresy klucza głównego (id), więc czytają tylko wiersze
+    # przy kursorze – idx_notification_unread służy pełnej liście, nie temu.
+    # Zakładka poza limitem, żeby powtórzenia nie zatrzymały stronicowania
+    late = list(notifications.filter(id__gt=since - NOTIFICATIONS_POLL_OVERLAP, id__lte=since).order_by('id'))
+    # limit + 1, żeby bez osobnego zapytania wiedzieć, czy jest kolejna strona
+    items = list(notifications.filter(id__gt=since).order_by('id')[:limit + 1])
+    has_more = len(items) > limit
+    items = items[:limit]
     return JsonResponse({
-        "notifications": [{
-            "id": n.id,
-            "message": n.message,
-            "created_at": n.created_at.isoformat(),
-            "is_read": n.is_read,
-            "user_name": n.user.name,  # Dodaj nazwę użytkownika
-            "user_id": n.user.id,
-        } for n in notifications],
-        "count": notifications.count()
+        "notifications": [_notification_json(n) for n in late + items],
+        "next_cursor": items[-1].id if items else since,
+        "has_more": has_more,
     })
 
+def notifications_count_api(request):
+    """
+    Liczba nieprzeczytanych powiadomień z liczników (NotificationCounter) – bez
+    liczenia wierszy. Z ?cursor=1 dodatkowo id najnowszego powiadomienia, od
+    którego klient może odpytywać /api/notifications?since=, oraz id
+    nieprzeczytanych z zakładki przed nim (recent_ids) – już wliczone w count.
+    """
+    try:
+        user_id = _notification_reader_id(request)
+    except ValueError:
+        return JsonResponse({"error": "Parametr user_id musi być liczbą."}, status=400)
+
+    data = {"count": NotificationCounter.unread_for(user_id)}
+    if request.GET.get("cursor"):
+        cursor = Notification.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        data["next_cursor"] = cursor
+        data["recent_ids"] = list(
+            Notification.objects.unread_for(user_id)
+            .filter(id__gt=cursor - NOTIFICATIONS_POLL_OVERLAP).order_by('id').values_list('id', flat=True)
+        )
+    return JsonResponse(data)
+
+async def events_stream(request):
+    """
+    Strumień SSE: nowe powiadomienia (event: notification) oraz zmiany rezerwacji
+    (booking.created / booking.cancelled / booking.updated). Działa tylko pod ASGI;
+    przy WSGI klient zostaje przy odpytywaniu /api/notifications?since=.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({"error": "Strumień zdarzeń wymaga serwera ASGI."}, status=501)
+
+    try:
+        user_id = await sync_to_async(_notification_reader_id)(request)
+        last_id = int(request.headers.get("Last-Event-ID") or request.GET.get("since") or 0)
+    except ValueError:
+        return JsonResponse({"error": "Parametry user_id i since muszą być liczbami."}, status=400)
+
+    # Subskrypcja przed odczytem zaległych, żeby nic nie umknęło między nimi
+    subscriber = broadcaster.subscribe(user_id)
+    missed = []
+    if last_id:
+        # Z zakładką jak w get_notifications_api; klient odrzuca powtórzenia po id
+        missed = await sync_to_async(list)(
+            Notification.objects.unread_for(user_id)
+            .filter(id__gt=last_id - NOTIFICATIONS_POLL_OVERLAP).order_by('id')[:NOTIFICATIONS_PAGE_LIMIT]
+        )
+
+    async def stream():
+        try:
+            yield "retry: 5000\n\n"
+            for notification in missed:
+                yield format_sse(notification_event(notification))
+            while True:
+                if subscriber.overflowed:
+                    # Klient nie nadążał i zgubił zdarzenia – niech przeładuje stan przez API
+                    subscriber.overflowed = False
+                    yield "event: resync\ndata: {}\n\n"
+                try:
+                    event = await asyncio.wait_for(subscriber.queue.get(), heartbeat_interval())
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                yield format_sse(event)
+        finally:
+            broadcaster.unsubscribe(subscriber)
+
+    response = StreamingHttpResponse(stream(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def mark_notification_read(request, notification_id):
     try:
         notification = Notification.objects.get(id=notification_id)
-        notification.is_read = True
-        notification.save()
-        return JsonResponse({"message": "Marked as read", "success": True})
     except Notification.DoesNotExist:
         return JsonResponse({"error": "Not found", "success": False}, status=404)
 
+    try:
+        user_id = _notification_reader_id(request)
+    except ValueError:
+        return JsonResponse({"error": "Parametr user_id musi być liczbą.", "success": False}, status=400)
+    if notification.is_broadcast and not User.objects.filter(id=user_id).exists():
+        return JsonResponse({"error": "Użytkownik nie istnieje.", "success": False}, status=404)
+    notification.mark_read(user_id)
+    return JsonResponse({"message": "Marked as read", "success": True})
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def mark_notifications_read(request):
+    """
+    Zbiorcze oznaczanie jako przeczytane: {"ids": [...]} albo {"up_to": <kursor>}
+    (wszystkie nieprzeczytane z id <= kursor, np. next_cursor z /api/notifications).
+    """
+    try:
+        data = json.loads(request.body or b"{}")
+        user_id = _notification_reader_id(request)
+        if "ids" in data:
+            ids = [int(i) for i in data["ids"]]
+            notifications = Notification.objects.filter(id__in=ids)
+        elif "up_to" in data:
+            notifications = Notification.objects.filter(id__lte=int(data["up_to"]))
+        else:
+            return JsonResponse({"error": "Podaj ids albo up_to.", "success": False}, status=400)
+    except (ValueError, TypeError):
+        return JsonResponse({"error": "ids, up_to i user_id muszą być liczbami.", "success": False}, status=400)
+
+    if not User.objects.filter(id=user_id).exists():
+        return JsonResponse({"error": "Użytkownik nie istnieje.", "success": False}, status=404)
+    marked = notifications.mark_read(user_id)
+    return JsonResponse({"marked": marked, "success": True})
+
 def monthly_report(request):
     if not REPORTLAB_AVAILABLE:
         return HttpResponse("Reportlab lub matplotlib nie zainstalowany", status=501)
@@ -612,11 +667,25 @@ def monthly_report(request):
     except ValueError:
         return JsonResponse({"error": "Niepoprawny format miesiąca. Użyj YYYY-MM"}, status=400)
 
+    engine = request.GET.get("engine", "rollup")
+    if engine not in SUMMARY_ENGINES:
+        return JsonResponse({"error": f"Nieznany silnik. Dostępne: {', '.join(SUMMARY_ENGINES)}"}, status=400)
+    if engine == "numpy" and not NUMPY_AVAILABLE:
+        return HttpResponse("NumPy nie zainstalowany", status=501)
+
     bookings = Booking.objects.filter(
         start_time__gte=start_date,
         start_time__lt=end_date,
         status="confirmed"
     ).select_related('room', 'user').order_by('start_time')
+    # Podsumowanie i wykresy z agregatów (bookings/summaries.py); wiersze czytamy tylko do tabeli szczegółów
+    rollups = BookingDailyRollup.objects.filter(
+        day__gte=timezone.localdate(start_date),
+        day__lt=timezone.localdate(end_date),
+        status="confirmed",
+    )
+    summary = summary_engine(engine, bookings, rollups)
+    totals = summary.totals()
 
     # Przygotowanie bufora dla PDF
     buffer = io.BytesIO()
@@ -662,8 +731,8 @@ def monthly_report(request):
     elements.append(Spacer(1, 10))
 
     # Podsumowanie
-    total_bookings = bookings.count()
-    total_hours = sum(b.duration_hours for b in bookings)
+    total_bookings = totals['total']
+    total_hours = totals['hours']
 
     summary_data = [
         [Paragraph("<b>Liczba rezerwacji</b>", normal_style), f"{total_bookings}"],
@@ -685,10 +754,9 @@ def monthly_report(request):
     elements.append(Spacer(1, 20))
 
     # Wykres rezerwacji per sala
-    room_counts = {}
-    for b in bookings:
-        name = b.room.name
-        room_counts[name] = room_counts.get(name, 0) + 1
+    room_stats = summary.rooms()
+    room_names = dict(Room.objects.filter(id__in=room_stats).values_list('id', 'name'))
+    room_counts = {room_names.get(room_id, str(room_id)): count for room_id, (count, _) in room_stats.items()}
     
     if room_counts:
         elements.append(Paragraph("Rezerwacje per sala", subtitle_style))
@@ -713,10 +781,7 @@ def monthly_report(request):
         elements.append(Spacer(1, 15))
 
     # Wykres godzin per departament
-    dept_hours = {}
-    for b in bookings:
-        dept = b.user.department or "Brak departamentu"
-        dept_hours[dept] = dept_hours.get(dept, 0) + b.duration_hours
+    dept_hours = {dept: hours for dept, (_, hours) in summary.departments().items()}
 
     if dept_hours:
         elements.append(Paragraph("Godziny rezerwacji per departament", subtitle_style))
@@ -778,7 +843,7 @@ def monthly_report(request):
     elements.append(Spacer(1, 20))
 
     # Footer
-    elements.append(Paragraph(f"<b>Podsumowanie miesiąca:</b><br/>Całkowita liczba rezerwacji: {bookings.count()}<br/>Suma zarezerwowanych godzin: {total_hours:.1f} h<br/>Średnia rezerwacji na dzień: {bookings.count()/30:.1f}", normal_style))
+    elements.append(Paragraph(f"<b>Podsumowanie miesiąca:</b><br/>Całkowita liczba rezerwacji: {total_bookings}<br/>Suma zarezerwowanych godzin: {total_hours:.1f} h<br/>Średnia rezerwacji na dzień: {total_bookings/30:.1f}", normal_style))
 
     doc.build(elements)
     buffer.seek(0)
@@ -797,16 +862,48 @@ def recurring_bookings_page(request):
     """Strona z formularzem rezerwacji cyklicznych."""
     return render(request, "recurring_bookings_new.html")
 
+@cache_control(no_cache=True)
+@condition(etag_func=etag_func('rooms'))
 def get_rooms_api(request):
     """Zwraca listę wszystkich sal."""
     rooms = Room.objects.filter(is_active=True)
     return JsonResponse([{"id": r.id, "name": r.name, "capacity": r.capacity} for r in rooms], safe=False)
 
+@cache_control(no_cache=True)
+@condition(etag_func=etag_func('users'))
 def get_users_api(request):
     """Zwraca listę wszystkich użytkowników."""
     users = User.objects.all()
     return JsonResponse([{"id": u.id, "name": u.name, "department": u.department} for u in users], safe=False)
 
+BOOKING_LIST_FIELDS = (
+    'id', 'title', 'description', 'start_time', 'end_time', 'status', 'attendees_count',
+    'room_id', 'room__name', 'room__hourly_rate', 'user_id', 'user__name',
+)
+
+
+def _booking_list_json(row):
+    hours = (row['end_time'] - row['start_time']).total_seconds() / 3600
+    rate = row['room__hourly_rate']
+    cost = Decimal(rate) * Decimal(hours) if rate else Decimal(0)
+    return {
+        "id": row['id'],
+        "title": row['title'],
+        "description": row['description'],
+        "start_time": row['start_time'].isoformat(),
+        "end_time": row['end_time'].isoformat(),
+        "status": row['status'],
+        "attendees_count": row['attendees_count'],
+        "duration_hours": round(hours, 2),
+        "total_cost": float(round(cost, 2)),
+        "room": {"id": row['room_id'], "name": row['room__name']},
+        "user": {"id": row['user_id'], "name": row['user__name']},
+    }
+
+
+@cache_control(no_cache=True)
+@condition(etag_func=etag_func('bookings'))
+@cached_response('bookings')
 def get_bookings(request):
     """Pobierz listę rezerwacji z filtrami."""
     query = Booking.objects.select_related('room', 'user').all()
@@ -819,6 +916,7 @@ def get_bookings(request):
     if user_id:
         query = query.filter(user_id=user_id)
 
+    date = None
     date_str = request.GET.get("date")
     if date_str:
         try:
@@ -831,7 +929,15 @@ def get_bookings(request):
     if status:
         query = query.filter(status=status)
 
-    query = query.order_by("-start_time")
+    query = query.order_by("-start_time").values(*BOOKING_LIST_FIELDS)
+
+    # ?stream=json|ndjson: wszystkie pasujące rezerwacje strumieniem, bez stron
+    # i bez wystąpień wirtualnych serii
+    stream = request.GET.get("stream")
+    if stream:
+        if stream not in STREAM_FORMATS:
+            return JsonResponse({"error": f"Dostępne formaty strumienia: {', '.join(STREAM_FORMATS)}."}, status=400)
+        return stream_rows(request, query, _booking_list_json, stream)
 
     page_number = request.GET.get("page", 1)
     per_page = request.GET.get("per_page", 20)
@@ -839,29 +945,68 @@ def get_bookings(request):
     paginator = Paginator(query, per_page)
     page_obj = paginator.get_page(page_number)
 
-    bookings_list = []
-    for b in page_obj:
-        bookings_list.append({
-            "id": b.id,
-            "title": b.title,
-            "description": b.description,
-            "start_time": b.start_time.isoformat(),
-            "end_time": b.end_time.isoformat(),
-            "status": b.status,
-            "attendees_count": b.attendees_count,
-            "duration_hours": round(b.duration_hours, 2),
-            "total_cost": float(round(b.total_cost, 2)),
-            "room": {"id": b.room.id, "name": b.room.name},
-            "user": {"id": b.user.id, "name": b.user.name}
-        })
+    bookings_list = [_booking_list_json(row) for row in page_obj]
+
+    # Dla widoku dnia dokładamy wystąpienia serii spoza horyzontu materializacji (bez id, poza paginacją)
+    virtual_list = []
+    if date and status in (None, "", "confirmed"):
+        day_start = timezone.make_aware(datetime.combine(date, datetime.min.time()))
+        day_end = day_start + timedelta(days=1)
+        series_qs = pending_series(day_start, day_end).select_related('room', 'user')
+        if room_id:
+            series_qs = series_qs.filter(room_id=room_id)
+        if user_id:
+            series_qs = series_qs.filter(user_id=user_id)
+        for series, occ_start, occ_end in iter_virtual(series_qs, day_start, day_end):
+            if occ_start < day_start:
+                continue
+            virtual_list.append({
+                "id": None,
+                "series_id": series.series_id,
+                "virtual": True,
+                "title": series.title,
+                "description": series.description,
+                "start_time": occ_start.isoformat(),
+                "end_time": occ_end.isoformat(),
+                "status": "confirmed",
+                "attendees_count": series.attendees_count,
+                "room": {"id": series.room.id, "name": series.room.name},
+                "user": {"id": series.user.id, "name": series.user.name},
+            })
+        virtual_list.sort(key=lambda x: x["start_time"], reverse=True)
 
     return JsonResponse({
         "bookings": bookings_list,
+        "virtual_bookings": virtual_list,
         "total": paginator.count,
         "pages": paginator.num_pages,
         "current_page": page_obj.number,
     })
 
+def _booking_conflict_response(room, start_time, end_time, attendees):
+    """409 z propozycjami: ta sama sala w najbliższych wolnych terminach i podobne wolne sale."""
+    same_room, other_rooms = suggest_alternatives(room, start_time, end_time, attendees)
+    return JsonResponse({
+        "error": "Sala jest już zarezerwowana w tym czasie.",
+        "alternatives": {
+            "same_room": [{
+                "room_id": room.id,
+                "room_name": room.name,
+                "start_time": slot_start.isoformat(),
+                "end_time": slot_end.isoformat(),
+            } for slot_start, slot_end in same_room],
+            "other_rooms": [{
+                "room_id": other.id,
+                "room_name": other.name,
+                "capacity": other.capacity,
+                "floor": other.floor,
+                "equipment": [e.name for e in other.equipment.all()],
+                "start_time": start_time.isoformat(),
+                "end_time": end_time.isoformat(),
+            } for other in other_rooms],
+        },
+    }, status=409)
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def create_booking(request):
@@ -912,18 +1057,22 @@ def create_booking(request):
     if attendees > room.capacity:
         return JsonResponse({"error": f"Zbyt wielu uczestników. Pojemność sali: {room.capacity}."}, status=400)
 
-    if not room.is_available(start_time, end_time):
-        return JsonResponse({"error": "Sala jest już zarezerwowana w tym czasie."}, status=409)
+    # Wystąpienia serii poza horyzontem nie są jeszcze w tabeli, więc ograniczenie ich nie widzi
+    if virtual_conflict(room.id, start_time, end_time):
+        return _booking_conflict_response(room, start_time, end_time, attendees)
 
-    booking = Booking.objects.create(
-        room=room,
+    # INSERT bez wcześniejszego sprawdzania – kolizję odrzuca ograniczenie bookings_no_overlap
+    booking = create_booking_exclusive(
+        room,
+        start_time,
+        end_time,
         user=user,
         title=data["title"],
         description=data.get("description"),
-        start_time=start_time,
-        end_time=end_time,
         attendees_count=attendees,
     )
+    if booking is None:
+        return _booking_conflict_response(room, start_time, end_time, attendees)
 
     # Automatycznie ustaw user_id w sesji aby pokazać powiadomienia tego użytkownika
     request.session['current_user_id'] = user.id
@@ -957,6 +1106,18 @@ def cancel_booking(request, booking_id):
     booking.save()
     return JsonResponse({"message": "Rezerwacja anulowana."})
 
+def _room_search_qs(request):
+    """Aktywne sale spełniające kryteria capacity i equipment z parametrów GET."""
+    capacity = int(request.GET.get("capacity", 1))
+    rooms = Room.objects.filter(is_active=True, capacity__gte=capacity)
+
+    eq_param = request.GET.get("equipment")
+    if eq_param:
+        equipment_names = [e.strip() for e in eq_param.split(",") if e.strip()]
+        for eq_name in equipment_names:
+            rooms = rooms.filter(equipment__name=eq_name)
+    return rooms
+
 def find_available(request):
     try:
         start_time_str = request.GET.get("start_time")
@@ -977,27 +1138,27 @@ def find_available(request):
     except (ValueError, TypeError):
         return JsonResponse({"error": "Niepoprawny format daty. Użyj ISO format."}, status=400)
 
-    capacity = int(request.GET.get("capacity", 1))
-    eq_param = request.GET.get("equipment")
-    
-    rooms = Room.objects.filter(is_active=True, capacity__gte=capacity)
-    if eq_param:
-        equipment_names = [e.strip() for e in eq_param.split(",") if e.strip()]
-        for eq_name in equipment_names:
-            rooms = rooms.filter(equipment__name=eq_name)
+    try:
+        capacity = int(request.GET.get("capacity", 1))
+        rooms = _room_search_qs(request)
+    except ValueError:
+        return JsonResponse({"error": "Parametr capacity musi być liczbą."}, status=400)
+
+    # Wolne sale i ich wyposażenie: stała liczba zapytań niezależnie od liczby sal
+    rooms = free_rooms(rooms, start_time, end_time).prefetch_related('equipment').order_by('id')
+    rooms = drop_virtual_conflicts(rooms, start_time, end_time)
 
     available_rooms = []
     for room in rooms:
-        if room.is_available(start_time, end_time):
-            available_rooms.append({
-                "id": room.id,
-                "name": room.name,
-                "capacity": room.capacity,
-                "floor": room.floor,
-                "description": room.description,
-                "hourly_rate": float(room.hourly_rate),
-                "equipment": [e.name for e in room.equipment.all()]
-            })
+        available_rooms.append({
+            "id": room.id,
+            "name": room.name,
+            "capacity": room.capacity,
+            "floor": room.floor,
+            "description": room.description,
+            "hourly_rate": float(room.hourly_rate),
+            "equipment": [e.name for e in room.equipment.all()]
+        })
 
     return JsonResponse({
         "available_rooms": available_rooms,
@@ -1013,10 +1174,12 @@ def find_available(request):
 def create_recurring(request):
     try:
         data = json.loads(request.body)
-        required = ["room_id", "user_id", "title", "start_time", "end_time", "frequency", "occurrences"]
+        required = ["room_id", "user_id", "title", "start_time", "end_time", "frequency"]
         for field in required:
             if field not in data:
                 return JsonResponse({"error": f"Brak wymaganego pola: {field}"}, status=400)
+        if "occurrences" not in data and "until" not in data:
+            return JsonResponse({"error": "Podaj occurrences lub until (until: null oznacza serię bez końca)."}, status=400)
 
         start_time = parse_datetime(data["start_time"].replace('Z', '+00:00'))
         end_time = parse_datetime(data["end_time"].replace('Z', '+00:00'))
@@ -1033,46 +1196,242 @@ def create_recurring(request):
             return JsonResponse({"error": "Czas rozpoczęcia musi być przed czasem zakończenia."}, status=400)
         if start_time < timezone.now():
             return JsonResponse({"error": "Nie można rezerwować w przeszłości."}, status=400)
+        if end_time - start_time > timedelta(days=1):
+            return JsonResponse({"error": "Wystąpienie serii nie może trwać dłużej niż dobę."}, status=400)
 
         room = Room.objects.get(id=int(data["room_id"]))
         user = User.objects.get(id=int(data["user_id"]))
         
         frequency = data["frequency"].lower()
-        occurrences = int(data["occurrences"])
-        
-        frequency_map = {
-            "daily": timedelta(days=1),
-            "weekly": timedelta(weeks=1),
-            "biweekly": timedelta(weeks=2),
-            "monthly": timedelta(days=30)
-        }
-        
-        if frequency not in frequency_map:
+        if frequency not in FREQUENCIES:
             return JsonResponse({"error": "Niepoprawna częstotliwość."}, status=400)
-            
-        interval = frequency_map[frequency]
-        series_id = str(uuid.uuid4())
-        
-        created_bookings = []
-        with transaction.atomic():
-            current_start = start_time
-            current_end = end_time
-            for i in range(occurrences):
-                if not room.is_available(current_start, current_end):
-                    raise Exception(f"Sala zajęta w dniu {current_start}")
-                
-                booking = Booking.objects.create(
-                    room=room, user=user, title=data["title"],
-                    description=data.get("description"),
-                    start_time=current_start, end_time=current_end,
-                    attendees_count=int(data.get("attendees_count", 1)),
-                    recurrence_rule=frequency.upper(),
-                    series_id=series_id
-                )
-                created_bookings.append(booking)
-                current_start += interval
-                current_end += interval
-                
-        return JsonResponse({"message": f"Utworzono {len(created_bookings)} rezerwacji."}, status=201)
+
+        occurrences = int(data["occurrences"]) if data.get("occurrences") is not None else None
+        if occurrences is not None and occurrences < 1:
+            return JsonResponse({"error": "Liczba wystąpień musi być dodatnia."}, status=400)
+        if occurrences is not None and occurrences > MAX_SERIES_OCCURRENCES:
+            return JsonResponse({"error": f"Seria może mieć najwyżej {MAX_SERIES_OCCURRENCES} wystąpień."}, status=400)
+
+        until = None
+        if data.get("until"):
+            until_date = parse_date(data["until"])
+            if until_date:
+                until = timezone.make_aware(datetime.combine(until_date, datetime.max.time()))
+            else:
+                until = parse_datetime(data["until"].replace('Z', '+00:00'))
+                if not until:
+                    return JsonResponse({"error": "Niepoprawny format daty until."}, status=400)
+                if timezone.is_naive(until):
+                    until = timezone.make_aware(until)
+            if until < start_time:
+                return JsonResponse({"error": "Data końca serii jest przed jej początkiem."}, status=400)
+
+        series = BookingSeries(
+            series_id=str(uuid.uuid4()),
+            room=room, user=user, title=data["title"],
+            description=data.get("description"),
+            attendees_count=int(data.get("attendees_count", 1)),
+            frequency=frequency,
+            start_time=start_time, end_time=end_time,
+            count=occurrences, until=until,
+            materialized_until=start_time,
+        )
+
+        # Serię z końcem sprawdzamy w całości, otwartą do horyzontu materializacji.
+        # Odległe until przy częstej regule dałoby miliony terminów – rozwijamy
+        # o jeden ponad limit i odrzucamy takie serie.
+        bounded = occurrences is not None or until is not None
+        if bounded:
+            slots = expand(
+                series, start_time, datetime.max.replace(tzinfo=start_time.tzinfo),
+                limit=MAX_SERIES_OCCURRENCES + 1,
+            )
+            if len(slots) > MAX_SERIES_OCCURRENCES:
+                return JsonResponse({
+                    "error": f"Seria może mieć najwyżej {MAX_SERIES_OCCURRENCES} wystąpień – "
+                             "skróć until albo utwórz serię bez końca."
+                }, status=400)
+        else:
+            slots = expand(series, start_time, horizon())
+        if not slots:
+            return JsonResponse({"error": "Reguła nie wyznacza żadnego terminu."}, status=400)
+
+        # Kolizje całej serii: jedno zapytanie zakresowe do indeksu zajętości sali
+        schedule = schedule_index.schedule(room.id, slots[0][0], slots[-1][1], refresh=True)
+        conflicts = [(s, e) for s, e in slots if schedule.overlaps(s, e)]
+        skip_conflicts = bool(data.get("skip_conflicts", False))
+        if conflicts and not skip_conflicts:
+            return JsonResponse({
+                "error": f"Sala zajęta w dniu {conflicts[0][0]}",
+                "conflicts": [{"start_time": s.isoformat(), "end_time": e.isoformat()} for s, e in conflicts],
+            }, status=409)
+
+        try:
+            # Ograniczenie bookings_no_overlap łapie zapisy innych workerów między odczytem a INSERT
+            with transaction.atomic():
+                series.save()
+                created_bookings, _ = materialize(series, announce=True)
+        except IntegrityError as exc:
+            if not is_overlap_violation(exc):
+                raise
+            return JsonResponse({"error": "Sala została zajęta w trakcie tworzenia serii. Spróbuj ponownie."}, status=409)
+
+        return JsonResponse({
+            "message": f"Utworzono {len(created_bookings)} rezerwacji.",
+            "series_id": series.series_id,
+            "created": len(created_bookings),
+            "total": len(slots) if bounded else None,
+            "materialized_until": series.materialized_until.isoformat(),
+            "skipped": [{"start_time": s.isoformat(), "end_time": e.isoformat()} for s, e in conflicts],
+        }, status=201)
     except Exception as e:
         return JsonResponse({"error": str(e)}, status=500)
+
+def find_free_slots(request):
+    """Najwcześniejsze wolne terminy o zadanej długości we wszystkich pasujących salach."""
+    try:
+        duration = timedelta(minutes=int(request.GET.get("duration", "")))
+        limit = min(max(int(request.GET.get("limit", 10)), 1), 100)
+        step = timedelta(minutes=max(int(request.GET.get("step", 15)), 1))
+    except ValueError:
+        return JsonResponse({"error": "Wymagany parametr duration (minuty); limit i step muszą być liczbami."}, status=400)
+    if duration <= timedelta(0):
+        return JsonResponse({"error": "Czas trwania musi być dodatni."}, status=400)
+
+    try:
+        now = timezone.now()
+        start_time_str = request.GET.get("start_time")
+        end_time_str = request.GET.get("end_time")
+
+        start_time = parse_datetime(start_time_str.replace('Z', '+00:00')) if start_time_str else now
+        if not start_time:
+            raise ValueError("Błędny format daty")
+        if timezone.is_naive(start_time):
+            start_time = timezone.make_aware(start_time)
+        start_time = max(start_time, now)
+
+        end_time = parse_datetime(end_time_str.replace('Z', '+00:00')) if end_time_str else start_time + timedelta(days=7)
+        if not end_time:
+            raise ValueError("Błędny format daty")
+        if timezone.is_naive(end_time):
+            end_time = timezone.make_aware(end_time)
+    except (ValueError, TypeError):
+        return JsonResponse({"error": "Niepoprawny format daty. Użyj ISO format."}, status=400)
+
+    if start_time >= end_time:
+        return JsonResponse({"error": "Czas rozpoczęcia musi być przed czasem zakończenia."}, status=400)
+    # Harmonogramy wszystkich sal ładujemy na całe okno – ograniczamy je
+    end_time = min(end_time, start_time + FREE_SLOTS_MAX_WINDOW)
+
+    try:
+        capacity = int(request.GET.get("capacity", 1))
+        rooms = _room_search_qs(request).order_by('id')
+    except ValueError:
+        return JsonResponse({"error": "Parametr capacity musi być liczbą."}, status=400)
+    slots = free_slots(rooms, start_time, end_time, duration, limit=limit, step=step)
+
+    return JsonResponse({
+        "slots": [{
+            "room_id": room.id,
+            "room_name": room.name,
+            "capacity": room.capacity,
+            "start_time": slot_start.isoformat(),
+            "end_time": slot_end.isoformat(),
+        } for slot_start, slot_end, room in slots],
+        "search_criteria": {
+            "start_time": start_time.isoformat(),
+            "end_time": end_time.isoformat(),
+            "duration_minutes": int(duration.total_seconds() // 60),
+            "min_capacity": capacity,
+            "limit": limit,
+        },
+    })
+
+def availability_grid(request):
+    """Siatka zajętości sale × sloty (domyślnie 15 min) dla dnia lub tygodnia jako bitmapa."""
+    if not NUMPY_AVAILABLE:
+        return HttpResponse("NumPy nie zainstalowany", status=501)
+
+    date_str = request.GET.get("date")
+    day = parse_date(date_str) if date_str else timezone.localtime(timezone.now()).date()
+    if not day:
+        return JsonResponse({"error": "Niepoprawny format daty. Użyj YYYY-MM-DD."}, status=400)
+
+    try:
+        days = min(max(int(request.GET.get("days", 1)), 1), 31)
+        slot_minutes = int(request.GET.get("slot", 15))
+        room_ids = [int(x) for x in request.GET.get("room_id", "").split(',') if x.strip()]
+    except ValueError:
+        return JsonResponse({"error": "Parametry days, slot i room_id muszą być liczbami."}, status=400)
+    if slot_minutes <= 0 or (24 * 60) % slot_minutes:
+        return JsonResponse({"error": "Slot musi dzielić dobę (np. 15, 30, 60)."}, status=400)
+
+    encoding = request.GET.get("encoding", "base64")
+    if encoding not in ("base64", "rle"):
+        return JsonResponse({"error": "Dostępne kodowania: base64, rle."}, status=400)
+
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(day, datetime.min.time()), tz)
+    end = timezone.make_aware(datetime.combine(day + timedelta(days=days), datetime.min.time()), tz)
+
+    rooms = Room.objects.filter(is_active=True)
+    if room_ids:
+        rooms = rooms.filter(id__in=room_ids)
+    rooms = list(rooms.order_by('name').values('id', 'name'))
+
+    grid = occupancy_grid([r['id'] for r in rooms], start, end, timedelta(minutes=slot_minutes))
+    encode = encode_bitmap if encoding == "base64" else encode_rle
+
+    return JsonResponse({
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "slot_minutes": slot_minutes,
+        "slots": int(grid.shape[1]),
+        "encoding": encoding,
+        "rooms": [
+            {"id": r['id'], "name": r['name'], encoding: encode(grid[i])}
+            for i, r in enumerate(rooms)
+        ],
+    })
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def import_bookings(request):
+    """
+    Strumieniowy import rezerwacji (CSV lub NDJSON) w treści żądania albo jako plik
+    multipart (pole "file"). Format z ?format= lub z Content-Type.
+    """
+    content_type = request.content_type or ""
+    fmt = request.GET.get("format")
+    if not fmt:
+        fmt = "ndjson" if content_type in ("application/x-ndjson", "application/jsonl") else "csv"
+    if fmt not in IMPORT_FORMATS:
+        return JsonResponse({"error": "Dostępne formaty: csv, ndjson."}, status=400)
+
+    try:
+        chunk_size = min(max(int(request.GET.get("chunk_size", 1000)), 1), 10000)
+    except ValueError:
+        return JsonResponse({"error": "Parametr chunk_size musi być liczbą."}, status=400)
+
+    if content_type == "multipart/form-data":
+        upload = request.FILES.get("file")
+        if upload is None:
+            return JsonResponse({"error": "Brak pliku w polu file."}, status=400)
+        lines = upload
+    else:
+        # Iterujemy po strumieniu żądania zamiast request.body, żeby nie trzymać całego pliku w pamięci
+        lines = request
+
+    importer = BookingImporter(
+        chunk_size=chunk_size,
+        dry_run=request.GET.get("dry_run") in ("1", "true"),
+        notify=request.GET.get("notify") in ("1", "true"),
+    )
+    try:
+        summary = importer.run(iter_records(lines, fmt))
+    except csv.Error as exc:
+        summary = importer.summary()
+        summary["error"] = f"Niepoprawny plik CSV: {exc}"
+        return JsonResponse(summary, status=400)
+
+    return JsonResponse(summary)
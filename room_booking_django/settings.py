@@ -96,6 +96,11 @@ DATABASES = {
     )
 }
 
+# SQLite nie ma SELECT ... FOR UPDATE: BEGIN IMMEDIATE sprawia, że równoległe
+# transakcje zapisujące czekają na blokadę zamiast kończyć się "database is locked"
+if DATABASES['default'].get('ENGINE') == 'django.db.backends.sqlite3':
+    DATABASES['default'].setdefault('OPTIONS', {})['transaction_mode'] = 'IMMEDIATE'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -128,6 +133,37 @@ USE_I18N = True
 USE_TZ = True
 
 
+# Rezerwacje
+# Czas życia (s) wpisu w indeksie zajętości sal (bookings/availability.py)
+BOOKING_INDEX_TTL = int(os.getenv('BOOKING_INDEX_TTL', '30'))
+# Ile dni do przodu materializujemy wystąpienia serii (manage.py materialize_series)
+BOOKING_SERIES_HORIZON_DAYS = int(os.getenv('BOOKING_SERIES_HORIZON_DAYS', '90'))
+# Po tylu nieudanych próbach zdarzenie outbox dostaje status 'dead' (manage.py process_outbox)
+OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', '5'))
+# Strumień SSE /api/events: co ile sekund proces odpytuje bazę o zdarzenia z innych
+# workerów (0 = tylko sygnały w tym procesie) i co ile wysyła heartbeat
+EVENTS_POLL_INTERVAL = float(os.getenv('EVENTS_POLL_INTERVAL', '5'))
+EVENTS_HEARTBEAT = float(os.getenv('EVENTS_HEARTBEAT', '25'))
+# Retencja powiadomień (manage.py purge_notifications), w dniach; 0 wyłącza regułę:
+# przeczytane imienne, broadcasty (niezależnie od odczytów) i wszystkie pozostałe
+NOTIFICATION_READ_RETENTION_DAYS = int(os.getenv('NOTIFICATION_READ_RETENTION_DAYS', '30'))
+NOTIFICATION_BROADCAST_RETENTION_DAYS = int(os.getenv('NOTIFICATION_BROADCAST_RETENTION_DAYS', '90'))
+NOTIFICATION_RETENTION_DAYS = int(os.getenv('NOTIFICATION_RETENTION_DAYS', '365'))
+# Przed usunięciem przenosi powiadomienia do zwartej tabeli notifications_archive
+NOTIFICATION_ARCHIVE = os.getenv('NOTIFICATION_ARCHIVE', 'False') == 'True'
+
+# Cache (m.in. odpowiedzi API, bookings/cache.py). Domyślnie plikowy – wspólny
+# dla workerów na jednym hoście; przy kilku hostach ustaw np. Redis
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', str(BASE_DIR / '.cache')),
+    }
+}
+# Czas życia wpisu w sekundach; unieważnienie i tak następuje przez wersję danych
+API_CACHE_TIMEOUT = int(os.getenv('API_CACHE_TIMEOUT', '300'))
+
+
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/6.0/howto/static-files/
 